@@ -1,5 +1,8 @@
 from flask import (
     Flask,
+    before_render_template,
+    has_request_context,
+    template_rendered,
     render_template,
     request,
     redirect,
@@ -7,25 +10,133 @@ from flask import (
     session,
     jsonify,
     flash,
+    g,
+    abort,
+    make_response,
+    send_from_directory,
+    stream_with_context,
 )
+import hmac
+import io
+import json
+import mimetypes
 import os
-from datetime import datetime
-from functools import wraps
-
-from werkzeug.security import generate_password_hash, check_password_hash
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from functools import cache, wraps
+from operator import itemgetter
+
+import click
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.schema import CreateColumn
+
+from werkzeug.http import is_resource_modified
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 
 from flask_sqlalchemy import SQLAlchemy
 
+import assets
+from cache import creer_backend
+from compression import Compression
+from facettes import FACETTES, LIBELLES_FACETTES, IndexFacettes
+from factures import facture_pdf
+from images import generer_variantes
+from metriques import Metriques
+from mots_de_passe import HachageIndisponible, Hacheur, LimiteurTentatives
+from import_export import (
+    CHAMPS_CLIENT,
+    COLONNES_COMMANDE_CSV,
+    COLONNES_PRODUIT,
+    ecrire_csv,
+    ecrire_json,
+    format_fichier,
+    lire_enregistrements,
+    normaliser_commande,
+    normaliser_produit,
+    par_lots,
+)
+from notifications import ServeurSMTPLocal, composer_mail, envoyer_mail
+from paniers import borner, creer_stockage, fusionner
+from recommandations import ingredients, normaliser, similaires
+
 app = Flask(__name__)
 app.secret_key = "votre_cle_secrete_tres_securisee"
 
 # ---------- CONFIG BDD ----------
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
-    BASE_DIR, "maison_du_parfum.db"
-)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "SQLALCHEMY_DATABASE_URI"
+) or "sqlite:///" + os.path.join(BASE_DIR, "maison_du_parfum.db")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Rien n'est fait en base à l'import (gunicorn --preload, tests) : le schéma est
+# créé ou migré par `flask init-db` (phase release du Procfile) ; avec
+# INIT_DB_AUTO=1, aussi à la première requête de chaque processus (développement)
+app.config["INIT_DB_AUTO"] = os.environ.get("INIT_DB_AUTO", "1") == "1"
+
+# Profil SQLite : "production" (WAL, busy timeout, mmap...) ou "defaut" (réglages
+# d'origine de SQLite, utile pour comparer dans benchmarks/ecriture_sqlite.py)
+app.config["SQLITE_PROFIL"] = os.environ.get("SQLITE_PROFIL", "production")
+app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(
+    os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 10000)
+)
+app.config["SQLITE_MMAP_SIZE"] = int(
+    os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+)
+
+
+def options_moteur(uri: str) -> dict:
+    """Options du moteur SQLAlchemy selon la base (SQLite ou serveur type PostgreSQL).
+
+    Peuvent être surchargées par la variable SQLALCHEMY_ENGINE_OPTIONS (JSON).
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        options = {}
+        if url.database not in (None, "", ":memory:"):
+            options.update(pool_size=5, max_overflow=10)
+        if app.config["SQLITE_PROFIL"] == "production":
+            options["connect_args"] = {
+                "timeout": app.config["SQLITE_BUSY_TIMEOUT_MS"] / 1000
+            }
+    else:
+        options = {
+            "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+            "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+        }
+    options.update(json.loads(os.environ.get("SQLALCHEMY_ENGINE_OPTIONS", "{}")))
+    return options
+
+
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options_moteur(
+    app.config["SQLALCHEMY_DATABASE_URI"]
+)
+
+
+@event.listens_for(Engine, "connect")
+def configurer_sqlite(dbapi_connection, connection_record):
+    """Applique les PRAGMA du profil de production à chaque connexion SQLite."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    if app.config["SQLITE_PROFIL"] != "production":
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']:d}")
+    cursor.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']:d}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
 
 db = SQLAlchemy(app)
 
@@ -41,11 +152,416 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 PRODUCT_UPLOAD_FOLDER = os.path.join("static", "images", "products")
 os.makedirs(PRODUCT_UPLOAD_FOLDER, exist_ok=True)
 
+# Variantes WebP redimensionnées, générées hors du thread de la requête
+LARGEURS_PRODUITS = (320, 640, 960)
+LARGEURS_AVATARS = (80, 160)
+traitement_images = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("IMAGES_WORKERS", 2)),
+    thread_name_prefix="images",
+)
+
+# Pagination de la boutique (paramètre ?par_page=)
+BOUTIQUE_PAR_PAGE = 12
+BOUTIQUE_PAR_PAGE_MAX = 48
+
+# Index de facettes : reconstruit au plus tard après FACETTES_TTL secondes, pour
+# rattraper les modifications faites par les autres workers
+app.config["FACETTES_TTL"] = int(os.environ.get("FACETTES_TTL", 300))
+
+# Pagination des commandes du tableau de bord admin
+ADMIN_COMMANDES_PAR_PAGE = 25
+
+# Historique des commandes de mon-compte (et de son défilement infini)
+MON_COMPTE_COMMANDES_PAR_PAGE = 10
+
+# Produits similaires (`flask calculer-recommandations`) : voisins gardés par
+# produit, affichés sur la fiche, et poids des deux similarités combinées
+RECOMMANDATIONS_K = 8
+RECOMMANDATIONS_AFFICHEES = 4
+POIDS_CO_ACHATS = 0.6
+POIDS_NOTES = 0.4
+
+# Analyses des ventes : période par défaut et produits listés au plus
+ANALYSES_JOURS_DEFAUT = 30
+ANALYSES_PRODUITS_MAX = 50
+
+# API catalogue (/api/...) : éléments par page, et champs renvoyés sans ?champs=
+API_PAR_PAGE = 50
+API_PAR_PAGE_MAX = 200
+# Stock et nb_ventes (changés par chaque commande) : pris en compte par les ETag
+# de l'API par tranches de tant de secondes
+API_VENTES_INTERVALLE = 60
+API_CHAMPS_PRODUIT = (
+    "id",
+    "nom",
+    "prix",
+    "categorie",
+    "description_courte",
+    "description",
+    "image",
+    "stock",
+    "notes",
+    "contenance",
+    "type_peau",
+    "pour_qui",
+    "cree_le",
+    "nb_avis",
+    "note_moyenne",
+    "nb_ventes",
+)
+API_CHAMPS_LISTE = ("id", "nom", "prix", "categorie", "image", "stock", "note_moyenne")
+
+# Import/export en masse : enregistrements par executemany / par lot lu en base
+IMPORT_LOT = 1000
+EXPORT_LOT = 1000
+IMPORT_ERREURS_MAX = 20  # erreurs détaillées renvoyées (les autres sont comptées)
+
 # ⚠ À mettre dans des variables d'environnement en production
 ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
-ADMIN_PASSWORD_HASH = os.environ.get("ADMIN_PASSWORD_HASH") or generate_password_hash(
-    "admin123"
+
+# ---------- PROXY ----------
+# Nombre de proxys de confiance devant l'application (routeur de la plateforme,
+# load balancer) : l'IP du client et le schéma sont lus dans X-Forwarded-For et
+# X-Forwarded-Proto. 0 sans proxy : ces en-têtes, falsifiables, sont ignorés.
+app.config["PROXY_SAUTS"] = int(os.environ.get("PROXY_SAUTS", 0))
+if app.config["PROXY_SAUTS"]:
+    app.wsgi_app = ProxyFix(
+        app.wsgi_app,
+        x_for=app.config["PROXY_SAUTS"],
+        x_proto=app.config["PROXY_SAUTS"],
+    )
+
+# ---------- MOTS DE PASSE ----------
+# Hachage dans un pool de HACHAGE_WORKERS processus par worker web (0 : dans le
+# thread de la requête) ; HACHAGE_METHODE au format werkzeug, paramètres compris :
+# les empreintes plus anciennes sont refaites à la connexion suivante
+app.config["HACHAGE_METHODE"] = os.environ.get("HACHAGE_METHODE", "scrypt:32768:8:1")
+app.config["HACHAGE_WORKERS"] = int(os.environ.get("HACHAGE_WORKERS", 2))
+app.config["HACHAGE_ATTENTE_MAX"] = float(os.environ.get("HACHAGE_ATTENTE_MAX", 10))
+# Tentatives de connexion/inscription par IP, et par identifiant depuis une même
+# IP, sur CONNEXION_FENETRE secondes (par worker)
+app.config["CONNEXION_MAX_PAR_IP"] = int(os.environ.get("CONNEXION_MAX_PAR_IP", 30))
+app.config["CONNEXION_MAX_PAR_COMPTE"] = int(
+    os.environ.get("CONNEXION_MAX_PAR_COMPTE", 10)
+)
+app.config["CONNEXION_FENETRE"] = int(os.environ.get("CONNEXION_FENETRE", 300))
+
+hacheur = Hacheur(
+    app.config["HACHAGE_METHODE"],
+    workers=app.config["HACHAGE_WORKERS"],
+    attente_max=app.config["HACHAGE_ATTENTE_MAX"],
+)
+limiteur_ip = LimiteurTentatives(
+    app.config["CONNEXION_MAX_PAR_IP"], app.config["CONNEXION_FENETRE"]
 )
+limiteur_compte = LimiteurTentatives(
+    app.config["CONNEXION_MAX_PAR_COMPTE"], app.config["CONNEXION_FENETRE"]
+)
+
+
+@cache
+def empreinte_admin() -> str:
+    """Empreinte du mot de passe admin, hachée à la première connexion admin
+    plutôt qu'à chaque démarrage de worker (si ADMIN_PASSWORD_HASH est absent)."""
+    return os.environ.get("ADMIN_PASSWORD_HASH") or hacheur.hacher("admin123")
+
+
+def limiter_tentatives(compte=None) -> int:
+    """0 si la tentative est permise, sinon secondes avant de pouvoir réessayer.
+
+    Appelé avant tout hachage : une rafale de tentatives est refusée sans
+    consommer de CPU. La limite par compte est comptée par IP : des échecs
+    venant d'ailleurs ne bloquent pas le titulaire (ni l'admin) du compte.
+    """
+    attente = limiteur_ip.tenter(request.remote_addr)
+    if not attente and compte:
+        attente = limiteur_compte.tenter((request.remote_addr, compte))
+    return attente
+
+
+MESSAGE_TROP_DE_TENTATIVES = "Trop de tentatives. Réessayez dans {} secondes."
+
+
+@app.errorhandler(HachageIndisponible)
+def hachage_indisponible(erreur):
+    return (
+        "Service momentanément surchargé, merci de réessayer.",
+        503,
+        {"Retry-After": "5"},
+    )
+
+
+# ---------- ASSETS STATIQUES VERSIONNÉS ----------
+# Construits par `flask construire-assets` ; sans manifeste, URLs d'origine
+MANIFESTE_ASSETS = assets.charger_manifeste(app.static_folder)
+CACHE_CONTROL_IMMUABLE = "public, max-age=31536000, immutable"
+ENCODAGES_PRECOMPRESSES = (("br", ".br"), ("gzip", ".gz"))
+DOSSIER_IMAGES_PRODUITS = "images/products/"
+
+
+@app.url_defaults
+def url_asset_versionne(endpoint, values):
+    """url_for('static', ...) pointe vers la copie versionnée si elle existe."""
+    if endpoint == "static" and MANIFESTE_ASSETS:
+        fichier = values.get("filename")
+        if fichier in MANIFESTE_ASSETS:
+            values["filename"] = MANIFESTE_ASSETS[fichier]
+
+
+def servir_statique(filename):
+    """Vue static : variantes précompressées et cache long pour static/dist/."""
+    if not filename.startswith(assets.DOSSIER_DIST + "/"):
+        response = app.send_static_file(filename)
+        if filename.startswith(DOSSIER_IMAGES_PRODUITS):
+            # Même nom possible après un nouvel envoi : durée bornée, puis ETag
+            response.headers["Cache-Control"] = "public, max-age={}".format(
+                app.config["IMAGES_PRODUITS_TTL"]
+            )
+        return response
+
+    response = None
+    for encodage, extension in ENCODAGES_PRECOMPRESSES:
+        if encodage in request.accept_encodings and os.path.isfile(
+            os.path.join(app.static_folder, filename + extension)
+        ):
+            response = send_from_directory(
+                app.static_folder,
+                filename + extension,
+                mimetype=mimetypes.guess_type(filename)[0],
+            )
+            response.headers["Content-Encoding"] = encodage
+            break
+    if response is None:
+        response = app.send_static_file(filename)
+
+    response.headers["Cache-Control"] = CACHE_CONTROL_IMMUABLE
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+app.view_functions["static"] = servir_statique
+
+
+# ---------- CONFIG CACHE CATALOGUE ----------
+# Backend "memoire" (LRU par worker : une invalidation faite par un autre worker
+# n'y est visible qu'après CACHE_TTL) ou "redis" (partagé entre workers)
+app.config["CACHE_BACKEND"] = os.environ.get("CACHE_BACKEND", "memoire")
+app.config["CACHE_TTL"] = int(os.environ.get("CACHE_TTL", 60))
+app.config["CACHE_MAX_ENTREES"] = int(os.environ.get("CACHE_MAX_ENTREES", 512))
+app.config["CACHE_REDIS_URL"] = os.environ.get(
+    "CACHE_REDIS_URL", "redis://localhost:6379/0"
+)
+
+cache_pages = creer_backend(
+    app.config["CACHE_BACKEND"],
+    max_entrees=app.config["CACHE_MAX_ENTREES"],
+    url=app.config["CACHE_REDIS_URL"],
+)
+CLE_GENERATION_CATALOGUE = "catalogue:generation"
+stats_cache = {"hits": 0, "misses": 0, "bypass": 0}
+
+
+# ---------- COMPRESSION ET CACHE HTTP ----------
+# Réponses texte compressées (gzip, ou brotli si le paquet est installé) à partir
+# de COMPRESSION_SEUIL octets ; COMPRESSION=0 si un proxy devant s'en charge
+app.config["COMPRESSION"] = os.environ.get("COMPRESSION", "1") == "1"
+app.config["COMPRESSION_SEUIL"] = int(os.environ.get("COMPRESSION_SEUIL", 1024))
+app.config["COMPRESSION_NIVEAU_GZIP"] = int(
+    os.environ.get("COMPRESSION_NIVEAU_GZIP", 6)
+)
+app.config["COMPRESSION_QUALITE_BROTLI"] = int(
+    os.environ.get("COMPRESSION_QUALITE_BROTLI", 5)
+)
+# Durée de cache (navigateur, proxy) des pages du catalogue pour un visiteur
+# anonyme sans panier, et des images produits (non versionnées, revalidées après)
+app.config["CACHE_HTTP_TTL"] = int(os.environ.get("CACHE_HTTP_TTL", 60))
+app.config["IMAGES_PRODUITS_TTL"] = int(os.environ.get("IMAGES_PRODUITS_TTL", 86400))
+
+if app.config["COMPRESSION"]:
+    app.wsgi_app = Compression(
+        app.wsgi_app,
+        seuil=app.config["COMPRESSION_SEUIL"],
+        niveau_gzip=app.config["COMPRESSION_NIVEAU_GZIP"],
+        qualite_brotli=app.config["COMPRESSION_QUALITE_BROTLI"],
+    )
+
+CACHE_CONTROL_PRIVE = "private, no-store"
+CACHE_CONTROL_PERSONNALISE = "private, no-cache"
+# Pages du catalogue : partageables tant que page_cacheable() (cf. cache_page)
+ROUTES_CATALOGUE = {"index", "boutique", "produit", "recherche"}
+# Pages personnelles, jamais gardées ; de même pour toutes les routes admin_*
+ROUTES_PRIVEES = {
+    "panier",
+    "commande",
+    "traiter_commande",
+    "mon_compte",
+    "mon_compte_commandes",
+}
+
+
+# ---------- CONFIG PANIERS ----------
+# Backend "sql" (table paniers, partagée entre workers) ou "memoire" (processus)
+app.config["PANIER_BACKEND"] = os.environ.get("PANIER_BACKEND", "sql")
+# Un panier non modifié depuis PANIER_DUREE_JOURS est purgé ; le balayage a lieu
+# toutes les PANIER_PURGE_INTERVALLE secondes (0 : pas de balayage automatique)
+app.config["PANIER_DUREE_JOURS"] = int(os.environ.get("PANIER_DUREE_JOURS", 30))
+app.config["PANIER_PURGE_INTERVALLE"] = int(
+    os.environ.get("PANIER_PURGE_INTERVALLE", 3600)
+)
+
+
+# ---------- CONFIG NOTIFICATIONS ----------
+# Par défaut, le serveur SMTP local de `flask smtp-local` (rien n'est envoyé)
+app.config["MAIL_SERVEUR"] = os.environ.get("MAIL_SERVEUR", "localhost")
+app.config["MAIL_PORT"] = int(os.environ.get("MAIL_PORT", 8025))
+app.config["MAIL_UTILISATEUR"] = os.environ.get("MAIL_UTILISATEUR")
+app.config["MAIL_MOT_DE_PASSE"] = os.environ.get("MAIL_MOT_DE_PASSE")
+app.config["MAIL_STARTTLS"] = os.environ.get("MAIL_STARTTLS") == "1"
+app.config["MAIL_EXPEDITEUR"] = os.environ.get(
+    "MAIL_EXPEDITEUR", "La Maison du Parfum <contact@maisonduparfum.fr>"
+)
+app.config["ADMIN_EMAIL"] = os.environ.get("ADMIN_EMAIL", "")
+app.config["FACTURES_DOSSIER"] = os.path.join(BASE_DIR, "data", "factures")
+app.config["SMTP_LOCAL_DOSSIER"] = os.path.join(BASE_DIR, "data", "mails")
+
+# File de tâches : nouvel essai après TACHES_DELAI_BASE * 2^(essai - 1) secondes,
+# abandon après TACHES_ESSAIS_MAX échecs ; une tâche "en_cours" depuis plus de
+# TACHES_VERROU_EXPIRATION secondes (worker arrêté) est remise en attente
+app.config["TACHES_ESSAIS_MAX"] = int(os.environ.get("TACHES_ESSAIS_MAX", 6))
+app.config["TACHES_DELAI_BASE"] = int(os.environ.get("TACHES_DELAI_BASE", 30))
+app.config["TACHES_INTERVALLE"] = float(os.environ.get("TACHES_INTERVALLE", 2))
+app.config["TACHES_VERROU_EXPIRATION"] = int(
+    os.environ.get("TACHES_VERROU_EXPIRATION", 600)
+)
+
+
+# ---------- INSTRUMENTATION ----------
+# Opt-in (METRIQUES=1) : latence, SQL et rendu par requête, exposés sur
+# /admin/metrics (Prometheus) et dans l'en-tête Server-Timing ; les requêtes
+# plus longues que METRIQUES_SEUIL_LENT_MS sont journalisées avec leur SQL
+app.config["METRIQUES"] = os.environ.get("METRIQUES") == "1"
+app.config["METRIQUES_SEUIL_LENT_MS"] = int(
+    os.environ.get("METRIQUES_SEUIL_LENT_MS", 500)
+)
+# Jeton "Authorization: Bearer ..." du collecteur Prometheus (sinon session admin)
+app.config["METRIQUES_JETON"] = os.environ.get("METRIQUES_JETON", "")
+SQL_CONSERVEES_MAX = 50  # instructions gardées par requête pour le journal lent
+SQL_JOURNALISEES_MAX = 10  # les plus lentes, dans le journal
+
+metriques = Metriques()
+
+
+def mesures_requete():
+    """Mesures de la requête en cours (None hors requête : threads, CLI)."""
+    return g.get("mesures") if has_request_context() else None
+
+
+def debut_requete():
+    g.mesures = {
+        "debut": time.perf_counter(),
+        "sql_nombre": 0,
+        "sql_duree": 0.0,
+        "sql": [],
+        "template_duree": 0.0,
+        "templates_debuts": [],
+    }
+
+
+def fin_requete(response):
+    mesures = g.pop("mesures", None)
+    if mesures is None:
+        return response
+    duree = time.perf_counter() - mesures["debut"]
+    endpoint = request.endpoint or "inconnu"
+    etiquettes = {"endpoint": endpoint, "methode": request.method}
+
+    metriques.incrementer(
+        "http_requetes_total", statut=str(response.status_code), **etiquettes
+    )
+    metriques.observer("http_requete_duree_secondes", duree, **etiquettes)
+    metriques.observer("http_requete_sql_nombre", mesures["sql_nombre"], **etiquettes)
+    metriques.observer(
+        "http_requete_sql_duree_secondes", mesures["sql_duree"], **etiquettes
+    )
+    metriques.observer(
+        "http_requete_template_duree_secondes", mesures["template_duree"], **etiquettes
+    )
+    # Taille inconnue pour les réponses en flux (exports)
+    if response.content_length is not None:
+        metriques.observer(
+            "http_reponse_taille_octets", response.content_length, **etiquettes
+        )
+
+    response.headers["Server-Timing"] = (
+        f"app;dur={duree * 1000:.1f}, "
+        f'db;dur={mesures["sql_duree"] * 1000:.1f};desc="{mesures["sql_nombre"]} SQL", '
+        f"tpl;dur={mesures['template_duree'] * 1000:.1f}"
+    )
+
+    if duree * 1000 >= app.config["METRIQUES_SEUIL_LENT_MS"]:
+        metriques.incrementer("http_requetes_lentes_total", **etiquettes)
+        plus_lentes = sorted(mesures["sql"], key=lambda m: m[0], reverse=True)
+        app.logger.warning(
+            "Requête lente %s %s (%s) : %.0f ms, %d SQL en %.0f ms%s",
+            request.method,
+            request.full_path.rstrip("?"),
+            endpoint,
+            duree * 1000,
+            mesures["sql_nombre"],
+            mesures["sql_duree"] * 1000,
+            "".join(
+                f"\n  {d * 1000:.1f} ms  {' '.join(sql.split())}"
+                for d, sql in plus_lentes[:SQL_JOURNALISEES_MAX]
+            ),
+        )
+    return response
+
+
+def debut_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("debuts_sql", []).append(time.perf_counter())
+
+
+def fin_sql(conn, cursor, statement, parameters, context, executemany):
+    duree = time.perf_counter() - conn.info["debuts_sql"].pop()
+    mesures = mesures_requete()
+    if mesures is None:
+        return
+    mesures["sql_nombre"] += 1
+    mesures["sql_duree"] += duree
+    if len(mesures["sql"]) < SQL_CONSERVEES_MAX:
+        mesures["sql"].append((duree, statement))
+
+
+def erreur_sql(contexte):
+    # after_cursor_execute n'est pas appelé si l'instruction échoue
+    debuts = contexte.connection.info.get("debuts_sql") if contexte.connection else None
+    if debuts:
+        debuts.pop()
+
+
+def debut_template(sender, template, context, **extra):
+    mesures = mesures_requete()
+    if mesures is not None:
+        mesures["templates_debuts"].append(time.perf_counter())
+
+
+def fin_template(sender, template, context, **extra):
+    mesures = mesures_requete()
+    if mesures is not None and mesures["templates_debuts"]:
+        debut = mesures["templates_debuts"].pop()
+        # Un template rendu pendant un autre (fragment) est déjà compté
+        if not mesures["templates_debuts"]:
+            mesures["template_duree"] += time.perf_counter() - debut
+
+
+if app.config["METRIQUES"]:
+    app.before_request(debut_requete)
+    app.after_request(fin_requete)
+    event.listen(Engine, "before_cursor_execute", debut_sql)
+    event.listen(Engine, "after_cursor_execute", fin_sql)
+    event.listen(Engine, "handle_error", erreur_sql)
+    before_render_template.connect(debut_template, app)
+    template_rendered.connect(fin_template, app)
 
 
 # ---------- MODELES ----------
@@ -57,6 +573,7 @@ class Utilisateur(db.Model):
     email = db.Column(db.String(150), unique=True, nullable=False)
     mot_de_passe_hash = db.Column(db.String(255), nullable=False)
     avatar = db.Column(db.String(255), default="avatars/default.png")
+    avatar_variantes = db.Column(db.Text)  # JSON {largeur: chemin sous static/}
     cree_le = db.Column(db.DateTime, default=datetime.utcnow)
 
     commandes = db.relationship("Commande", backref="utilisateur", lazy=True)
@@ -72,6 +589,7 @@ class Produit(db.Model):
     description_courte = db.Column(db.String(255))
     description = db.Column(db.Text)
     image = db.Column(db.String(255))  # nom de fichier dans static/images/products
+    image_variantes = db.Column(db.Text)  # JSON {largeur: chemin sous static/}
     stock = db.Column(db.Integer, default=0)
     notes = db.Column(db.Text)
     contenance = db.Column(db.String(50))
@@ -79,6 +597,22 @@ class Produit(db.Model):
     pour_qui = db.Column(db.String(50))
     cree_le = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Agrégats des avis, maintenus par noter_produit (cf. recalculer-notes)
+    nb_avis = db.Column(db.Integer, nullable=False, default=0)
+    somme_notes = db.Column(db.Integer, nullable=False, default=0)
+    note_moyenne = db.Column(db.Float, nullable=False, default=0)
+
+    # Unités vendues, incrémentées par traiter_commande (cf. recalculer-ventes)
+    nb_ventes = db.Column(db.Integer, nullable=False, default=0)
+
+    # Nouveautés et best-sellers de l'accueil ; produits d'une catégorie (API,
+    # fiche produit). La boutique pagine avec l'index de facettes, en mémoire.
+    __table_args__ = (
+        db.Index("ix_produits_cree_le_id", "cree_le", "id"),
+        db.Index("ix_produits_nb_ventes_id", "nb_ventes", "id"),
+        db.Index("ix_produits_categorie_id", "categorie", "id"),
+    )
+
     lignes_commande = db.relationship("LigneCommande", backref="produit", lazy=True)
     avis = db.relationship("AvisProduit", backref="produit", lazy=True)
 
@@ -99,6 +633,12 @@ class Commande(db.Model):
     total = db.Column(db.Float, nullable=False)
     statut = db.Column(db.String(50), default="en_attente")
 
+    __table_args__ = (
+        db.Index("ix_commandes_date_id", "date", "id"),
+        # Historique d'un client (mon-compte), paginé par curseur sur (date, id)
+        db.Index("ix_commandes_utilisateur_date_id", "utilisateur_id", "date", "id"),
+    )
+
     lignes = db.relationship("LigneCommande", backref="commande", lazy=True)
 
 
@@ -112,130 +652,1645 @@ class LigneCommande(db.Model):
     sous_total = db.Column(db.Float, nullable=False)
 
 
-class AvisProduit(db.Model):
-    __tablename__ = "avis_produits"
-    id = db.Column(db.Integer, primary_key=True)
-    utilisateur_id = db.Column(db.Integer, db.ForeignKey("utilisateurs.id"), nullable=False)
-    produit_id = db.Column(db.Integer, db.ForeignKey("produits.id"), nullable=False)
-    note = db.Column(db.Integer, nullable=False)  # 1 à 5
-    commentaire = db.Column(db.Text)
-    cree_le = db.Column(db.DateTime, default=datetime.utcnow)
+# Agrégats des ventes (jours UTC), cumulés à chaque commande par cumuler_ventes()
+# et reconstruits par `flask recalculer-ventes-journalieres` : les analyses
+# lisent les mois entiers dans ventes_mensuelles et les jours des mois entamés
+# dans ventes_journalieres, au lieu de parcourir lignes_commande. Sous SQLite,
+# tables WITHOUT ROWID : rangées dans l'ordre de la clé, lue par plages de dates
+class VenteJournaliere(db.Model):
+    __tablename__ = "ventes_journalieres"
+    __table_args__ = {"sqlite_with_rowid": False}
+    jour = db.Column(db.Date, primary_key=True)
+    # Sans clé étrangère : l'historique survit à la suppression du produit
+    produit_id = db.Column(db.Integer, primary_key=True)
+    categorie = db.Column(db.String(100), nullable=False)  # au moment de la vente
+    quantite = db.Column(db.Integer, nullable=False, default=0)
+    chiffre_affaires = db.Column(db.Float, nullable=False, default=0)
+    nb_commandes = db.Column(db.Integer, nullable=False, default=0)
+
+
+class VenteMensuelle(db.Model):
+    __tablename__ = "ventes_mensuelles"
+    __table_args__ = {"sqlite_with_rowid": False}
+    mois = db.Column(db.Date, primary_key=True)  # premier jour du mois
+    produit_id = db.Column(db.Integer, primary_key=True)
+    categorie = db.Column(db.String(100), nullable=False)
+    quantite = db.Column(db.Integer, nullable=False, default=0)
+    chiffre_affaires = db.Column(db.Float, nullable=False, default=0)
+    nb_commandes = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CommandeJournaliere(db.Model):
+    __tablename__ = "commandes_journalieres"
+    jour = db.Column(db.Date, primary_key=True)
+    nb_commandes = db.Column(db.Integer, nullable=False, default=0)
+    chiffre_affaires = db.Column(db.Float, nullable=False, default=0)
+
+
+class ProduitSimilaire(db.Model):
+    """Voisins précalculés d'un produit, lus par rang sur la fiche produit."""
+
+    __tablename__ = "produits_similaires"
+    produit_id = db.Column(db.Integer, primary_key=True)
+    rang = db.Column(db.Integer, primary_key=True)  # 0 : le plus proche
+    similaire_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+
+class VersionCatalogue(db.Model):
+    """Version du catalogue (ETag / Last-Modified de l'API) : une ligne unique,
+    partagée par tous les workers, incrémentée par invalider_catalogue()."""
+
+    __tablename__ = "version_catalogue"
+    id = db.Column(db.Integer, primary_key=True)  # toujours 1
+    version = db.Column(db.Integer, nullable=False, default=0)
+    modifie_le = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Panier(db.Model):
+    __tablename__ = "paniers"
+    id = db.Column(db.String(32), primary_key=True)  # "u<id>" ou jeton aléatoire
+    lignes = db.Column(db.Text, nullable=False)  # JSON {produit_id: quantite}
+    modifie_le = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class Tache(db.Model):
+    """Tâche différée (e-mail, facture...), traitée par `flask traiter-taches`."""
+
+    __tablename__ = "taches"
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)  # clé de TRAITEMENTS_TACHES
+    charge = db.Column(db.Text, nullable=False)  # JSON des arguments
+    statut = db.Column(db.String(20), nullable=False, default="en_attente")
+    essais = db.Column(db.Integer, nullable=False, default=0)
+    executer_apres = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    verrouillee_le = db.Column(db.DateTime)
+    derniere_erreur = db.Column(db.Text)
+    cree_le = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_taches_statut_executer_apres", "statut", "executer_apres"),
+    )
+
+
+class AvisProduit(db.Model):
+    __tablename__ = "avis_produits"
+    id = db.Column(db.Integer, primary_key=True)
+    utilisateur_id = db.Column(db.Integer, db.ForeignKey("utilisateurs.id"), nullable=False)
+    produit_id = db.Column(db.Integer, db.ForeignKey("produits.id"), nullable=False)
+    note = db.Column(db.Integer, nullable=False)  # 1 à 5
+    commentaire = db.Column(db.Text)
+    cree_le = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Avis d'un produit (fiche, API), paginés par curseur sur (cree_le, id)
+    __table_args__ = (
+        db.Index("ix_avis_produits_produit_cree_le_id", "produit_id", "cree_le", "id"),
+    )
+
+
+stockage_paniers = creer_stockage(
+    app.config["PANIER_BACKEND"], moteur=lambda: db.engine, table=Panier.__table__
+)
+
+
+# ---------- DECORATEURS ----------
+def admin_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get("admin_logged_in"):
+            return redirect(url_for("admin_login"))
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def client_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get("user_id"):
+            return redirect(url_for("connexion", next=request.path))
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def page_cacheable() -> bool:
+    """Une page n'est partagée en cache que pour un visiteur anonyme sans panier."""
+    if request.method != "GET":
+        return False
+    return not any(
+        session.get(cle)
+        for cle in ("user_id", "admin_logged_in", "panier_id", "_flashes")
+    )
+
+
+def cache_page(f):
+    """Met en cache la réponse d'une page du catalogue (clé : route + arguments)."""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not page_cacheable():
+            stats_cache["bypass"] += 1
+            return f(*args, **kwargs)
+
+        generation = cache_pages.compteur(CLE_GENERATION_CATALOGUE)
+        cle = "page:{}:{}:{}:{}".format(
+            generation,
+            request.endpoint,
+            sorted(kwargs.items()),
+            sorted(request.args.items(multi=True)),
+        )
+        entree = cache_pages.get(cle)
+        if entree is not None:
+            stats_cache["hits"] += 1
+            corps, content_type = entree
+            response = app.response_class(corps, content_type=content_type)
+            response.headers["X-Cache"] = "HIT"
+            return response
+
+        stats_cache["misses"] += 1
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            cache_pages.set(
+                cle,
+                (response.get_data(), response.content_type),
+                app.config["CACHE_TTL"],
+            )
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+    return decorated_function
+
+
+def version_catalogue():
+    """(ETag, Last-Modified) du catalogue, identiques pour tous les workers.
+
+    La version de version_catalogue suit les modifications du catalogue. Le
+    stock et nb_ventes, changés par chaque commande, sont suivis par la dernière
+    commande antérieure à la tranche de API_VENTES_INTERVALLE en cours (index
+    ix_commandes_date_id) : sans vente, l'ETag ne change pas ; avec des ventes,
+    il change au plus une fois par tranche, sans qu'une commande n'écrive rien
+    de plus. None si la base n'est pas migrée.
+    """
+    ligne = db.session.execute(
+        db.select(VersionCatalogue.version, VersionCatalogue.modifie_le).where(
+            VersionCatalogue.id == 1
+        )
+    ).first()
+    if ligne is None:
+        return None
+    debut_tranche = datetime.fromtimestamp(
+        time.time() // API_VENTES_INTERVALLE * API_VENTES_INTERVALLE, timezone.utc
+    ).replace(tzinfo=None)
+    derniere_vente = db.session.execute(
+        db.select(Commande.id, Commande.date)
+        .where(Commande.date < debut_tranche)
+        .order_by(Commande.date.desc(), Commande.id.desc())
+        .limit(1)
+    ).first()
+    modifie_le = ligne.modifie_le
+    if derniere_vente is not None:
+        modifie_le = max(modifie_le, derniere_vente.date)
+    return (
+        f"catalogue-{ligne.version}-{derniere_vente.id if derniere_vente else 0}",
+        modifie_le.replace(microsecond=0, tzinfo=timezone.utc),
+    )
+
+
+def reponse_catalogue(f):
+    """Réponse conditionnelle de l'API : 304, sans exécuter la vue, tant que le
+    client (If-None-Match / If-Modified-Since) a la version courante."""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        version = version_catalogue()
+        if version and not is_resource_modified(
+            request.environ, etag=version[0], last_modified=version[1]
+        ):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+        if version and response.status_code in (200, 304):
+            response.set_etag(version[0])
+            response.last_modified = version[1]
+        response.headers["Cache-Control"] = "public, no-cache"
+        return response
+
+    return decorated_function
+
+
+@app.after_request
+def politique_cache(response):
+    """Cache-Control par route, sauf s'il est déjà fixé (API, statiques, badge)."""
+    if "Cache-Control" in response.headers:
+        return response
+    endpoint = request.endpoint or ""
+    if endpoint in ROUTES_PRIVEES or endpoint.startswith("admin_"):
+        response.headers["Cache-Control"] = CACHE_CONTROL_PRIVE
+    elif endpoint in ROUTES_CATALOGUE and response.status_code == 200:
+        # Le contenu dépend de la session : un cache ne la partage qu'entre
+        # requêtes sans cookie, ou avec le même cookie
+        response.vary.add("Cookie")
+        if page_cacheable() and not session.modified:
+            response.headers["Cache-Control"] = "public, max-age={}".format(
+                app.config["CACHE_HTTP_TTL"]
+            )
+        else:
+            response.headers["Cache-Control"] = CACHE_CONTROL_PERSONNALISE
+    return response
+
+
+# ---------- UTILS ----------
+def allowed_file(filename: str) -> bool:
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def encoder_curseur(valeur, produit_id: int) -> str:
+    """Curseur opaque de pagination : position (clé de tri, id) d'un produit."""
+    if isinstance(valeur, datetime):
+        valeur = valeur.isoformat()
+    return f"{valeur}_{produit_id}"
+
+
+def decoder_curseur(curseur: str, convertir=datetime.fromisoformat):
+    """Renvoie le tuple (clé de tri, id) d'un curseur, ou None s'il est invalide."""
+    try:
+        valeur, produit_id = curseur.rsplit("_", 1)
+        return convertir(valeur), int(produit_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def page_commandes_client(utilisateur_id, curseur):
+    """Une page de l'historique d'un client, les plus récentes d'abord.
+
+    Pagination par curseur sur (date, id) ; les lignes et leurs produits sont
+    chargés en deux requêtes groupées pour toute la page. Renvoie
+    (commandes, curseur de la page suivante ou None).
+    """
+    query = Commande.query.filter(Commande.utilisateur_id == utilisateur_id)
+    position = decoder_curseur(curseur) if curseur else None
+    if position:
+        query = query.filter(db.tuple_(Commande.date, Commande.id) < position)
+
+    commandes = (
+        query.options(
+            db.selectinload(Commande.lignes).joinedload(LigneCommande.produit)
+        )
+        .order_by(Commande.date.desc(), Commande.id.desc())
+        .limit(MON_COMPTE_COMMANDES_PAR_PAGE + 1)
+        .all()
+    )
+    if len(commandes) > MON_COMPTE_COMMANDES_PAR_PAGE:
+        commandes = commandes[:MON_COMPTE_COMMANDES_PAR_PAGE]
+        dernier = commandes[-1]
+        return commandes, encoder_curseur(dernier.date, dernier.id)
+    return commandes, None
+
+
+def resoudre_panier(panier):
+    """Charge tous les produits du panier en une seule requête.
+
+    `panier` est un dict {produit_id: quantite}. Renvoie (lignes, total) : une
+    ligne par article encore en catalogue, avec le produit, la quantité et le
+    sous-total calculé une seule fois.
+    """
+    if not panier:
+        return [], 0
+
+    produits = {p.id: p for p in Produit.query.filter(Produit.id.in_(panier))}
+
+    lignes = []
+    total = 0
+    for produit_id, quantite in panier.items():
+        produit = produits.get(produit_id)
+        if produit:
+            sous_total = produit.prix * quantite
+            lignes.append(
+                {
+                    "id": produit.id,
+                    "produit": produit,
+                    "nom": produit.nom,
+                    "image": produit.image,
+                    "description_courte": produit.description_courte,
+                    "prix": produit.prix,
+                    "quantite": quantite,
+                    "sous_total": sous_total,
+                }
+            )
+            total += sous_total
+
+    return lignes, total
+
+
+def lire_panier() -> dict:
+    """Lignes {produit_id: quantite} du panier du visiteur."""
+    panier_id = session.get("panier_id")
+    lignes = stockage_paniers.lire(panier_id) if panier_id else {}
+    g.panier_count = len(lignes)
+    return lignes
+
+
+def enregistrer_panier(lignes):
+    """Enregistre le panier du visiteur ; un panier vide est supprimé."""
+    g.panier_count = len(lignes)
+    panier_id = session.get("panier_id")
+    if not lignes:
+        if panier_id:
+            stockage_paniers.supprimer(panier_id)
+            session.pop("panier_id", None)
+        return
+    if not panier_id:
+        panier_id = panier_utilisateur(session.get("user_id")) or secrets.token_hex(8)
+        session["panier_id"] = panier_id
+    stockage_paniers.ecrire(panier_id, lignes)
+
+
+def compter_panier() -> int:
+    """Nombre d'articles du panier, lu au plus une fois par requête."""
+    if "panier_count" not in g:
+        lire_panier()
+    return g.panier_count
+
+
+@app.context_processor
+def injecter_panier_count():
+    # Sans panier en session, aucune lecture : 0 (cas des pages en cache)
+    return {"panier_count": compter_panier() if session.get("panier_id") else 0}
+
+
+def panier_utilisateur(user_id):
+    """Identifiant du panier rattaché à un compte client (None si anonyme)."""
+    return f"u{user_id}" if user_id else None
+
+
+def rattacher_panier(user_id):
+    """À la connexion : fusionne le panier anonyme dans celui du compte."""
+    panier_id = panier_utilisateur(user_id)
+    anonyme_id = session.get("panier_id")
+    lignes = stockage_paniers.lire(panier_id)
+    if anonyme_id and anonyme_id != panier_id:
+        anonyme = stockage_paniers.lire(anonyme_id)
+        if anonyme:
+            lignes = fusionner(lignes, anonyme)
+            lignes = borner(lignes, stocks_produits(lignes))
+            stockage_paniers.ecrire(panier_id, lignes)
+        stockage_paniers.supprimer(anonyme_id)
+    if lignes:
+        session["panier_id"] = panier_id
+    else:
+        session.pop("panier_id", None)
+
+
+def purger_paniers() -> int:
+    """Supprime les paniers abandonnés depuis plus de PANIER_DUREE_JOURS."""
+    return stockage_paniers.purger(
+        datetime.utcnow() - timedelta(days=app.config["PANIER_DUREE_JOURS"])
+    )
+
+
+def balayer_paniers(intervalle):
+    """Boucle du thread de purge des paniers abandonnés."""
+    while True:
+        time.sleep(intervalle)
+        try:
+            with app.app_context():
+                purger_paniers()
+        except Exception:
+            app.logger.exception("Échec de la purge des paniers abandonnés")
+
+
+def demarrer_balayage_paniers():
+    intervalle = app.config["PANIER_PURGE_INTERVALLE"]
+    if intervalle > 0:
+        threading.Thread(
+            target=balayer_paniers, args=(intervalle,), name="paniers", daemon=True
+        ).start()
+
+
+@app.template_global()
+def srcset(variantes_json) -> str:
+    """Attribut srcset à partir des variantes JSON d'une image."""
+    if not variantes_json:
+        return ""
+    variantes = json.loads(variantes_json)
+    return ", ".join(
+        f"{url_for('static', filename=chemin)} {largeur}w"
+        for largeur, chemin in sorted(variantes.items(), key=lambda v: int(v[0]))
+    )
+
+
+# Colonnes lues pour construire l'index de facettes de la boutique
+COLONNES_FACETTES = (
+    Produit.id,
+    Produit.categorie,
+    Produit.pour_qui,
+    Produit.contenance,
+    Produit.type_peau,
+    Produit.prix,
+    Produit.nb_avis,
+    Produit.note_moyenne,
+    Produit.cree_le,
+)
+
+
+def invalider_catalogue():
+    """Rend obsolètes toutes les pages du catalogue en cache et les ETag de l'API.
+
+    À appeler après le commit des modifications : la nouvelle version est
+    validée dans sa propre transaction. Pas à chaque commande (cf.
+    version_catalogue), qui se bloqueraient sur cette ligne unique.
+    """
+    maintenant = datetime.utcnow()
+    resultat = db.session.execute(
+        db.update(VersionCatalogue)
+        .where(VersionCatalogue.id == 1)
+        .values(version=VersionCatalogue.version + 1, modifie_le=maintenant)
+    )
+    if resultat.rowcount == 0:
+        db.session.add(VersionCatalogue(id=1, version=1, modifie_le=maintenant))
+    db.session.commit()
+    cache_pages.incr(CLE_GENERATION_CATALOGUE)
+
+
+def reserver_stock(lignes) -> bool:
+    """Décrémente le stock de chaque ligne par un UPDATE conditionnel.
+
+    Chaque UPDATE ne touche la ligne que si `stock >= quantite` : la base
+    arbitre les accès concurrents, sans lecture préalable du stock. Le compteur
+    des best-sellers est incrémenté dans la même instruction. Renvoie False si
+    une ligne n'a pas pu être servie, ou si une quantité n'est pas positive
+    (elle augmenterait le stock) ; l'appelant doit alors annuler la transaction.
+    """
+    if any(ligne["quantite"] < 1 for ligne in lignes):
+        return False
+
+    produits_table = Produit.__table__
+    quantite = db.bindparam("ligne_qte")
+    requete = (
+        db.update(produits_table)
+        .where(
+            produits_table.c.id == db.bindparam("ligne_produit_id"),
+            produits_table.c.stock >= quantite,
+            quantite > 0,  # garde-fou, en plus du contrôle ci-dessus
+        )
+        .values(
+            stock=produits_table.c.stock - quantite,
+            nb_ventes=produits_table.c.nb_ventes + quantite,
+        )
+    )
+    parametres = [
+        {"ligne_produit_id": ligne["id"], "ligne_qte": ligne["quantite"]}
+        for ligne in lignes
+    ]
+
+    # executemany si le pilote remonte le total des lignes modifiées
+    if db.engine.dialect.supports_sane_multi_rowcount:
+        return db.session.execute(requete, parametres).rowcount == len(parametres)
+    return all(db.session.execute(requete, p).rowcount == 1 for p in parametres)
+
+
+def cumuler(modele, lignes, cles, compteurs):
+    """INSERT ... ON CONFLICT DO UPDATE en une instruction (executemany).
+
+    Une ligne existante (mêmes `cles`) voit ses `compteurs` augmentés des
+    valeurs fournies ; sans conflit possible entre transactions concurrentes.
+    """
+    table = modele.__table__
+    insert = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}[
+        db.engine.dialect.name
+    ]
+    requete = insert(table)
+    requete = requete.on_conflict_do_update(
+        index_elements=cles,
+        set_={c: table.c[c] + requete.excluded[c] for c in compteurs},
+    )
+    db.session.execute(requete, lignes)
+
+
+def cumuler_ventes(commande, lignes):
+    """Ajoute une commande (dans sa transaction) aux agrégats des ventes."""
+    jour = commande.date.date()
+    cumuler(
+        CommandeJournaliere,
+        [{"jour": jour, "nb_commandes": 1, "chiffre_affaires": commande.total}],
+        ["jour"],
+        ["nb_commandes", "chiffre_affaires"],
+    )
+    ventes = [
+        {
+            "produit_id": ligne["id"],
+            "categorie": ligne["produit"].categorie,
+            "quantite": ligne["quantite"],
+            "chiffre_affaires": ligne["sous_total"],
+            "nb_commandes": 1,
+        }
+        for ligne in lignes
+    ]
+    compteurs = ["quantite", "chiffre_affaires", "nb_commandes"]
+    cumuler(
+        VenteJournaliere,
+        [{"jour": jour, **vente} for vente in ventes],
+        ["jour", "produit_id"],
+        compteurs,
+    )
+    cumuler(
+        VenteMensuelle,
+        [{"mois": jour.replace(day=1), **vente} for vente in ventes],
+        ["mois", "produit_id"],
+        compteurs,
+    )
+
+
+def stocks_produits(ids) -> dict:
+    """{produit_id: stock} des produits existants parmi `ids` (une seule requête)."""
+    return dict(db.session.query(Produit.id, Produit.stock).filter(Produit.id.in_(ids)))
+
+
+def ajuster_panier_au_stock(panier):
+    """Ramène chaque ligne du panier au stock disponible (une seule requête)."""
+    return borner(panier, stocks_produits(panier))
+
+
+def enregistrer_variantes(modele, objet_id, colonne, valeur, chemin, largeurs):
+    """Génère les variantes d'une image puis les enregistre sur le modèle.
+
+    Exécuté dans le pool `traitement_images`. L'enregistrement est ignoré si
+    l'image a été remplacée entre-temps (colonne != valeur) ; le catalogue
+    n'est invalidé que si les variantes d'un produit ont été enregistrées.
+    """
+    try:
+        variantes = generer_variantes(chemin, largeurs)
+        if not variantes:
+            return
+        dossier_url = os.path.relpath(os.path.dirname(chemin), "static")
+        chemins = {
+            largeur: f"{dossier_url}/variantes/{fichier}".replace(os.sep, "/")
+            for largeur, fichier in variantes.items()
+        }
+        with app.app_context():
+            resultat = db.session.execute(
+                db.update(modele)
+                .where(modele.id == objet_id, getattr(modele, colonne) == valeur)
+                .values({colonne + "_variantes": json.dumps(chemins)})
+            )
+            db.session.commit()
+            # Seules les images produits figurent dans les pages du catalogue
+            if modele is Produit and resultat.rowcount == 1:
+                invalider_catalogue()
+    except Exception:
+        app.logger.exception("Échec de la génération des variantes de %s", chemin)
+
+
+def planifier_variantes(objet, colonne, chemin, largeurs):
+    """Confie la génération des variantes de `objet.<colonne>` au pool d'images."""
+    traitement_images.submit(
+        enregistrer_variantes,
+        type(objet),
+        objet.id,
+        colonne,
+        getattr(objet, colonne),
+        chemin,
+        largeurs,
+    )
+
+
+# ---------- TÂCHES DIFFÉRÉES ----------
+TRAITEMENTS_TACHES = {}
+
+
+def traitement_tache(type_tache):
+    """Enregistre la fonction qui exécute les tâches de type `type_tache`."""
+
+    def enregistrer(f):
+        TRAITEMENTS_TACHES[type_tache] = f
+        return f
+
+    return enregistrer
+
+
+def planifier_tache(type_tache, **charge):
+    """Ajoute une tâche à la transaction en cours (outbox).
+
+    La tâche n'existe que si l'appelant valide sa transaction : pas de tâche
+    pour une commande annulée, pas de commande sans ses tâches.
+    """
+    db.session.add(Tache(type=type_tache, charge=json.dumps(charge)))
+
+
+def liberer_taches_bloquees():
+    """Remet en attente les tâches d'un worker arrêté en cours de traitement."""
+    limite = datetime.utcnow() - timedelta(
+        seconds=app.config["TACHES_VERROU_EXPIRATION"]
+    )
+    db.session.execute(
+        db.update(Tache)
+        .where(Tache.statut == "en_cours", Tache.verrouillee_le < limite)
+        .values(statut="en_attente", verrouillee_le=None)
+    )
+    db.session.commit()
+
+
+def reserver_tache():
+    """Prend la prochaine tâche due, ou None.
+
+    Comme reserver_stock, un UPDATE conditionnel arbitre entre workers
+    concurrents : une tâche n'est prise que si elle est encore en attente.
+    """
+    maintenant = datetime.utcnow()
+    candidates = (
+        db.session.query(Tache.id)
+        .filter(Tache.statut == "en_attente", Tache.executer_apres <= maintenant)
+        .order_by(Tache.executer_apres, Tache.id)
+        .limit(10)
+        .all()
+    )
+    for (tache_id,) in candidates:
+        prise = db.session.execute(
+            db.update(Tache)
+            .where(Tache.id == tache_id, Tache.statut == "en_attente")
+            .values(statut="en_cours", verrouillee_le=maintenant)
+        ).rowcount
+        db.session.commit()
+        if prise:
+            return db.session.get(Tache, tache_id)
+    return None
+
+
+def executer_tache(tache):
+    """Exécute une tâche réservée ; en cas d'échec, la replanifie plus tard."""
+    try:
+        TRAITEMENTS_TACHES[tache.type](**json.loads(tache.charge))
+    except Exception as exc:
+        db.session.rollback()
+        tache.essais += 1
+        tache.derniere_erreur = repr(exc)[:1000]
+        if tache.essais >= app.config["TACHES_ESSAIS_MAX"]:
+            tache.statut = "echouee"
+            app.logger.error(
+                "Tâche %s (%s) abandonnée : %r", tache.id, tache.type, exc
+            )
+        else:
+            tache.statut = "en_attente"
+            tache.executer_apres = datetime.utcnow() + timedelta(
+                seconds=app.config["TACHES_DELAI_BASE"] * 2 ** (tache.essais - 1)
+            )
+            app.logger.warning(
+                "Tâche %s (%s) en échec : %r", tache.id, tache.type, exc
+            )
+    else:
+        tache.statut = "terminee"
+    tache.verrouillee_le = None
+    db.session.commit()
+
+
+def traiter_taches(une_fois=False):
+    """Boucle du worker ; avec une_fois, s'arrête quand plus rien n'est dû."""
+    while True:
+        liberer_taches_bloquees()
+        tache = reserver_tache()
+        if tache is not None:
+            executer_tache(tache)
+        elif une_fois:
+            return
+        else:
+            time.sleep(app.config["TACHES_INTERVALLE"])
+
+
+def chemin_facture(commande_id) -> str:
+    return os.path.join(app.config["FACTURES_DOSSIER"], f"facture-{commande_id}.pdf")
+
+
+def envoyer(destinataire, sujet, corps, pieces_jointes=()):
+    envoyer_mail(
+        composer_mail(
+            app.config["MAIL_EXPEDITEUR"], destinataire, sujet, corps, pieces_jointes
+        ),
+        app.config["MAIL_SERVEUR"],
+        app.config["MAIL_PORT"],
+        utilisateur=app.config["MAIL_UTILISATEUR"],
+        mot_de_passe=app.config["MAIL_MOT_DE_PASSE"],
+        starttls=app.config["MAIL_STARTTLS"],
+    )
+
+
+def charger_commande(commande_id):
+    return Commande.query.options(
+        db.selectinload(Commande.lignes).joinedload(LigneCommande.produit)
+    ).get(commande_id)
+
+
+@traitement_tache("facture")
+def generer_facture(commande_id):
+    """Écrit la facture PDF de la commande (idempotent)."""
+    chemin = chemin_facture(commande_id)
+    if os.path.exists(chemin):
+        return chemin
+    commande = charger_commande(commande_id)
+    lignes = [
+        (
+            ligne.produit.nom if ligne.produit else f"Produit #{ligne.produit_id}",
+            ligne.quantite,
+            ligne.prix_unitaire,
+            ligne.sous_total,
+        )
+        for ligne in commande.lignes
+    ]
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    with open(chemin + ".tmp", "wb") as f:
+        f.write(facture_pdf(commande, lignes))
+    os.replace(chemin + ".tmp", chemin)
+    return chemin
+
+
+@traitement_tache("mail_confirmation")
+def envoyer_confirmation(commande_id):
+    """E-mail de confirmation au client, facture en pièce jointe."""
+    commande = charger_commande(commande_id)
+    if not commande.email:
+        return
+    with open(generer_facture(commande_id), "rb") as f:
+        facture = f.read()
+    articles = "\n".join(
+        f"- {ligne.produit.nom if ligne.produit else ligne.produit_id} "
+        f"x {ligne.quantite} : {ligne.sous_total:.2f} €"
+        for ligne in commande.lignes
+    )
+    envoyer(
+        commande.email,
+        f"Votre commande n° {commande.id}",
+        f"Bonjour {commande.prenom or ''},\n\n"
+        f"Merci pour votre commande n° {commande.id} :\n{articles}\n\n"
+        f"Total : {commande.total:.2f} €\n\n"
+        "Votre facture est jointe à ce message.\n\nLa Maison du Parfum",
+        [(f"facture-{commande.id}.pdf", "application/pdf", facture)],
+    )
+
+
+@traitement_tache("alerte_admin")
+def alerter_admin(commande_id):
+    """Prévient l'administration d'une nouvelle commande (si ADMIN_EMAIL)."""
+    if not app.config["ADMIN_EMAIL"]:
+        return
+    commande = db.session.get(Commande, commande_id)
+    envoyer(
+        app.config["ADMIN_EMAIL"],
+        f"Nouvelle commande n° {commande.id} ({commande.total:.2f} €)",
+        f"Commande n° {commande.id} de {commande.prenom or ''} {commande.nom or ''} "
+        f"<{commande.email or '-'}>, {commande.total:.2f} €.",
+    )
+
+
+# ---------- IMPORT / EXPORT ----------
+class RapportImport:
+    def __init__(self):
+        self.importes = 0
+        self.rejetes = 0
+        self.erreurs = []
+
+    def rejeter(self, numero, raison):
+        self.rejetes += 1
+        if len(self.erreurs) < IMPORT_ERREURS_MAX:
+            self.erreurs.append(f"Enregistrement {numero} : {raison}")
+
+    def en_dict(self) -> dict:
+        return {
+            "importes": self.importes,
+            "rejetes": self.rejetes,
+            "erreurs": self.erreurs,
+        }
+
+
+def ids_existants(modele, ids) -> set:
+    if not ids:
+        return set()
+    return {i for (i,) in db.session.query(modele.id).filter(modele.id.in_(ids))}
+
+
+def avancer_sequence(modele):
+    """PostgreSQL : la séquence de l'id reprend après le plus grand id importé.
+
+    Les INSERT avec un id explicite n'avancent pas la séquence ; sans cela, le
+    prochain INSERT ordinaire heurterait un id existant. (SQLite repart
+    toujours du plus grand id.)
+    """
+    if db.engine.dialect.name != "postgresql":
+        return
+    table = modele.__tablename__
+    db.session.execute(
+        db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        )
+    )
+    db.session.commit()
+
+
+def importer_produits(flux, format) -> RapportImport:
+    """Importe des produits par lots (INSERT / UPDATE en executemany).
+
+    Un enregistrement dont l'id existe déjà met à jour le produit (seulement
+    les champs présents) ; sinon il est créé.
+    """
+    rapport = RapportImport()
+    enregistrements = enumerate(lire_enregistrements(flux, format), start=1)
+    for lot in par_lots(enregistrements, IMPORT_LOT):
+        produits = {}  # id (ou numéro si sans id) -> colonnes ; le dernier l'emporte
+        for numero, enregistrement in lot:
+            try:
+                produit = normaliser_produit(enregistrement)
+            except (ValueError, TypeError, AttributeError) as exc:
+                rapport.rejeter(numero, exc)
+                continue
+            produits[produit.get("id", f"#{numero}")] = (numero, produit)
+
+        existants = ids_existants(
+            Produit, [cle for cle in produits if isinstance(cle, int)]
+        )
+        a_creer, a_modifier = [], []
+        for cle, (numero, produit) in produits.items():
+            if cle in existants:
+                a_modifier.append(produit)
+            elif {"nom", "prix", "categorie"} <= produit.keys():
+                a_creer.append(produit)
+            else:
+                rapport.rejeter(numero, "produit inconnu et incomplet")
+
+        if a_creer:
+            db.session.execute(db.insert(Produit), a_creer)
+        if a_modifier:
+            db.session.execute(db.update(Produit), a_modifier)
+        db.session.commit()
+        rapport.importes += len(a_creer) + len(a_modifier)
+
+    avancer_sequence(Produit)
+    invalider_catalogue()
+    index_facettes.invalider()
+    return rapport
+
+
+def importer_commandes(flux, format) -> RapportImport:
+    """Importe des commandes au format de data/commandes.json, par lots.
+
+    Une commande dont l'id existe déjà est rejetée, jamais remplacée : l'id
+    peut être celui d'une commande passée depuis sur la boutique. Le prix
+    unitaire des lignes est le prix actuel du produit ; les commandes
+    sont rattachées au compte client de même e-mail. Le stock n'est pas
+    modifié ; le classement des ventes est recalculé à la fin.
+    """
+    if format != "json":
+        raise ValueError("Les commandes s'importent au format JSON.")
+    rapport = RapportImport()
+    enregistrements = enumerate(lire_enregistrements(flux, format), start=1)
+    for lot in par_lots(enregistrements, IMPORT_LOT):
+        commandes = {}
+        for numero, enregistrement in lot:
+            try:
+                entete, lignes = normaliser_commande(enregistrement)
+            except (ValueError, TypeError, KeyError, AttributeError) as exc:
+                rapport.rejeter(numero, f"champ invalide ou manquant ({exc})")
+                continue
+            commandes[entete["id"]] = (numero, entete, lignes)
+
+        prix = dict(
+            db.session.query(Produit.id, Produit.prix).filter(
+                Produit.id.in_(
+                    {p for _, _, lignes in commandes.values() for p, _ in lignes}
+                )
+            )
+        )
+        utilisateurs = dict(
+            db.session.query(Utilisateur.email, Utilisateur.id).filter(
+                Utilisateur.email.in_(
+                    {e["email"] for _, e, _ in commandes.values() if e["email"]}
+                )
+            )
+        )
+        existants = ids_existants(Commande, list(commandes))
+
+        a_creer, lignes_commande = [], []
+        for commande_id, (numero, entete, lignes) in commandes.items():
+            if commande_id in existants:
+                rapport.rejeter(numero, f"la commande {commande_id} existe déjà")
+                continue
+            inconnus = [p for p, _ in lignes if p not in prix]
+            if inconnus:
+                rapport.rejeter(numero, f"produit(s) inconnu(s) {inconnus}")
+                continue
+            entete["utilisateur_id"] = utilisateurs.get(entete["email"])
+            a_creer.append(entete)
+            lignes_commande += [
+                {
+                    "commande_id": commande_id,
+                    "produit_id": produit_id,
+                    "quantite": quantite,
+                    "prix_unitaire": prix[produit_id],
+                    "sous_total": prix[produit_id] * quantite,
+                }
+                for produit_id, quantite in lignes
+            ]
+
+        if a_creer:
+            db.session.execute(db.insert(Commande), a_creer)
+        if lignes_commande:
+            db.session.execute(db.insert(LigneCommande), lignes_commande)
+        db.session.commit()
+        rapport.importes += len(a_creer)
+
+    avancer_sequence(Commande)
+    recalculer_ventes()
+    recalculer_ventes_journalieres()
+    invalider_catalogue()
+    return rapport
+
+
+def exporter_produits(format):
+    """Morceaux du fichier d'export des produits, lus par lots en base."""
+    lignes = db.session.execute(
+        db.select(*(getattr(Produit, c) for c in COLONNES_PRODUIT))
+        .order_by(Produit.id)
+        .execution_options(yield_per=EXPORT_LOT)
+    )
+    if format == "csv":
+        return ecrire_csv(COLONNES_PRODUIT, lignes)
+    return ecrire_json(dict(ligne._mapping) for ligne in lignes)
+
+
+def commandes_exportees():
+    """Commandes au format de data/commandes.json, par lots (pagination par id)."""
+    colonnes = [Commande.id, Commande.date, Commande.total, Commande.statut] + [
+        getattr(Commande, champ) for champ in CHAMPS_CLIENT
+    ]
+    dernier_id = 0
+    while True:
+        commandes = db.session.execute(
+            db.select(*colonnes)
+            .where(Commande.id > dernier_id)
+            .order_by(Commande.id)
+            .limit(EXPORT_LOT)
+        ).all()
+        if not commandes:
+            return
+        lignes = {}
+        for ligne in db.session.execute(
+            db.select(
+                LigneCommande.commande_id,
+                LigneCommande.produit_id,
+                LigneCommande.quantite,
+                LigneCommande.prix_unitaire,
+                LigneCommande.sous_total,
+            )
+            .where(LigneCommande.commande_id.in_([c.id for c in commandes]))
+            .order_by(LigneCommande.commande_id, LigneCommande.id)
+        ):
+            lignes.setdefault(ligne.commande_id, []).append(
+                {
+                    "id": ligne.produit_id,
+                    "quantite": ligne.quantite,
+                    "prix_unitaire": ligne.prix_unitaire,
+                    "sous_total": ligne.sous_total,
+                }
+            )
+        for commande in commandes:
+            yield {
+                "id": commande.id,
+                "date": (
+                    commande.date.strftime("%Y-%m-%d %H:%M:%S")
+                    if commande.date
+                    else None
+                ),
+                "client": {champ: getattr(commande, champ) for champ in CHAMPS_CLIENT},
+                "produits": lignes.get(commande.id, []),
+                "total": commande.total,
+                "statut": commande.statut,
+            }
+        dernier_id = commandes[-1].id
+
+
+def exporter_commandes(format):
+    """Morceaux du fichier d'export des commandes (CSV : une ligne par article)."""
+    if format == "json":
+        return ecrire_json(commandes_exportees())
+
+    def lignes_csv():
+        for commande in commandes_exportees():
+            entete = [commande["id"], commande["date"]] + [
+                commande["client"][champ] for champ in CHAMPS_CLIENT
+            ]
+            entete += [commande["total"], commande["statut"]]
+            for ligne in commande["produits"] or [{}]:
+                yield entete + [
+                    ligne.get(cle)
+                    for cle in ("id", "quantite", "prix_unitaire", "sous_total")
+                ]
+
+    return ecrire_csv(COLONNES_COMMANDE_CSV, lignes_csv())
+
+
+IMPORTS = {"produits": importer_produits, "commandes": importer_commandes}
+EXPORTS = {"produits": exporter_produits, "commandes": exporter_commandes}
+TYPES_EXPORT = {"csv": "text/csv", "json": "application/json"}
+
+
+def seed_initial_products():
+    """Insère quelques produits de démo si la table est vide."""
+    if Produit.query.count() == 0:
+        p1 = Produit(
+            nom="Parfum Élégance",
+            prix=89.90,
+            categorie="parfums",
+            description_courte="Un parfum raffiné aux notes florales et boisées",
+            description="Ce parfum délicat mêle des notes de rose, de jasmin et de santal pour une élégance intemporelle. Parfait pour les occasions spéciales.",
+            image="parfum-elegance.jpg",
+            stock=15,
+            notes="Notes de tête: Bergamote, Notes de cœur: Rose, Jasmin, Notes de fond: Santal, Vanille",
+            contenance="100ml",
+            type_peau="Tous types",
+            pour_qui="Femme",
+        )
+        p2 = Produit(
+            nom="Crème Hydratante Luxe",
+            prix=45.50,
+            categorie="soins-visage",
+            description_courte="Hydratation intense pour une peau rayonnante",
+            description="Cette crème riche en actifs naturels nourrit en profondeur et redonne éclat à votre peau. Formulée avec de l'acide hyaluronique et des extraits de rose.",
+            image="creme-hydratante.jpg",
+            stock=25,
+            notes="",
+            contenance="50ml",
+            type_peau="Peau sèche et normale",
+            pour_qui="Femme",
+        )
+        db.session.add_all([p1, p2])
+        db.session.commit()
+
+
+# Index plein texte FTS5 (SQLite) : accents ignorés, index de préfixes pour
+# l'autocomplétion, synchronisé avec produits par des triggers
+RECHERCHE_COLONNES = ("nom", "description_courte", "description", "notes", "type_peau")
+RECHERCHE_POIDS = (10.0, 4.0, 1.0, 2.0, 2.0)  # pondération BM25 par colonne
+_colonnes = ", ".join(RECHERCHE_COLONNES)
+_nouvelles = ", ".join("new." + c for c in RECHERCHE_COLONNES)
+_anciennes = ", ".join("old." + c for c in RECHERCHE_COLONNES)
+DDL_RECHERCHE = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS produits_fts USING fts5(
+        {_colonnes}, content='produits', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS produits_fts_ai AFTER INSERT ON produits BEGIN
+        INSERT INTO produits_fts(rowid, {_colonnes}) VALUES (new.id, {_nouvelles});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS produits_fts_ad AFTER DELETE ON produits BEGIN
+        INSERT INTO produits_fts(produits_fts, rowid, {_colonnes})
+        VALUES ('delete', old.id, {_anciennes});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS produits_fts_au
+    AFTER UPDATE OF {_colonnes} ON produits BEGIN
+        INSERT INTO produits_fts(produits_fts, rowid, {_colonnes})
+        VALUES ('delete', old.id, {_anciennes});
+        INSERT INTO produits_fts(rowid, {_colonnes}) VALUES (new.id, {_nouvelles});
+    END""",
+)
+
+
+def recherche_fts_disponible() -> bool:
+    return db.engine.dialect.name == "sqlite"
+
+
+def creer_index_recherche(reconstruire=False):
+    """Crée la table produits_fts et ses triggers ; l'alimente à la création."""
+    if not recherche_fts_disponible():
+        return
+    existe = db.session.execute(
+        db.text("SELECT 1 FROM sqlite_master WHERE name = 'produits_fts'")
+    ).first()
+    for ddl in DDL_RECHERCHE:
+        db.session.execute(db.text(ddl))
+    if reconstruire or not existe:
+        db.session.execute(
+            db.text("INSERT INTO produits_fts(produits_fts) VALUES ('rebuild')")
+        )
+    db.session.commit()
+
+
+def rechercher_produits(texte: str, limite: int, offset: int = 0):
+    """Produits correspondant à `texte`, les plus pertinents d'abord (BM25).
+
+    Chaque mot est cherché en préfixe ("cre" trouve "Crème"). Hors SQLite, repli
+    sur un LIKE sur le nom et la description courte.
+    """
+    mots = re.findall(r"\w+", texte.lower())
+    if not mots:
+        return []
+
+    if not recherche_fts_disponible():
+        query = Produit.query
+        for mot in mots:
+            motif = f"%{mot}%"
+            query = query.filter(
+                db.or_(
+                    Produit.nom.ilike(motif), Produit.description_courte.ilike(motif)
+                )
+            )
+        return query.order_by(Produit.nom).offset(offset).limit(limite).all()
+
+    poids = ", ".join(str(p) for p in RECHERCHE_POIDS)
+    requete = db.text(
+        "SELECT produits.* FROM produits_fts "
+        "JOIN produits ON produits.id = produits_fts.rowid "
+        "WHERE produits_fts MATCH :expression "
+        f"ORDER BY bm25(produits_fts, {poids}) LIMIT :limite OFFSET :offset"
+    )
+    return (
+        db.session.execute(
+            db.select(Produit).from_statement(requete),
+            {
+                "expression": " ".join(f'"{mot}"*' for mot in mots),
+                "limite": limite,
+                "offset": offset,
+            },
+        )
+        .scalars()
+        .all()
+    )
+
+
+# Index qui ne servent plus (remplacés ou devenus inutiles), supprimés par
+# migrer_schema
+INDEX_SUPPRIMES = ("ix_produits_categorie_cree_le_id", "ix_produits_note_moyenne_id")
+
+
+def migrer_schema() -> list:
+    """Met une base existante au niveau des modèles ; sans effet si elle l'est déjà.
+
+    create_all() crée les tables manquantes mais ne touche pas aux tables
+    existantes : leurs colonnes manquantes sont ajoutées (ALTER TABLE, avec la
+    valeur par défaut du modèle), leurs index manquants créés et les index
+    obsolètes supprimés, puis les agrégats des colonnes ajoutées calculés
+    depuis les données existantes. La ligne de version_catalogue est créée
+    si elle manque.
+    Renvoie les colonnes ajoutées ("table.colonne").
+    """
+    db.create_all()
+    dialecte = db.engine.dialect
+    ajoutees = []
+    with db.engine.begin() as connexion:
+        inspecteur = db.inspect(connexion)
+        for table in db.metadata.sorted_tables:
+            existantes = {c["name"] for c in inspecteur.get_columns(table.name)}
+            for colonne in table.columns:
+                if colonne.name in existantes:
+                    continue
+                definition = str(CreateColumn(colonne).compile(dialect=dialecte))
+                if colonne.default is not None and colonne.default.is_scalar:
+                    defaut = db.literal(colonne.default.arg, colonne.type).compile(
+                        dialect=dialecte, compile_kwargs={"literal_binds": True}
+                    )
+                    definition += f" DEFAULT {defaut}"
+                connexion.execute(
+                    db.text(f"ALTER TABLE {table.name} ADD COLUMN {definition}")
+                )
+                ajoutees.append(f"{table.name}.{colonne.name}")
+            for index in table.indexes:
+                index.create(connexion, checkfirst=True)
+        for nom in INDEX_SUPPRIMES:
+            connexion.execute(db.text(f"DROP INDEX IF EXISTS {nom}"))
+
+    if db.session.get(VersionCatalogue, 1) is None:
+        db.session.add(VersionCatalogue(id=1, version=0))
+        db.session.commit()
+
+    # Colonnes dénormalisées : remplies une fois, à leur ajout
+    if "produits.nb_avis" in ajoutees:
+        recalculer_notes()
+    if "produits.nb_ventes" in ajoutees:
+        recalculer_ventes()
+    return ajoutees
+
+
+def init_db():
+    """Schéma à jour (cf. migrer_schema) + index de recherche + produits de démo."""
+    migrer_schema()
+    creer_index_recherche()
+    seed_initial_products()
+    # Agrégats absents (base antérieure aux analyses) : construits une fois
+    if db.session.query(CommandeJournaliere.jour).first() is None and (
+        db.session.query(Commande.id).first() is not None
+    ):
+        recalculer_ventes_journalieres()
+
+
+def recalculer_notes():
+    """Recalcule nb_avis / somme_notes / note_moyenne depuis avis_produits."""
+    nb = (
+        db.select(db.func.count(AvisProduit.id))
+        .where(AvisProduit.produit_id == Produit.id)
+        .scalar_subquery()
+    )
+    somme = (
+        db.select(db.func.coalesce(db.func.sum(AvisProduit.note), 0))
+        .where(AvisProduit.produit_id == Produit.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(Produit).values(
+            nb_avis=nb,
+            somme_notes=somme,
+            note_moyenne=db.func.coalesce(
+                db.cast(somme, db.Float) / db.func.nullif(nb, 0), 0
+            ),
+        )
+    )
+    db.session.commit()
+
+
+def recalculer_ventes():
+    """Recalcule nb_ventes de chaque produit depuis lignes_commande."""
+    ventes = (
+        db.select(db.func.coalesce(db.func.sum(LigneCommande.quantite), 0))
+        .where(LigneCommande.produit_id == Produit.id)
+        .scalar_subquery()
+    )
+    db.session.execute(db.update(Produit).values(nb_ventes=ventes))
+    db.session.commit()
+
+
+def debut_du_mois(colonne_date):
+    if db.engine.dialect.name == "sqlite":
+        return db.func.date(colonne_date, "start of month")
+    return db.cast(db.func.date_trunc("month", colonne_date), db.Date)
+
+
+def recalculer_ventes_journalieres():
+    """Reconstruit les agrégats des ventes depuis commandes et lignes_commande."""
+    jour = db.func.date(Commande.date)
+    db.session.execute(db.delete(CommandeJournaliere))
+    db.session.execute(db.delete(VenteJournaliere))
+    db.session.execute(db.delete(VenteMensuelle))
+    db.session.execute(
+        db.insert(CommandeJournaliere.__table__).from_select(
+            ["jour", "nb_commandes", "chiffre_affaires"],
+            db.select(jour, db.func.count(Commande.id), db.func.sum(Commande.total))
+            .group_by(jour),
+        )
+    )
+    db.session.execute(
+        db.insert(VenteJournaliere.__table__).from_select(
+            [
+                "jour",
+                "produit_id",
+                "categorie",
+                "quantite",
+                "chiffre_affaires",
+                "nb_commandes",
+            ],
+            db.select(
+                jour,
+                LigneCommande.produit_id,
+                db.func.coalesce(Produit.categorie, "inconnue"),
+                db.func.sum(LigneCommande.quantite),
+                db.func.sum(LigneCommande.sous_total),
+                db.func.count(db.distinct(LigneCommande.commande_id)),
+            )
+            .join(Commande, Commande.id == LigneCommande.commande_id)
+            .outerjoin(Produit, Produit.id == LigneCommande.produit_id)
+            .group_by(jour, LigneCommande.produit_id, Produit.categorie),
+        )
+    )
+    mois = debut_du_mois(VenteJournaliere.jour)
+    db.session.execute(
+        db.insert(VenteMensuelle.__table__).from_select(
+            [
+                "mois",
+                "produit_id",
+                "categorie",
+                "quantite",
+                "chiffre_affaires",
+                "nb_commandes",
+            ],
+            db.select(
+                mois,
+                VenteJournaliere.produit_id,
+                db.func.max(VenteJournaliere.categorie),
+                db.func.sum(VenteJournaliere.quantite),
+                db.func.sum(VenteJournaliere.chiffre_affaires),
+                db.func.sum(VenteJournaliere.nb_commandes),
+            ).group_by(mois, VenteJournaliere.produit_id),
+        )
+    )
+    db.session.commit()
+
+
+def calculer_recommandations() -> int:
+    """Recalcule les produits similaires de tout le catalogue.
+
+    Les co-achats sont comptés par la base (auto-jointure de lignes_commande) ;
+    la table est remplacée dans une seule transaction. Renvoie le nombre de
+    produits ayant au moins un voisin.
+    """
+    documents = {
+        produit_id: ingredients(notes) + [f"categorie:{normaliser(categorie)}"]
+        for produit_id, notes, categorie in db.session.query(
+            Produit.id, Produit.notes, Produit.categorie
+        )
+    }
+    autre = db.aliased(LigneCommande)
+    co_achats = (
+        db.session.query(
+            LigneCommande.produit_id,
+            autre.produit_id,
+            db.func.count(db.distinct(LigneCommande.commande_id)),
+        )
+        .join(autre, autre.commande_id == LigneCommande.commande_id)
+        .filter(autre.produit_id != LigneCommande.produit_id)
+        .group_by(LigneCommande.produit_id, autre.produit_id)
+    )
+    commandes_par_produit = dict(
+        db.session.query(
+            LigneCommande.produit_id,
+            db.func.count(db.distinct(LigneCommande.commande_id)),
+        ).group_by(LigneCommande.produit_id)
+    )
+
+    lignes = []
+    nb_produits = 0
+    for produit_id, voisins in similaires(
+        documents,
+        co_achats,
+        commandes_par_produit,
+        RECOMMANDATIONS_K,
+        POIDS_CO_ACHATS,
+        POIDS_NOTES,
+    ):
+        nb_produits += bool(voisins)
+        lignes += [
+            {
+                "produit_id": produit_id,
+                "rang": rang,
+                "similaire_id": similaire_id,
+                "score": score,
+            }
+            for rang, (similaire_id, score) in enumerate(voisins)
+        ]
+
+    db.session.execute(db.delete(ProduitSimilaire))
+    for lot in par_lots(lignes, IMPORT_LOT):
+        db.session.execute(db.insert(ProduitSimilaire), lot)
+    db.session.commit()
+    invalider_catalogue()
+    return nb_produits
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Crée ou met à jour le schéma et l'index de recherche (idempotent)."""
+    init_db()
+    print("Base initialisée.")
+
+
+@app.cli.command("migrer-schema")
+def migrer_schema_command():
+    """Ajoute les tables, colonnes et index manquants d'une base existante."""
+    ajoutees = migrer_schema()
+    print(f"Schéma à jour ({len(ajoutees)} colonne(s) ajoutée(s)).")
+    for colonne in ajoutees:
+        print(f"  + {colonne}")
+
+
+@app.cli.command("construire-assets")
+def construire_assets_command():
+    """Minifie, versionne et précompresse les CSS/JS (pas les images envoyées)."""
+    MANIFESTE_ASSETS.clear()
+    MANIFESTE_ASSETS.update(assets.construire(app.static_folder))
+    print(f"{len(MANIFESTE_ASSETS)} asset(s) versionné(s) dans static/dist/.")
+
+
+@app.cli.command("generer-variantes")
+def generer_variantes_command():
+    """Génère les variantes manquantes des images produits et avatars existants."""
+    cibles = [
+        (p, "image", os.path.join(PRODUCT_UPLOAD_FOLDER, p.image), LARGEURS_PRODUITS)
+        for p in Produit.query.filter(
+            Produit.image.isnot(None), Produit.image_variantes.is_(None)
+        )
+    ] + [
+        (u, "avatar", os.path.join("static", "images", u.avatar), LARGEURS_AVATARS)
+        for u in Utilisateur.query.filter(
+            Utilisateur.avatar.isnot(None), Utilisateur.avatar_variantes.is_(None)
+        )
+    ]
+    cibles = [c for c in cibles if os.path.exists(c[2])]
+    for objet, colonne, chemin, largeurs in cibles:
+        enregistrer_variantes(
+            type(objet), objet.id, colonne, getattr(objet, colonne), chemin, largeurs
+        )
+    print(f"Variantes générées pour {len(cibles)} image(s).")
+
+
+@app.cli.command("purger-paniers")
+def purger_paniers_command():
+    """Supprime les paniers abandonnés."""
+    print(f"{purger_paniers()} panier(s) abandonné(s) supprimé(s).")
+
+
+@app.cli.command("traiter-taches")
+@click.option("--une-fois", is_flag=True, help="S'arrêter quand la file est vide.")
+def traiter_taches_command(une_fois):
+    """Worker de la file de tâches (e-mails, factures), à côté de gunicorn."""
+    traiter_taches(une_fois=une_fois)
+
+
+@app.cli.command("smtp-local")
+@click.option("--port", default=8025, show_default=True)
+def smtp_local_command(port):
+    """Serveur SMTP de substitution : écrit les e-mails reçus dans data/mails/."""
+    serveur = ServeurSMTPLocal(app.config["SMTP_LOCAL_DOSSIER"], port=port)
+    print(f"SMTP local sur localhost:{port}, messages dans {serveur.dossier}")
+    serveur.serve_forever()
+
 
+@app.cli.command("importer")
+@click.argument("quoi", type=click.Choice(list(IMPORTS)))
+@click.argument("fichier", type=click.Path(exists=True, dir_okay=False))
+def importer_command(quoi, fichier):
+    """Importe des produits (CSV/JSON) ou des commandes (JSON) depuis FICHIER."""
+    with open(fichier, encoding="utf-8-sig", newline="") as flux:
+        rapport = IMPORTS[quoi](flux, format_fichier(fichier))
+    print(f"{rapport.importes} importé(s), {rapport.rejetes} rejeté(s).")
+    for erreur in rapport.erreurs:
+        print(f"  {erreur}")
 
-# ---------- DECORATEURS ----------
-def admin_login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not session.get("admin_logged_in"):
-            return redirect(url_for("admin_login"))
-        return f(*args, **kwargs)
 
-    return decorated_function
+@app.cli.command("exporter")
+@click.argument("quoi", type=click.Choice(list(EXPORTS)))
+@click.argument("fichier")
+def exporter_command(quoi, fichier):
+    """Exporte les produits ou les commandes vers FICHIER (.csv ou .json)."""
+    with open(fichier, "w", encoding="utf-8", newline="") as sortie:
+        for morceau in EXPORTS[quoi](format_fichier(fichier)):
+            sortie.write(morceau)
+    print(f"Export des {quoi} écrit dans {fichier}.")
 
 
-def client_login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not session.get("user_id"):
-            return redirect(url_for("connexion", next=request.path))
-        return f(*args, **kwargs)
+@app.cli.command("reindexer-recherche")
+def reindexer_recherche_command():
+    """Reconstruit l'index plein texte des produits."""
+    creer_index_recherche(reconstruire=True)
+    print("Index de recherche reconstruit.")
 
-    return decorated_function
 
+@app.cli.command("recalculer-notes")
+def recalculer_notes_command():
+    """Reconstruit les agrégats de notes de tous les produits."""
+    migrer_schema()
+    recalculer_notes()
+    print("Agrégats de notes recalculés.")
 
-# ---------- UTILS ----------
-def allowed_file(filename: str) -> bool:
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@app.cli.command("recalculer-ventes")
+def recalculer_ventes_command():
+    """Reconstruit le classement des ventes (best-sellers)."""
+    migrer_schema()
+    recalculer_ventes()
+    print("Classement des ventes recalculé.")
 
-def seed_initial_products():
-    """Insère quelques produits de démo si la table est vide."""
-    if Produit.query.count() == 0:
-        p1 = Produit(
-            nom="Parfum Élégance",
-            prix=89.90,
-            categorie="parfums",
-            description_courte="Un parfum raffiné aux notes florales et boisées",
-            description="Ce parfum délicat mêle des notes de rose, de jasmin et de santal pour une élégance intemporelle. Parfait pour les occasions spéciales.",
-            image="parfum-elegance.jpg",
-            stock=15,
-            notes="Notes de tête: Bergamote, Notes de cœur: Rose, Jasmin, Notes de fond: Santal, Vanille",
-            contenance="100ml",
-            type_peau="Tous types",
-            pour_qui="Femme",
-        )
-        p2 = Produit(
-            nom="Crème Hydratante Luxe",
-            prix=45.50,
-            categorie="soins-visage",
-            description_courte="Hydratation intense pour une peau rayonnante",
-            description="Cette crème riche en actifs naturels nourrit en profondeur et redonne éclat à votre peau. Formulée avec de l'acide hyaluronique et des extraits de rose.",
-            image="creme-hydratante.jpg",
-            stock=25,
-            notes="",
-            contenance="50ml",
-            type_peau="Peau sèche et normale",
-            pour_qui="Femme",
-        )
-        db.session.add_all([p1, p2])
-        db.session.commit()
 
+@app.cli.command("calculer-recommandations")
+def calculer_recommandations_command():
+    """Recalcule les produits similaires (co-achats et notes), à lancer par cron."""
+    debut = time.perf_counter()
+    nb = calculer_recommandations()
+    print(f"Voisins calculés pour {nb} produit(s) en {time.perf_counter() - debut:.1f} s.")
 
-def init_db():
-    """Création des tables + produits de démo."""
-    db.create_all()
-    seed_initial_products()
+
+@app.cli.command("recalculer-ventes-journalieres")
+def recalculer_ventes_journalieres_command():
+    """Reconstruit les agrégats quotidiens des analyses de ventes."""
+    recalculer_ventes_journalieres()
+    print("Agrégats quotidiens des ventes recalculés.")
 
 
 # ---------- ROUTES PRINCIPALES ----------
 @app.route("/")
+@cache_page
 def index():
-    produits = Produit.query.order_by(Produit.cree_le.desc()).all()
-    nouveaux_produits = produits[:4]
-    bestsellers = produits[-4:] if len(produits) >= 4 else produits
+    nouveaux_produits = (
+        Produit.query.order_by(Produit.cree_le.desc(), Produit.id.desc())
+        .limit(4)
+        .all()
+    )
+    bestsellers = (
+        Produit.query.filter(Produit.nb_ventes > 0)
+        .order_by(Produit.nb_ventes.desc(), Produit.id.desc())
+        .limit(4)
+        .all()
+    )
     return render_template(
         "index.html", nouveaux_produits=nouveaux_produits, bestsellers=bestsellers
     )
 
 
+# Tris de la boutique : attribut de tri + conversion de la clé du curseur
+TRIS_BOUTIQUE = {
+    "nouveautes": ("cree_le", datetime.fromisoformat),
+    "note": ("note_moyenne", float),
+}
+
+
+index_facettes = IndexFacettes(cles_tri=[a for a, _ in TRIS_BOUTIQUE.values()])
+
+
+def index_facettes_a_jour() -> IndexFacettes:
+    if index_facettes.perime(app.config["FACETTES_TTL"]):
+        index_facettes.construire(db.session.query(*COLONNES_FACETTES))
+    return index_facettes
+
+
+def actualiser_facettes(produit_id):
+    """Répercute l'état en base d'un produit dans l'index de facettes."""
+    if index_facettes.construit_le is None:
+        return
+    ligne = (
+        db.session.query(*COLONNES_FACETTES).filter(Produit.id == produit_id).first()
+    )
+    if ligne is None:
+        index_facettes.retirer(produit_id)
+    else:
+        index_facettes.mettre_a_jour(ligne)
+
+
 @app.route("/boutique")
+@cache_page
 def boutique():
-    categorie = request.args.get("categorie", "")
-    query = Produit.query
-
-    if categorie:
-        query = query.filter_by(categorie=categorie)
+    tri = request.args.get("tri", "nouveautes")
+    if tri not in TRIS_BOUTIQUE:
+        tri = "nouveautes"
+    attribut_tri, convertir = TRIS_BOUTIQUE[tri]
+    par_page = request.args.get("par_page", BOUTIQUE_PAR_PAGE, type=int)
+    par_page = max(1, min(par_page, BOUTIQUE_PAR_PAGE_MAX))
+    curseur = request.args.get("apres", "")
+    position = decoder_curseur(curseur, convertir) if curseur else None
+
+    # Filtres multi-valeurs (?pour_qui=Femme&pour_qui=Homme&prix=25-50...)
+    filtres = {}
+    for facette in FACETTES:
+        valeurs = [v for v in request.args.getlist(facette) if v]
+        if valeurs:
+            filtres[facette] = valeurs
+
+    # Sélection, pagination et comptes servis par l'index en mémoire ;
+    # seule la page affichée est lue en base
+    index = index_facettes_a_jour()
+    ids, suivant = index.page(filtres, attribut_tri, position, par_page)
+    produits_par_id = {p.id: p for p in Produit.query.filter(Produit.id.in_(ids))}
+    produits = [produits_par_id[i] for i in ids if i in produits_par_id]
+    curseur_suivant = encoder_curseur(*suivant) if suivant else None
 
-    produits = query.all()
-    categories = [c[0] for c in db.session.query(Produit.categorie).distinct()]
     return render_template(
         "boutique.html",
         produits=produits,
-        categories=categories,
-        categorie_actuelle=categorie,
+        facettes=index.compter(filtres),
+        libelles_facettes=LIBELLES_FACETTES,
+        filtres=filtres,
+        tri_actuel=tri,
+        par_page=par_page,
+        curseur_actuel=curseur if position else "",
+        curseur_suivant=curseur_suivant,
     )
 
 
 @app.route("/produit/<int:produit_id>")
+@cache_page
 def produit(produit_id):
     produit = Produit.query.get_or_404(produit_id)
 
-    similaires = (
+    # Voisins précalculés (une lecture par la clé primaire) ; sans calcul
+    # encore fait pour ce produit, d'autres produits de la même catégorie
+    voisins = (
+        Produit.query.join(
+            ProduitSimilaire, ProduitSimilaire.similaire_id == Produit.id
+        )
+        .filter(ProduitSimilaire.produit_id == produit.id)
+        .order_by(ProduitSimilaire.rang)
+        .limit(RECOMMANDATIONS_AFFICHEES)
+        .all()
+    )
+    voisins = voisins or (
         Produit.query.filter(
             Produit.categorie == produit.categorie, Produit.id != produit.id
         )
-        .limit(4)
+        .limit(RECOMMANDATIONS_AFFICHEES)
         .all()
     )
 
-    # Avis de ce produit
-    avis_liste = AvisProduit.query.filter_by(produit_id=produit.id).order_by(
-        AvisProduit.cree_le.desc()
-    ).all()
-    nb_avis = len(avis_liste)
-    note_moyenne = None
-    if nb_avis > 0:
-        note_moyenne = sum(a.note for a in avis_liste) / nb_avis
+    # Avis de ce produit (la note moyenne est lue sur le produit)
+    avis_liste = (
+        AvisProduit.query.options(db.joinedload(AvisProduit.utilisateur))
+        .filter_by(produit_id=produit.id)
+        .order_by(AvisProduit.cree_le.desc())
+        .all()
+    )
+    nb_avis = produit.nb_avis
+    note_moyenne = produit.note_moyenne if nb_avis else None
 
     avis_utilisateur = None
     if session.get("user_id"):
@@ -246,7 +2301,7 @@ def produit(produit_id):
     return render_template(
         "produit.html",
         produit=produit,
-        similaires=similaires,
+        similaires=voisins,
         avis_liste=avis_liste,
         nb_avis=nb_avis,
         note_moyenne=note_moyenne,
@@ -275,10 +2330,12 @@ def noter_produit(produit_id):
     ).first()
 
     if avis:
+        delta_avis, delta_notes = 0, note - avis.note
         avis.note = note
         avis.commentaire = commentaire
         avis.cree_le = datetime.utcnow()
     else:
+        delta_avis, delta_notes = 1, note
         avis = AvisProduit(
             produit_id=produit.id,
             utilisateur_id=utilisateur_id,
@@ -287,118 +2344,154 @@ def noter_produit(produit_id):
         )
         db.session.add(avis)
 
+    # Mise à jour atomique des agrégats, dans la même transaction que l'avis
+    db.session.execute(
+        db.update(Produit)
+        .where(Produit.id == produit.id)
+        .values(
+            nb_avis=Produit.nb_avis + delta_avis,
+            somme_notes=Produit.somme_notes + delta_notes,
+            note_moyenne=db.cast(Produit.somme_notes + delta_notes, db.Float)
+            / (Produit.nb_avis + delta_avis),
+        )
+    )
     db.session.commit()
+    invalider_catalogue()
+    actualiser_facettes(produit.id)
     flash("Merci pour votre avis 💖", "success")
     return redirect(url_for("produit", produit_id=produit.id))
 
 
+# ---------- RECHERCHE ----------
+@app.route("/recherche")
+@cache_page
+def recherche():
+    texte = request.args.get("q", "").strip()
+    par_page = request.args.get("par_page", BOUTIQUE_PAR_PAGE, type=int)
+    par_page = max(1, min(par_page, BOUTIQUE_PAR_PAGE_MAX))
+    page = max(1, request.args.get("page", 1, type=int))
+
+    # Une ligne de plus que la page pour savoir s'il existe une page suivante
+    produits = rechercher_produits(texte, par_page + 1, (page - 1) * par_page)
+    page_suivante = page + 1 if len(produits) > par_page else None
+    produits = produits[:par_page]
+
+    if request.args.get("format") == "json":
+        return jsonify(
+            {
+                "q": texte,
+                "page": page,
+                "page_suivante": page_suivante,
+                "resultats": [
+                    {
+                        "id": p.id,
+                        "nom": p.nom,
+                        "prix": p.prix,
+                        "categorie": p.categorie,
+                        "url": url_for("produit", produit_id=p.id),
+                        "image": (
+                            url_for("static", filename="images/products/" + p.image)
+                            if p.image
+                            else None
+                        ),
+                    }
+                    for p in produits
+                ],
+            }
+        )
+
+    return render_template(
+        "recherche.html",
+        q=texte,
+        produits=produits,
+        page=page,
+        page_suivante=page_suivante,
+        par_page=par_page,
+    )
+
+
 # ---------- PANIER ----------
 @app.route("/panier")
 def panier():
-    panier = session.get("panier", [])
-    panier_complet = []
-    total = 0
-
-    for item in panier:
-        produit = Produit.query.get(item["id"])
-        if produit:
-            sous_total = produit.prix * item["quantite"]
-            panier_complet.append(
-                {
-                    "id": produit.id,
-                    "nom": produit.nom,
-                    "image": produit.image,
-                    "description_courte": produit.description_courte,
-                    "prix": produit.prix,
-                    "quantite": item["quantite"],
-                    "sous_total": sous_total,
-                }
-            )
-            total += sous_total
+    panier_complet, total = resoudre_panier(lire_panier())
 
     return render_template("panier.html", panier=panier_complet, total=total)
 
 
 @app.route("/panier-count")
 def panier_count():
-    panier = session.get("panier", [])
-    return jsonify({"count": len(panier)})
+    """Compteur du badge, avec ETag : 304 tant que le nombre n'a pas changé."""
+    count = compter_panier()
+    response = jsonify({"count": count})
+    response.set_etag(f"panier-{count}")
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
 
 
 @app.route("/ajouter-au-panier", methods=["POST"])
 def ajouter_au_panier():
-    produit_id = int(request.form.get("produit_id"))
-    quantite = int(request.form.get("quantite", 1))
-
-    panier = session.get("panier", [])
-
-    produit_existant = next((item for item in panier if item["id"] == produit_id), None)
-
-    if produit_existant:
-        produit_existant["quantite"] += quantite
-    else:
-        panier.append({"id": produit_id, "quantite": quantite})
-
-    session["panier"] = panier
-    return jsonify({"success": True, "panier_count": len(panier)})
+    produit_id = request.form.get("produit_id", type=int)
+    quantite = request.form.get("quantite", "1").strip()
+    if not quantite.isdigit() or int(quantite) < 1:
+        return jsonify({"success": False, "error": "Quantité invalide."}), 400
+    quantite = int(quantite)
+    stock = stocks_produits([produit_id]).get(produit_id)
+    if stock is None:
+        return jsonify({"success": False, "error": "Produit introuvable."}), 404
+    if stock < 1:
+        return jsonify({"success": False, "error": "Produit épuisé."}), 409
+
+    # Quantité totale ramenée au stock disponible
+    panier = lire_panier()
+    panier[produit_id] = min(panier.get(produit_id, 0) + quantite, stock)
+
+    enregistrer_panier(panier)
+    return jsonify(
+        {"success": True, "panier_count": len(panier), "quantite": panier[produit_id]}
+    )
 
 
 @app.route("/modifier-quantite-panier", methods=["POST"])
 def modifier_quantite_panier():
-    produit_id = int(request.form.get("produit_id"))
-    nouvelle_quantite = int(request.form.get("quantite"))
-
-    panier = session.get("panier", [])
-
-    for item in panier:
-        if item["id"] == produit_id:
-            if nouvelle_quantite <= 0:
-                panier.remove(item)
-            else:
-                item["quantite"] = nouvelle_quantite
-            break
+    produit_id = request.form.get("produit_id", type=int)
+    nouvelle_quantite = request.form.get("quantite", type=int)
+    if nouvelle_quantite is None:
+        return jsonify({"success": False, "error": "Quantité invalide."}), 400
+
+    panier = lire_panier()
+    if produit_id in panier:
+        # Quantité inférieure à 1 ou produit épuisé : ligne retirée ; sinon
+        # quantité ramenée au stock
+        ligne = borner({produit_id: nouvelle_quantite}, stocks_produits([produit_id]))
+        if ligne:
+            panier.update(ligne)
+        else:
+            del panier[produit_id]
 
-    session["panier"] = panier
-    return jsonify({"success": True})
+    enregistrer_panier(panier)
+    return jsonify({"success": True, "panier_count": len(panier)})
 
 
 @app.route("/supprimer-du-panier", methods=["POST"])
 def supprimer_du_panier():
     produit_id = int(request.form.get("produit_id"))
 
-    panier = session.get("panier", [])
-    panier = [item for item in panier if item["id"] != produit_id]
+    panier = lire_panier()
+    panier.pop(produit_id, None)
 
-    session["panier"] = panier
-    return jsonify({"success": True})
+    enregistrer_panier(panier)
+    return jsonify({"success": True, "panier_count": len(panier)})
 
 
 # ---------- COMMANDE ----------
 @app.route("/commande")
 @client_login_required
 def commande():
-    panier = session.get("panier", [])
+    panier = lire_panier()
     if not panier:
         return redirect(url_for("panier"))
 
-    panier_complet = []
-    total = 0
-
-    for item in panier:
-        produit = Produit.query.get(item["id"])
-        if produit:
-            sous_total = produit.prix * item["quantite"]
-            panier_complet.append(
-                {
-                    "id": produit.id,
-                    "nom": produit.nom,
-                    "image": produit.image,
-                    "prix": produit.prix,
-                    "quantite": item["quantite"],
-                    "sous_total": sous_total,
-                }
-            )
-            total += sous_total
+    panier_complet, total = resoudre_panier(panier)
 
     return render_template("commande.html", panier=panier_complet, total=total)
 
@@ -415,15 +2508,24 @@ def traiter_commande():
     code_postal = request.form.get("code_postal")
     pays = request.form.get("pays")
 
-    panier = session.get("panier", [])
+    panier = lire_panier()
     if not panier:
         return redirect(url_for("panier"))
 
-    total = 0
-    for item in panier:
-        produit = Produit.query.get(item["id"])
-        if produit:
-            total += produit.prix * item["quantite"]
+    lignes, total = resoudre_panier(panier)
+    if not lignes:
+        return redirect(url_for("panier"))
+
+    # Réservation du stock avant d'écrire la commande : tout ou rien
+    if not reserver_stock(lignes):
+        db.session.rollback()
+        enregistrer_panier(ajuster_panier_au_stock(panier))
+        flash(
+            "Certains articles ne sont plus disponibles dans la quantité demandée. "
+            "Votre panier a été ajusté.",
+            "error",
+        )
+        return redirect(url_for("panier"))
 
     commande = Commande(
         utilisateur_id=session.get("user_id"),
@@ -441,21 +2543,28 @@ def traiter_commande():
     db.session.add(commande)
     db.session.flush()
 
-    for item in panier:
-        produit = Produit.query.get(item["id"])
-        if produit:
-            sous_total = produit.prix * item["quantite"]
-            ligne = LigneCommande(
-                commande_id=commande.id,
-                produit_id=produit.id,
-                quantite=item["quantite"],
-                prix_unitaire=produit.prix,
-                sous_total=sous_total,
-            )
-            db.session.add(ligne)
+    # Insertion groupée (executemany) : un seul aller-retour quel que soit le panier
+    db.session.execute(
+        db.insert(LigneCommande),
+        [
+            {
+                "commande_id": commande.id,
+                "produit_id": ligne["id"],
+                "quantite": ligne["quantite"],
+                "prix_unitaire": ligne["prix"],
+                "sous_total": ligne["sous_total"],
+            }
+            for ligne in lignes
+        ],
+    )
+    cumuler_ventes(commande, lignes)
+
+    # Notifications validées avec la commande, envoyées par `flask traiter-taches`
+    for type_tache in ("facture", "mail_confirmation", "alerte_admin"):
+        planifier_tache(type_tache, commande_id=commande.id)
 
     db.session.commit()
-    session["panier"] = []
+    enregistrer_panier({})
 
     return render_template("commande-confirmee.html", commande=commande)
 
@@ -486,6 +2595,15 @@ def inscription():
         mot_de_passe = request.form.get("mot_de_passe", "").strip()
         confirmation = request.form.get("confirmation", "").strip()
 
+        attente = limiter_tentatives()
+        if attente:
+            erreur = MESSAGE_TROP_DE_TENTATIVES.format(attente)
+            return (
+                render_template("inscription.html", erreur=erreur),
+                429,
+                {"Retry-After": str(attente)},
+            )
+
         if not prenom or not nom or not email or not mot_de_passe:
             erreur = "Veuillez remplir tous les champs."
         elif mot_de_passe != confirmation:
@@ -498,7 +2616,7 @@ def inscription():
                     prenom=prenom,
                     nom=nom,
                     email=email,
-                    mot_de_passe_hash=generate_password_hash(mot_de_passe),
+                    mot_de_passe_hash=hacheur.hacher(mot_de_passe),
                 )
                 db.session.add(nouvel_utilisateur)
                 db.session.commit()
@@ -506,6 +2624,7 @@ def inscription():
                 session["user_id"] = nouvel_utilisateur.id
                 session["user_email"] = nouvel_utilisateur.email
                 session["user_prenom"] = nouvel_utilisateur.prenom
+                rattacher_panier(nouvel_utilisateur.id)
 
                 return redirect(url_for("index"))
 
@@ -525,16 +2644,30 @@ def connexion():
         mot_de_passe = request.form.get("mot_de_passe", "").strip()
         next_url = request.form.get("next") or url_for("index")
 
+        attente = limiter_tentatives(email)
+        if attente:
+            erreur = MESSAGE_TROP_DE_TENTATIVES.format(attente)
+            return (
+                render_template("connexion.html", erreur=erreur, next=next_url),
+                429,
+                {"Retry-After": str(attente)},
+            )
+
         utilisateur = Utilisateur.query.filter_by(email=email).first()
 
-        if not utilisateur or not check_password_hash(
+        if not utilisateur or not hacheur.verifier(
             utilisateur.mot_de_passe_hash, mot_de_passe
         ):
             erreur = "Identifiants incorrects."
         else:
+            limiteur_compte.oublier((request.remote_addr, email))
+            if hacheur.a_rehacher(utilisateur.mot_de_passe_hash):
+                utilisateur.mot_de_passe_hash = hacheur.hacher(mot_de_passe)
+                db.session.commit()
             session["user_id"] = utilisateur.id
             session["user_email"] = utilisateur.email
             session["user_prenom"] = utilisateur.prenom
+            rattacher_panier(utilisateur.id)
             return redirect(next_url)
 
     return render_template("connexion.html", erreur=erreur, next=next_url)
@@ -545,6 +2678,8 @@ def deconnexion():
     session.pop("user_id", None)
     session.pop("user_email", None)
     session.pop("user_prenom", None)
+    # Le panier reste enregistré sur le compte pour la prochaine connexion
+    session.pop("panier_id", None)
     return redirect(url_for("index"))
 
 
@@ -571,28 +2706,239 @@ def mon_compte():
             utilisateur.nom = nom
             utilisateur.email = email
 
+            avatar_filepath = None
             if "avatar" in request.files:
                 file = request.files["avatar"]
                 if file and allowed_file(file.filename):
                     filename = secure_filename(f"user_{utilisateur.id}_" + file.filename)
-                    filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                    file.save(filepath)
+                    avatar_filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+                    file.save(avatar_filepath)
                     utilisateur.avatar = "avatars/" + filename
+                    utilisateur.avatar_variantes = None
 
             db.session.commit()
+            if avatar_filepath:
+                planifier_variantes(
+                    utilisateur, "avatar", avatar_filepath, LARGEURS_AVATARS
+                )
 
             session["user_email"] = utilisateur.email
             session["user_prenom"] = utilisateur.prenom
 
             flash("Vos informations ont été mises à jour avec succès 💖", "success")
 
-    commandes = (
-        Commande.query.filter_by(utilisateur_id=utilisateur.id)
-        .order_by(Commande.date.desc())
-        .all()
+    commandes, curseur_suivant = page_commandes_client(
+        utilisateur.id, request.args.get("apres", "")
     )
     return render_template(
-        "mon-compte.html", utilisateur=utilisateur, commandes=commandes
+        "mon-compte.html",
+        utilisateur=utilisateur,
+        commandes=commandes,
+        curseur_suivant=curseur_suivant,
+    )
+
+
+@app.route("/mon-compte/commandes")
+@client_login_required
+def mon_compte_commandes():
+    """Page suivante de l'historique, en JSON, pour le défilement infini."""
+    commandes, curseur_suivant = page_commandes_client(
+        session["user_id"], request.args.get("apres", "")
+    )
+    return jsonify(
+        {
+            "html": render_template("mon-compte-commandes.html", commandes=commandes),
+            "commandes": [
+                {
+                    "id": c.id,
+                    "date": c.date.isoformat(),
+                    "statut": c.statut,
+                    "total": c.total,
+                    "articles": sum(ligne.quantite for ligne in c.lignes),
+                }
+                for c in commandes
+            ],
+            "curseur_suivant": curseur_suivant,
+            "suivant": (
+                url_for("mon_compte_commandes", apres=curseur_suivant)
+                if curseur_suivant
+                else None
+            ),
+        }
+    )
+
+
+# ---------- API CATALOGUE ----------
+def reponse_json(donnees, status=200):
+    """JSON compact : ni espaces ni échappement des accents."""
+    return app.response_class(
+        json.dumps(
+            donnees,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=lambda valeur: valeur.isoformat(),
+        ),
+        status=status,
+        mimetype="application/json",
+    )
+
+
+def erreur_api(message, status):
+    return reponse_json({"erreur": message}, status)
+
+
+def champs_api(defaut):
+    """Champs de ?champs=nom,prix (id toujours inclus), ou None si l'un est inconnu."""
+    demande = request.args.get("champs")
+    if not demande:
+        return defaut
+    champs = dict.fromkeys(["id"] + [c.strip() for c in demande.split(",") if c])
+    if any(champ not in API_CHAMPS_PRODUIT for champ in champs):
+        return None
+    return tuple(champs)
+
+
+def serialiser_produit(ligne, champs) -> dict:
+    produit = dict(zip(champs, ligne))
+    if produit.get("image"):
+        produit["image"] = url_for(
+            "static", filename="images/products/" + produit["image"]
+        )
+    return produit
+
+
+def limite_api() -> int:
+    limite = request.args.get("limite", API_PAR_PAGE, type=int)
+    return max(1, min(limite, API_PAR_PAGE_MAX))
+
+
+def url_suivante(curseur, **kwargs):
+    """URL de la page suivante : mêmes paramètres, curseur ?apres= avancé."""
+    if curseur is None:
+        return None
+    parametres = {**request.args.to_dict(), **kwargs, "apres": curseur}
+    return url_for(request.endpoint, **parametres)
+
+
+@app.route("/api/produits")
+@reponse_catalogue
+def api_produits():
+    """Produits par id croissant (?categorie=, ?champs=, ?limite=, ?apres=<id>)."""
+    champs = champs_api(API_CHAMPS_LISTE)
+    if champs is None:
+        return erreur_api("Champ inconnu (voir ?champs=).", 400)
+    limite = limite_api()
+
+    requete = db.session.query(*[getattr(Produit, c) for c in champs]).filter(
+        Produit.id > request.args.get("apres", 0, type=int)
+    )
+    if request.args.get("categorie"):
+        requete = requete.filter(Produit.categorie == request.args["categorie"])
+    # Une ligne de plus que la page pour savoir s'il existe une page suivante
+    lignes = requete.order_by(Produit.id).limit(limite + 1).all()
+    curseur_suivant = lignes[limite - 1].id if len(lignes) > limite else None
+
+    return reponse_json(
+        {
+            "produits": [serialiser_produit(l, champs) for l in lignes[:limite]],
+            "curseur_suivant": curseur_suivant,
+            "suivant": url_suivante(curseur_suivant),
+        }
+    )
+
+
+@app.route("/api/produits/<int:produit_id>")
+@reponse_catalogue
+def api_produit(produit_id):
+    champs = champs_api(API_CHAMPS_PRODUIT)
+    if champs is None:
+        return erreur_api("Champ inconnu (voir ?champs=).", 400)
+    ligne = (
+        db.session.query(*[getattr(Produit, c) for c in champs])
+        .filter(Produit.id == produit_id)
+        .first()
+    )
+    if ligne is None:
+        return erreur_api("Produit introuvable.", 404)
+    return reponse_json(serialiser_produit(ligne, champs))
+
+
+@app.route("/api/categories")
+@reponse_catalogue
+def api_categories():
+    categories = (
+        db.session.query(Produit.categorie, db.func.count(Produit.id))
+        .group_by(Produit.categorie)
+        .order_by(Produit.categorie)
+    )
+    return reponse_json(
+        {
+            "categories": [
+                {"categorie": categorie, "nb_produits": nb}
+                for categorie, nb in categories
+            ]
+        }
+    )
+
+
+@app.route("/api/produits/<int:produit_id>/avis")
+@reponse_catalogue
+def api_avis(produit_id):
+    """Avis d'un produit, les plus récents d'abord (?limite=, ?apres=<curseur>)."""
+    produit = (
+        db.session.query(Produit.nb_avis, Produit.note_moyenne)
+        .filter(Produit.id == produit_id)
+        .first()
+    )
+    if produit is None:
+        return erreur_api("Produit introuvable.", 404)
+    limite = limite_api()
+
+    requete = (
+        db.session.query(
+            AvisProduit.id,
+            AvisProduit.note,
+            AvisProduit.commentaire,
+            AvisProduit.cree_le,
+            Utilisateur.prenom,
+        )
+        .join(Utilisateur, Utilisateur.id == AvisProduit.utilisateur_id)
+        .filter(AvisProduit.produit_id == produit_id)
+    )
+    position = decoder_curseur(request.args.get("apres", ""))
+    if position:
+        requete = requete.filter(
+            db.tuple_(AvisProduit.cree_le, AvisProduit.id) < position
+        )
+    lignes = (
+        requete.order_by(AvisProduit.cree_le.desc(), AvisProduit.id.desc())
+        .limit(limite + 1)
+        .all()
+    )
+    curseur_suivant = (
+        encoder_curseur(lignes[limite - 1].cree_le, lignes[limite - 1].id)
+        if len(lignes) > limite
+        else None
+    )
+
+    return reponse_json(
+        {
+            "produit_id": produit_id,
+            "nb_avis": produit.nb_avis,
+            "note_moyenne": produit.note_moyenne if produit.nb_avis else None,
+            "avis": [
+                {
+                    "id": avis.id,
+                    "note": avis.note,
+                    "commentaire": avis.commentaire,
+                    "auteur": avis.prenom,
+                    "cree_le": avis.cree_le,
+                }
+                for avis in lignes[:limite]
+            ],
+            "curseur_suivant": curseur_suivant,
+            "suivant": url_suivante(curseur_suivant, produit_id=produit_id),
+        }
     )
 
 
@@ -608,9 +2954,17 @@ def admin_login():
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "").strip()
 
-        if username == ADMIN_USERNAME and check_password_hash(
-            ADMIN_PASSWORD_HASH, password
-        ):
+        attente = limiter_tentatives("admin")
+        if attente:
+            error = MESSAGE_TROP_DE_TENTATIVES.format(attente)
+            return (
+                render_template("admin/login.html", error=error),
+                429,
+                {"Retry-After": str(attente)},
+            )
+
+        if username == ADMIN_USERNAME and hacheur.verifier(empreinte_admin(), password):
+            limiteur_compte.oublier((request.remote_addr, "admin"))
             session["admin_logged_in"] = True
             return redirect(url_for("admin_dashboard"))
         else:
@@ -622,27 +2976,177 @@ def admin_login():
 @app.route("/admin/dashboard")
 @admin_login_required
 def admin_dashboard():
-    produits = Produit.query.all()
-    commandes = Commande.query.order_by(Commande.date.desc()).all()
-    total_commandes = len(commandes)
-    total_produits = len(produits)
-    total_ca = sum(c.total for c in commandes) if commandes else 0
+    # Indicateurs calculés par la base (COUNT / SUM), sans charger les lignes
+    total_commandes, total_ca = db.session.query(
+        db.func.count(Commande.id), db.func.coalesce(db.func.sum(Commande.total), 0)
+    ).one()
+    total_produits = db.session.query(db.func.count(Produit.id)).scalar()
+
+    pages = max(1, -(-total_commandes // ADMIN_COMMANDES_PAR_PAGE))
+    page = max(1, min(request.args.get("page", 1, type=int), pages))
+
+    # Chargement anticipé : nombre de requêtes fixe quel que soit le nombre de lignes
+    commandes = (
+        Commande.query.options(
+            db.joinedload(Commande.utilisateur),
+            db.selectinload(Commande.lignes).joinedload(LigneCommande.produit),
+        )
+        .order_by(Commande.date.desc(), Commande.id.desc())
+        .offset((page - 1) * ADMIN_COMMANDES_PAR_PAGE)
+        .limit(ADMIN_COMMANDES_PAR_PAGE)
+        .all()
+    )
 
     return render_template(
         "admin/dashboard.html",
-        produits=produits,
         commandes=commandes,
         total_commandes=total_commandes,
         total_produits=total_produits,
         total_ca=total_ca,
+        page=page,
+        pages=pages,
+    )
+
+
+def ventes_periode(du, au):
+    """Sous-requête des cumuls par produit du `du` au `au` inclus.
+
+    Mois entiers lus dans ventes_mensuelles, jours des mois entamés aux deux
+    bouts dans ventes_journalieres : au plus ~60 jours de détail par requête.
+    """
+    colonnes = (
+        "produit_id",
+        "categorie",
+        "quantite",
+        "chiffre_affaires",
+        "nb_commandes",
+    )
+    premier_mois = du.replace(day=1)
+    if du.day != 1:
+        premier_mois = (premier_mois + timedelta(days=32)).replace(day=1)
+    fin_mois = (au + timedelta(days=1)).replace(day=1)  # exclue
+    jours = db.select(*(getattr(VenteJournaliere, c) for c in colonnes))
+    if premier_mois >= fin_mois:
+        return jours.where(VenteJournaliere.jour.between(du, au)).subquery()
+    return db.union_all(
+        db.select(*(getattr(VenteMensuelle, c) for c in colonnes)).where(
+            VenteMensuelle.mois >= premier_mois, VenteMensuelle.mois < fin_mois
+        ),
+        jours.where(
+            db.or_(
+                VenteJournaliere.jour.between(du, premier_mois - timedelta(days=1)),
+                VenteJournaliere.jour.between(fin_mois, au),
+            )
+        ),
+    ).subquery()
+
+
+def analyses_ventes(du, au, par="jour") -> dict:
+    """Indicateurs de ventes du `du` au `au` inclus, lus dans les agrégats.
+
+    `par` : "jour" ou "mois", pas de la série chronologique.
+    """
+    # Au plus une ligne par jour : totaux et regroupement par mois faits ici
+    nb_commandes, chiffre_affaires, serie = 0, 0, {}
+    for jour, nb, montant in (
+        db.session.query(
+            CommandeJournaliere.jour,
+            CommandeJournaliere.nb_commandes,
+            CommandeJournaliere.chiffre_affaires,
+        )
+        .filter(CommandeJournaliere.jour.between(du, au))
+        .order_by(CommandeJournaliere.jour)
+    ):
+        nb_commandes += nb
+        chiffre_affaires += montant
+        cle = jour.isoformat() if par == "jour" else jour.strftime("%Y-%m")
+        point = serie.setdefault(cle, {"periode": cle, "nb_commandes": 0, "ca": 0})
+        point["nb_commandes"] += nb
+        point["ca"] = round(point["ca"] + montant, 2)
+
+    # Un seul passage sur les agrégats ; catégories et classement en Python
+    # (au plus une ligne par produit et catégorie)
+    ventes = ventes_periode(du, au)
+    par_produit = db.session.query(
+        ventes.c.produit_id,
+        ventes.c.categorie,
+        db.func.sum(ventes.c.chiffre_affaires),
+        db.func.sum(ventes.c.quantite),
+        db.func.sum(ventes.c.nb_commandes),
+    ).group_by(ventes.c.produit_id, ventes.c.categorie)
+    categories, produits = {}, {}
+    for produit_id, categorie, montant, unites, nb in par_produit:
+        c = categories.setdefault(
+            categorie, {"categorie": categorie, "ca": 0, "unites": 0}
+        )
+        c["ca"] += montant
+        c["unites"] += unites
+        p = produits.setdefault(
+            produit_id, {"id": produit_id, "ca": 0, "unites": 0, "nb_commandes": 0}
+        )
+        p["ca"] += montant
+        p["unites"] += unites
+        p["nb_commandes"] += nb
+    categories = sorted(categories.values(), key=itemgetter("ca"), reverse=True)
+    produits = sorted(produits.values(), key=itemgetter("ca"), reverse=True)
+    del produits[ANALYSES_PRODUITS_MAX:]
+    noms = dict(
+        db.session.query(Produit.id, Produit.nom).filter(
+            Produit.id.in_([p["id"] for p in produits])
+        )
     )
+    for p in categories + produits:
+        p["ca"] = round(p["ca"], 2)
+    for p in produits:
+        p["nom"] = noms.get(p["id"]) or f"Produit #{p['id']} (supprimé)"
+
+    return {
+        "du": du.isoformat(),
+        "au": au.isoformat(),
+        "nb_commandes": nb_commandes,
+        "chiffre_affaires": round(chiffre_affaires, 2),
+        "panier_moyen": round(chiffre_affaires / nb_commandes, 2) if nb_commandes else 0,
+        "unites": sum(c["unites"] for c in categories),
+        "categories": categories,
+        "produits": produits,
+        "serie": list(serie.values()),
+    }
+
+
+@app.route("/admin/analytics")
+@admin_login_required
+def admin_analytics():
+    # Bornes incluses, en jours UTC comme les agrégats (AAAA-MM-JJ)
+    try:
+        au = request.args.get("au")
+        au = date.fromisoformat(au) if au else datetime.utcnow().date()
+        du = request.args.get("du")
+        du = (
+            date.fromisoformat(du)
+            if du
+            else au - timedelta(days=ANALYSES_JOURS_DEFAUT - 1)
+        )
+    except ValueError:
+        abort(400)
+    if du > au:
+        du, au = au, du
+    par = "mois" if request.args.get("par") == "mois" else "jour"
+
+    analyses = analyses_ventes(du, au, par)
+    if request.args.get("format") == "json":
+        return jsonify(analyses)
+    return render_template("admin/analytics.html", analyses=analyses, par=par)
 
 
 @app.route("/admin/produits")
 @admin_login_required
 def admin_produits():
     produits = Produit.query.order_by(Produit.cree_le.desc()).all()
-    return render_template("admin/gestion-produits.html", produits=produits)
+    return render_template(
+        "admin/gestion-produits.html",
+        produits=produits,
+        colonnes_produit=COLONNES_PRODUIT,
+    )
 
 
 @app.route("/admin/ajouter-produit", methods=["POST"])
@@ -659,6 +3163,7 @@ def admin_ajouter_produit():
         )
 
     image_filename = None
+    filepath = None
     file = request.files.get("image_file")
     if file and allowed_file(file.filename):
         filename = secure_filename(
@@ -684,6 +3189,10 @@ def admin_ajouter_produit():
 
     db.session.add(produit)
     db.session.commit()
+    invalider_catalogue()
+    actualiser_facettes(produit.id)
+    if filepath:
+        planifier_variantes(produit, "image", filepath, LARGEURS_PRODUITS)
 
     return jsonify({"success": True})
 
@@ -715,14 +3224,20 @@ def admin_modifier_produit(produit_id):
     produit.type_peau = request.form.get("type_peau") or None
     produit.pour_qui = request.form.get("pour_qui") or None
 
+    filepath = None
     file = request.files.get("image_file")
     if file and allowed_file(file.filename):
         filename = secure_filename(f"prod_{produit.id}_" + file.filename)
         filepath = os.path.join(PRODUCT_UPLOAD_FOLDER, filename)
         file.save(filepath)
         produit.image = filename
+        produit.image_variantes = None
 
     db.session.commit()
+    invalider_catalogue()
+    actualiser_facettes(produit.id)
+    if filepath:
+        planifier_variantes(produit, "image", filepath, LARGEURS_PRODUITS)
     return jsonify({"success": True})
 
 
@@ -731,23 +3246,109 @@ def admin_modifier_produit(produit_id):
 def admin_supprimer_produit(produit_id):
     produit = Produit.query.get_or_404(produit_id)
     db.session.delete(produit)
+    db.session.execute(
+        db.delete(ProduitSimilaire).where(
+            db.or_(
+                ProduitSimilaire.produit_id == produit_id,
+                ProduitSimilaire.similaire_id == produit_id,
+            )
+        )
+    )
     db.session.commit()
+    invalider_catalogue()
+    actualiser_facettes(produit_id)
     return jsonify({"success": True})
 
 
+@app.route("/admin/import/<quoi>", methods=["POST"])
+@admin_login_required
+def admin_importer(quoi):
+    if quoi not in IMPORTS:
+        abort(404)
+    fichier = request.files.get("fichier")
+    if not fichier or not fichier.filename:
+        return jsonify({"success": False, "error": "Aucun fichier envoyé."})
+    try:
+        format = format_fichier(fichier.filename)
+        flux = io.TextIOWrapper(fichier.stream, encoding="utf-8-sig", newline="")
+        rapport = IMPORTS[quoi](flux, format)
+    except (ValueError, UnicodeDecodeError) as exc:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(exc)})
+    return jsonify({"success": True, **rapport.en_dict()})
+
+
+@app.route("/admin/export/<quoi>.<format>")
+@admin_login_required
+def admin_exporter(quoi, format):
+    if quoi not in EXPORTS or format not in TYPES_EXPORT:
+        abort(404)
+    nom = f"{quoi}-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return app.response_class(
+        stream_with_context(EXPORTS[quoi](format)),
+        mimetype=TYPES_EXPORT[format],
+        headers={"Content-Disposition": f'attachment; filename="{nom}"'},
+    )
+
+
+@app.route("/admin/metrics")
+def admin_metrics():
+    """Métriques de ce worker au format Prometheus (session admin ou jeton)."""
+    if not app.config["METRIQUES"]:
+        abort(404)
+    jeton = app.config["METRIQUES_JETON"]
+    jeton_valide = jeton and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {jeton}"
+    )
+    if not (session.get("admin_logged_in") or jeton_valide):
+        return redirect(url_for("admin_login"))
+    return app.response_class(
+        metriques.exposer(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.route("/admin/cache-stats")
+@admin_login_required
+def admin_cache_stats():
+    return jsonify(
+        {
+            **stats_cache,
+            "backend": app.config["CACHE_BACKEND"],
+            "generation": cache_pages.compteur(CLE_GENERATION_CATALOGUE),
+        }
+    )
+
+
 @app.route("/admin/logout")
 @admin_login_required
 def admin_logout():
     session.pop("admin_logged_in", None)
     return redirect(url_for("index"))
 
-with app.app_context():
-    init_db()
+
+# ---------- DÉMARRAGE DU PROCESSUS ----------
+# Fait à la première requête, dans le worker : avec gunicorn --preload, un
+# thread démarré ou une connexion ouverte dans le maître ne survit pas au fork
+processus_demarre = False
+verrou_demarrage = threading.Lock()
+
+
+@app.before_request
+def demarrer_processus():
+    global processus_demarre
+    if processus_demarre:
+        return
+    with verrou_demarrage:
+        if processus_demarre:
+            return
+        if app.config["INIT_DB_AUTO"]:
+            init_db()
+        demarrer_balayage_paniers()
+        processus_demarre = True
+
 
 # ---------- LANCEMENT ----------
 if __name__ == "__main__":
-   # with app.app_context():
-        # 💡 En dev, si tu modifies les modèles, supprime "maison_du_parfum.db"
-        # puis relance pour recréer les tables proprement.
-      #  init_db()
+    # 💡 En dev, si tu modifies les modèles, supprime "maison_du_parfum.db"
+    # puis relance pour recréer les tables proprement.
     app.run(debug=True)
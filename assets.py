@@ -0,0 +1,107 @@
+"""Construction des assets statiques versionnés (empreinte de contenu).
+
+Les CSS/JS sont minifiés, puis chaque fichier est copié sous static/dist/ avec
+une empreinte de son contenu dans le nom (style.3f2a1b9c0d.css). Des variantes
+précompressées (.gz, et .br si le paquet brotli est installé) sont écrites à
+côté. static/dist/manifest.json associe le chemin d'origine au chemin versionné.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : pas de variantes .br
+    brotli = None
+
+DOSSIER_DIST = "dist"
+FICHIER_MANIFESTE = "manifest.json"
+
+# Dossiers (relatifs à static/) pris en charge par la construction. Pas les
+# envois (images/products, avatars) : réécrits sous le même nom à l'exécution,
+# ils resteraient figés dans le manifeste jusqu'au déploiement suivant
+SOURCES = ("css", "js")
+# Types texte : minifiés et précompressés
+COMPRESSIBLES = {".css", ".js", ".svg"}
+TAILLE_MIN_COMPRESSION = 512
+
+
+def minifier_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minifier_js(js: str) -> str:
+    """Minification prudente : indentation, lignes vides et commentaires // seuls."""
+    lignes = []
+    for ligne in js.splitlines():
+        ligne = ligne.strip()
+        if ligne and not ligne.startswith("//"):
+            lignes.append(ligne)
+    return "\n".join(lignes) + "\n"
+
+
+MINIFICATEURS = {".css": minifier_css, ".js": minifier_js}
+
+
+def empreinte(contenu: bytes) -> str:
+    return hashlib.sha256(contenu).hexdigest()[:10]
+
+
+def ecrire_variantes_compressees(chemin: str, contenu: bytes):
+    with gzip.open(chemin + ".gz", "wb", compresslevel=9) as f:
+        f.write(contenu)
+    if brotli is not None:
+        with open(chemin + ".br", "wb") as f:
+            f.write(brotli.compress(contenu, quality=11))
+
+
+def construire(dossier_static: str) -> dict:
+    """Reconstruit static/dist/ et renvoie le manifeste {origine: versionné}."""
+    dossier_dist = os.path.join(dossier_static, DOSSIER_DIST)
+    shutil.rmtree(dossier_dist, ignore_errors=True)
+
+    manifeste = {}
+    for source in SOURCES:
+        racine = os.path.join(dossier_static, source)
+        for dossier, _, fichiers in os.walk(racine):
+            for nom in sorted(fichiers):
+                chemin = os.path.join(dossier, nom)
+                relatif = os.path.relpath(chemin, dossier_static).replace(os.sep, "/")
+                base, ext = os.path.splitext(relatif)
+                ext = ext.lower()
+
+                with open(chemin, "rb") as f:
+                    contenu = f.read()
+                if ext in MINIFICATEURS:
+                    contenu = MINIFICATEURS[ext](contenu.decode("utf-8")).encode("utf-8")
+
+                versionne = f"{DOSSIER_DIST}/{base}.{empreinte(contenu)}{ext}"
+                destination = os.path.join(dossier_static, versionne)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                with open(destination, "wb") as f:
+                    f.write(contenu)
+                if ext in COMPRESSIBLES and len(contenu) >= TAILLE_MIN_COMPRESSION:
+                    ecrire_variantes_compressees(destination, contenu)
+
+                manifeste[relatif] = versionne
+
+    os.makedirs(dossier_dist, exist_ok=True)
+    with open(os.path.join(dossier_dist, FICHIER_MANIFESTE), "w") as f:
+        json.dump(manifeste, f, indent=2, sort_keys=True)
+    return manifeste
+
+
+def charger_manifeste(dossier_static: str) -> dict:
+    """Manifeste de la dernière construction, ou {} si elle n'a pas été faite."""
+    try:
+        with open(os.path.join(dossier_static, DOSSIER_DIST, FICHIER_MANIFESTE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
@@ -0,0 +1,521 @@
+"""Test de charge de la boutique et du tunnel de commande.
+
+Remplit une base neuve avec un catalogue synthétique (produits, clients,
+commandes, avis), puis rejoue les vraies routes :
+
+    accueil          GET  /
+    boutique         GET  /boutique (une fois sur deux filtrée par catégorie)
+    produit          GET  /produit/<id>
+    ajout_panier     POST /ajouter-au-panier
+    commande         POST /traiter-commande (panier rempli avant la mesure)
+    admin_dashboard  GET  /admin/dashboard
+    analyses         GET  /admin/analytics (période de 1 à 12 mois)
+
+d'abord avec le client de test Flask (dans ce processus, séquentiel), puis,
+avec --gunicorn, sur un gunicorn lancé en local (requêtes HTTP concurrentes).
+Pour chaque scénario : débit, latences p50/p95/p99 et nombre de requêtes SQL
+par requête HTTP, lu dans l'en-tête Server-Timing (METRIQUES=1).
+
+Le temps de démarrage est mesuré aussi : import de app.py dans un processus
+neuf et, avec --gunicorn, délai jusqu'à la première réponse des workers.
+
+Les résultats sont écrits en JSON (un fichier par commit par défaut) ;
+--comparer affiche l'écart avec un fichier précédent.
+
+    python benchmarks/charge.py --produits 5000 --requetes 300 --gunicorn
+    python benchmarks/charge.py --comparer benchmarks/resultats/abc1234.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOT_DE_PASSE = "bench"
+CATEGORIES = ["parfums", "soins-visage", "soins-corps", "maquillage"]
+POUR_QUI = ["Femme", "Homme", "Unisexe"]
+CONTENANCES = ["30ml", "50ml", "100ml", "200ml"]
+PEAUX = ["Tous types", "Peau sèche et normale", "Peau grasse", "Peau sensible"]
+FORMULAIRE = {
+    "nom": "Test",
+    "prenom": "Bench",
+    "email": "bench@example.com",
+    "telephone": "0000",
+    "adresse": "1 rue du Test",
+    "ville": "Paris",
+    "code_postal": "75000",
+    "pays": "France",
+}
+SCENARIOS = (
+    "accueil",
+    "boutique",
+    "produit",
+    "ajout_panier",
+    "commande",
+    "admin_dashboard",
+    "analyses",
+)
+SQL_SERVER_TIMING = re.compile(r'desc="(\d+) SQL"')
+
+
+def importer_app():
+    os.chdir(RACINE)
+    sys.path.insert(0, RACINE)
+    import app
+
+    return app
+
+
+def peupler(boutique, rng, nb_produits, nb_utilisateurs, nb_commandes, nb_avis):
+    """Insère le catalogue synthétique par executemany ; renvoie les ids créés."""
+    db = boutique.db
+    debut = datetime.utcnow() - timedelta(days=365)
+    with boutique.app.app_context():
+        boutique.init_db()
+        db.session.execute(
+            db.insert(boutique.Produit),
+            [
+                {
+                    "nom": f"Produit {i}",
+                    "prix": round(rng.uniform(9, 250), 2),
+                    "categorie": rng.choice(CATEGORIES),
+                    "description_courte": f"Description courte du produit {i}",
+                    "description": f"Description détaillée du produit {i}.",
+                    "stock": 10**9,  # le scénario commande ne doit pas manquer de stock
+                    "contenance": rng.choice(CONTENANCES),
+                    "type_peau": rng.choice(PEAUX),
+                    "pour_qui": rng.choice(POUR_QUI),
+                    "cree_le": debut + timedelta(minutes=i),
+                }
+                for i in range(nb_produits)
+            ],
+        )
+        # Un seul hachage : le coût de scrypt n'a rien à faire dans le remplissage
+        empreinte = boutique.hacheur.hacher(MOT_DE_PASSE)
+        db.session.execute(
+            db.insert(boutique.Utilisateur),
+            [
+                {
+                    "prenom": "Client",
+                    "nom": str(i),
+                    "email": f"client{i}@example.com",
+                    "mot_de_passe_hash": empreinte,
+                }
+                for i in range(nb_utilisateurs)
+            ],
+        )
+        produits = dict(db.session.query(boutique.Produit.id, boutique.Produit.prix))
+        utilisateurs = [u for (u,) in db.session.query(boutique.Utilisateur.id)]
+        ids_produits = list(produits)
+
+        commandes, lignes = [], []
+        for commande_id in range(1, nb_commandes + 1):
+            contenu = {
+                p: rng.randint(1, 3)
+                for p in rng.sample(ids_produits, min(rng.randint(1, 4), len(ids_produits)))
+            }
+            commandes.append(
+                {
+                    "id": commande_id,
+                    "utilisateur_id": rng.choice(utilisateurs),
+                    "date": debut + timedelta(minutes=rng.randint(0, 525_600)),
+                    **{cle: valeur for cle, valeur in FORMULAIRE.items()},
+                    "total": sum(produits[p] * q for p, q in contenu.items()),
+                    "statut": "en_attente",
+                }
+            )
+            lignes += [
+                {
+                    "commande_id": commande_id,
+                    "produit_id": p,
+                    "quantite": q,
+                    "prix_unitaire": produits[p],
+                    "sous_total": produits[p] * q,
+                }
+                for p, q in contenu.items()
+            ]
+        if commandes:
+            db.session.execute(db.insert(boutique.Commande), commandes)
+            db.session.execute(db.insert(boutique.LigneCommande), lignes)
+
+        paires = set()
+        while len(paires) < min(nb_avis, len(utilisateurs) * len(ids_produits)):
+            paires.add((rng.choice(utilisateurs), rng.choice(ids_produits)))
+        if paires:
+            db.session.execute(
+                db.insert(boutique.AvisProduit),
+                [
+                    {"utilisateur_id": u, "produit_id": p, "note": rng.randint(1, 5)}
+                    for u, p in paires
+                ],
+            )
+        db.session.commit()
+        boutique.recalculer_notes()
+        boutique.recalculer_ventes()
+        boutique.recalculer_ventes_journalieres()
+    return ids_produits, utilisateurs
+
+
+def url_analyses(rng):
+    au = datetime.utcnow().date() - timedelta(days=rng.randint(0, 180))
+    du = au - timedelta(days=rng.randint(30, 365))
+    return f"/admin/analytics?du={du}&au={au}&par={rng.choice(['jour', 'mois'])}"
+
+
+def resumer(mesures, duree):
+    """mesures : [(latence en s, requêtes SQL ou None, succès)]."""
+    latences = sorted(m[0] * 1000 for m in mesures)
+    sql = [m[1] for m in mesures if m[1] is not None]
+
+    def centile(p):
+        return round(latences[min(len(latences) - 1, int(len(latences) * p / 100))], 2)
+
+    return {
+        "requetes": len(mesures),
+        "erreurs": sum(1 for m in mesures if not m[2]),
+        "debit_rps": round(len(mesures) / duree, 1) if duree else None,
+        "p50_ms": centile(50),
+        "p95_ms": centile(95),
+        "p99_ms": centile(99),
+        "moyenne_ms": round(statistics.fmean(latences), 2),
+        "sql_par_requete": round(statistics.fmean(sql), 2) if sql else None,
+    }
+
+
+def nb_sql(entetes):
+    trouve = SQL_SERVER_TIMING.search(entetes.get("Server-Timing") or "")
+    return int(trouve.group(1)) if trouve else None
+
+
+# ---------- Client de test Flask ----------
+def requete_test(client, methode, url, donnees=None):
+    debut = time.perf_counter()
+    reponse = client.open(url, method=methode, data=donnees)
+    latence = time.perf_counter() - debut
+    return latence, nb_sql(reponse.headers), reponse.status_code < 400
+
+
+def scenario_test(boutique, nom, rng, ids_produits, utilisateurs, nb):
+    client = boutique.app.test_client()
+    if nom in ("commande", "ajout_panier"):
+        with client.session_transaction() as sess:
+            sess["user_id"] = rng.choice(utilisateurs)
+    if nom in ("admin_dashboard", "analyses"):
+        with client.session_transaction() as sess:
+            sess["admin_logged_in"] = True
+
+    mesures = []
+    debut = time.perf_counter()
+    for _ in range(nb):
+        produit_id = rng.choice(ids_produits)
+        if nom == "accueil":
+            mesures.append(requete_test(client, "GET", "/"))
+        elif nom == "boutique":
+            url = "/boutique" + rng.choice(["", f"?categorie={rng.choice(CATEGORIES)}"])
+            mesures.append(requete_test(client, "GET", url))
+        elif nom == "produit":
+            mesures.append(requete_test(client, "GET", f"/produit/{produit_id}"))
+        elif nom == "ajout_panier":
+            donnees = {"produit_id": produit_id, "quantite": 1}
+            mesures.append(requete_test(client, "POST", "/ajouter-au-panier", donnees))
+        elif nom == "commande":
+            client.post("/ajouter-au-panier", data={"produit_id": produit_id})
+            mesures.append(requete_test(client, "POST", "/traiter-commande", FORMULAIRE))
+        elif nom == "admin_dashboard":
+            page = rng.randint(1, 5)
+            mesures.append(requete_test(client, "GET", f"/admin/dashboard?page={page}"))
+        elif nom == "analyses":
+            mesures.append(requete_test(client, "GET", url_analyses(rng)))
+    # Le client de test est séquentiel : la durée inclut la préparation du panier
+    return mesures, time.perf_counter() - debut
+
+
+# ---------- gunicorn ----------
+def port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def mesurer_import(repetitions=3):
+    """Durée médiane de `import app` dans un interpréteur neuf (secondes)."""
+    code = "import time; d = time.perf_counter(); import app; print(time.perf_counter() - d)"
+    durees = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=RACINE,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        )
+        for _ in range(repetitions)
+    ]
+    return round(statistics.median(durees), 3)
+
+
+def demarrer_gunicorn(port, workers, preload):
+    """Lance gunicorn ; renvoie (processus, secondes jusqu'à la première réponse)."""
+    commande = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers),
+        "--log-level", "warning",
+    ]
+    if preload:
+        commande.append("--preload")
+    debut = time.perf_counter()
+    processus = subprocess.Popen(commande, cwd=RACINE, env=os.environ.copy())
+    for _ in range(1000):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/panier-count", timeout=1)
+        except urllib.error.HTTPError:
+            pass  # une réponse, même d'erreur : le worker est prêt
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.02)
+            continue
+        return processus, round(time.perf_counter() - debut, 3)
+    processus.terminate()
+    raise RuntimeError("gunicorn n'a pas démarré")
+
+
+class Navigateur:
+    """Client HTTP avec cookies (session Flask), sans suivre les redirections."""
+
+    class _SansRedirection(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base):
+        self.base = base
+        self.ouvreur = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            self._SansRedirection(),
+        )
+
+    def requete(self, methode, url, donnees=None):
+        corps = urllib.parse.urlencode(donnees).encode() if donnees else None
+        demande = urllib.request.Request(self.base + url, data=corps, method=methode)
+        debut = time.perf_counter()
+        try:
+            with self.ouvreur.open(demande, timeout=30) as reponse:
+                reponse.read()
+                statut, entetes = reponse.status, reponse.headers
+        except urllib.error.HTTPError as erreur:
+            erreur.read()
+            statut, entetes = erreur.code, erreur.headers
+        return time.perf_counter() - debut, nb_sql(entetes), statut < 400
+
+
+def scenario_http(base, nom, graine, ids_produits, nb, concurrence):
+    mesures = []
+    verrou = threading.Lock()
+
+    def fil(numero, quota):
+        rng = random.Random(graine * 1000 + numero)
+        nav = Navigateur(base)
+        if nom in ("commande", "ajout_panier"):
+            nav.requete(
+                "POST",
+                "/connexion",
+                {"email": f"client{numero}@example.com", "mot_de_passe": MOT_DE_PASSE},
+            )
+        if nom in ("admin_dashboard", "analyses"):
+            nav.requete("POST", "/admin/login", {"username": "admin", "password": "admin123"})
+        locales = []
+        for _ in range(quota):
+            produit_id = rng.choice(ids_produits)
+            if nom == "accueil":
+                locales.append(nav.requete("GET", "/"))
+            elif nom == "boutique":
+                url = "/boutique" + rng.choice(
+                    ["", f"?categorie={rng.choice(CATEGORIES)}"]
+                )
+                locales.append(nav.requete("GET", url))
+            elif nom == "produit":
+                locales.append(nav.requete("GET", f"/produit/{produit_id}"))
+            elif nom == "ajout_panier":
+                donnees = {"produit_id": produit_id, "quantite": 1}
+                locales.append(nav.requete("POST", "/ajouter-au-panier", donnees))
+            elif nom == "commande":
+                nav.requete("POST", "/ajouter-au-panier", {"produit_id": produit_id})
+                locales.append(nav.requete("POST", "/traiter-commande", FORMULAIRE))
+            elif nom == "admin_dashboard":
+                url = f"/admin/dashboard?page={rng.randint(1, 5)}"
+                locales.append(nav.requete("GET", url))
+            elif nom == "analyses":
+                locales.append(nav.requete("GET", url_analyses(rng)))
+        with verrou:
+            mesures.extend(locales)
+
+    fils = [
+        threading.Thread(target=fil, args=(i, nb // concurrence + (i < nb % concurrence)))
+        for i in range(concurrence)
+    ]
+    debut = time.perf_counter()
+    for f in fils:
+        f.start()
+    for f in fils:
+        f.join()
+    return mesures, time.perf_counter() - debut
+
+
+# ---------- Résultats ----------
+def commit_courant():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=RACINE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnu"
+
+
+def afficher(mode, resultats):
+    print(f"\n[{mode}]")
+    print(f"{'scénario':<16} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL/req':>8} err")
+    for nom, r in resultats.items():
+        sql = "-" if r["sql_par_requete"] is None else f"{r['sql_par_requete']:.1f}"
+        print(
+            f"{nom:<16} {r['debit_rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8}"
+            f" {r['p99_ms']:>8} {sql:>8} {r['erreurs']}"
+        )
+
+
+def comparer(ancien, nouveau):
+    """Écart relatif de p95 et du débit, scénario par scénario."""
+    print(f"\nComparaison avec {ancien.get('commit')} ({ancien.get('date')})")
+    for cle, valeur in nouveau["demarrage"].items():
+        avant = ancien.get("demarrage", {}).get(cle)
+        if avant and valeur is not None:
+            print(f"  démarrage    {cle:<16} {100 * (valeur - avant) / avant:+.0f}%")
+    for mode, resultats in nouveau["resultats"].items():
+        for nom, r in resultats.items():
+            avant = ancien.get("resultats", {}).get(mode, {}).get(nom)
+            if not avant:
+                continue
+            ecarts = []
+            for cle in ("p95_ms", "debit_rps", "sql_par_requete"):
+                if avant.get(cle) and r.get(cle) is not None:
+                    ecarts.append(f"{cle} {100 * (r[cle] - avant[cle]) / avant[cle]:+.0f}%")
+            print(f"  {mode:<12} {nom:<16} " + ", ".join(ecarts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produits", type=int, default=2000)
+    parser.add_argument("--utilisateurs", type=int, default=200)
+    parser.add_argument("--commandes", type=int, default=2000)
+    parser.add_argument("--avis", type=int, default=5000)
+    parser.add_argument("--requetes", type=int, default=200, help="par scénario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument(
+        "--sans-cache",
+        action="store_true",
+        help="désactive le cache de pages (mesure le chemin base de données)",
+    )
+    parser.add_argument("--gunicorn", action="store_true", help="mesure aussi via gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--preload", action="store_true", help="gunicorn --preload")
+    parser.add_argument("--concurrence", type=int, default=8)
+    parser.add_argument("--sortie", help="fichier JSON (défaut : benchmarks/resultats/<commit>.json)")
+    parser.add_argument("--comparer", help="résultats précédents à comparer")
+    args = parser.parse_args()
+    scenarios = [s for s in args.scenarios.split(",") if s in SCENARIOS]
+
+    dossier = tempfile.mkdtemp(prefix="maison_du_parfum_")
+    os.environ.update(
+        SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.join(dossier, "charge.db"),
+        METRIQUES="1",
+        METRIQUES_SEUIL_LENT_MS=str(10**9),
+        PANIER_PURGE_INTERVALLE="0",
+    )
+    if args.sans_cache:
+        os.environ["CACHE_TTL"] = "0"
+
+    demarrage = {"import_s": mesurer_import(), "gunicorn_pret_s": None}
+    print(f"Import de app.py : {demarrage['import_s']} s")
+
+    boutique = importer_app()
+    rng = random.Random(args.graine)
+    debut = time.perf_counter()
+    ids_produits, utilisateurs = peupler(
+        boutique, rng, args.produits, args.utilisateurs, args.commandes, args.avis
+    )
+    print(
+        f"Base remplie en {time.perf_counter() - debut:.1f} s : {args.produits} produits, "
+        f"{args.utilisateurs} clients, {args.commandes} commandes, {args.avis} avis."
+    )
+
+    resultats = {"test_client": {}}
+    for nom in scenarios:
+        mesures, duree = scenario_test(
+            boutique, nom, random.Random(args.graine), ids_produits, utilisateurs, args.requetes
+        )
+        resultats["test_client"][nom] = resumer(mesures, duree)
+    afficher("test_client", resultats["test_client"])
+
+    if args.gunicorn:
+        port = port_libre()
+        # Schéma créé par peupler() : comme en production après `flask init-db`
+        os.environ["INIT_DB_AUTO"] = "0"
+        processus, demarrage["gunicorn_pret_s"] = demarrer_gunicorn(
+            port, args.workers, args.preload
+        )
+        print(f"\ngunicorn prêt en {demarrage['gunicorn_pret_s']} s")
+        try:
+            resultats["gunicorn"] = {}
+            concurrence = min(args.concurrence, len(utilisateurs))
+            for nom in scenarios:
+                mesures, duree = scenario_http(
+                    f"http://127.0.0.1:{port}",
+                    nom,
+                    args.graine,
+                    ids_produits,
+                    args.requetes,
+                    concurrence,
+                )
+                resultats["gunicorn"][nom] = resumer(mesures, duree)
+        finally:
+            processus.terminate()
+            processus.wait()
+        afficher(f"gunicorn, {args.workers} workers, {concurrence} clients", resultats["gunicorn"])
+
+    rapport = {
+        "commit": commit_courant(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "parametres": vars(args),
+        "demarrage": demarrage,
+        "resultats": resultats,
+    }
+    sortie = args.sortie or os.path.join(RACINE, "benchmarks", "resultats", f"{rapport['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"\nRésultats écrits dans {sortie}")
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as f:
+            comparer(json.load(f), rapport)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Débit d'écriture SQLite : profil "defaut" contre profil "production".
+
+Chaque profil tourne sur une base neuve. Plusieurs processus (comme des
+workers gunicorn) enchaînent des commandes et des avis en parallèle, via les
+vraies routes traiter_commande et noter_produit. Pour chaque profil, le script
+affiche les écritures par seconde et le nombre d'erreurs ("database is
+locked").
+
+    python benchmarks/ecriture_sqlite.py --processus 8 --ecritures 50
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMULAIRE = {
+    "nom": "Test",
+    "prenom": "Bench",
+    "email": "bench@example.com",
+    "telephone": "0000",
+    "adresse": "1 rue du Test",
+    "ville": "Paris",
+    "code_postal": "75000",
+    "pays": "France",
+}
+
+
+def importer_app():
+    os.chdir(RACINE)
+    sys.path.insert(0, RACINE)
+    import app
+
+    return app
+
+
+def preparer(nb_processus):
+    """Crée un utilisateur et un produit (stock illimité) par processus."""
+    boutique = importer_app()
+    with boutique.app.app_context():
+        boutique.init_db()
+        paires = []
+        for i in range(nb_processus):
+            utilisateur = boutique.Utilisateur(
+                prenom="Bench",
+                nom=str(i),
+                email=f"bench{i}@example.com",
+                mot_de_passe_hash="-",
+            )
+            produit = boutique.Produit(
+                nom=f"Produit {i}", prix=10.0, categorie="parfums", stock=10**9
+            )
+            boutique.db.session.add_all([utilisateur, produit])
+            boutique.db.session.flush()
+            paires.append((utilisateur.id, produit.id))
+        boutique.db.session.commit()
+    return paires
+
+
+def ecrivain(parametres):
+    """Alterne commandes et avis ; renvoie les compteurs de résultats."""
+    utilisateur_id, produit_id, nb_ecritures = parametres
+    boutique = importer_app()
+    client = boutique.app.test_client()
+    resultats = Counter()
+
+    debut = time.time()
+    for i in range(nb_ecritures):
+        with client.session_transaction() as sess:
+            sess["user_id"] = utilisateur_id
+            sess["panier_id"] = boutique.panier_utilisateur(utilisateur_id)
+        with boutique.app.app_context():
+            boutique.stockage_paniers.ecrire(
+                boutique.panier_utilisateur(utilisateur_id), {produit_id: 1}
+            )
+        if i % 2:
+            reponse = client.post(
+                f"/produit/{produit_id}/noter", data={"note": 1 + i % 5}
+            )
+        else:
+            reponse = client.post("/traiter-commande", data=FORMULAIRE)
+        resultats["ok" if reponse.status_code < 500 else "erreurs"] += 1
+
+    return resultats, debut, time.time()
+
+
+def mesurer(profil, nb_processus, nb_ecritures):
+    dossier = tempfile.mkdtemp(prefix="maison_du_parfum_")
+    os.environ["SQLITE_PROFIL"] = profil
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
+        dossier, "bench.db"
+    )
+
+    # Contexte "spawn" : chaque processus relit l'environnement du profil
+    contexte = multiprocessing.get_context("spawn")
+    with contexte.Pool(1) as pool:
+        paires = pool.apply(preparer, (nb_processus,))
+
+    with contexte.Pool(nb_processus) as pool:
+        parts = pool.map(ecrivain, [(u, p, nb_ecritures) for u, p in paires])
+
+    # Durée mesurée dans les processus, hors démarrage et import de l'app
+    resultats = sum((r for r, _, _ in parts), Counter())
+    duree = max(fin for _, _, fin in parts) - min(debut for _, debut, _ in parts)
+    return {
+        "profil": profil,
+        "ecritures": resultats["ok"],
+        "erreurs": resultats["erreurs"],
+        "duree_s": round(duree, 3),
+        "ecritures_par_s": round(resultats["ok"] / duree, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processus", type=int, default=8)
+    parser.add_argument("--ecritures", type=int, default=50, help="par processus")
+    args = parser.parse_args()
+
+    for profil in ("defaut", "production"):
+        r = mesurer(profil, args.processus, args.ecritures)
+        print(
+            f"{r['profil']:<11} {r['ecritures']:>6} écritures en {r['duree_s']:>7.2f} s"
+            f"  -> {r['ecritures_par_s']:>7.1f} écritures/s, {r['erreurs']} erreur(s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
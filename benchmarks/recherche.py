@@ -0,0 +1,122 @@
+"""Benchmark de la recherche plein texte sur un catalogue synthétique.
+
+Remplit une base neuve avec N produits générés. Les triggers alimentent
+l'index FTS5 pendant l'insertion. Le script mesure ensuite la latence de
+rechercher_produits() (FTS5 + BM25) et celle d'un LIKE équivalent sur les
+mêmes requêtes. Le LIKE ne classe pas les résultats : il s'arrête aux premiers
+trouvés, et parcourt toute la table quand un mot est rare ou absent.
+
+    python benchmarks/recherche.py --produits 100000 --repetitions 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TYPES = ["Parfum", "Eau de toilette", "Crème", "Sérum", "Baume", "Lotion", "Huile"]
+QUALIFICATIFS = ["Élégance", "Hydratante", "Luxe", "Velours", "Éclat", "Nuit", "Soleil"]
+NOTES = [
+    "Bergamote", "Rose", "Jasmin", "Santal", "Vanille", "Musc", "Ambre",
+    "Iris", "Vétiver", "Patchouli", "Néroli", "Fève tonka", "Cèdre", "Poivre rose",
+]
+PEAUX = ["Tous types", "Peau sèche et normale", "Peau grasse", "Peau sensible"]
+CATEGORIES = ["parfums", "soins-visage", "soins-corps", "maquillage"]
+REQUETES = ["creme", "rose jasmin", "cre", "eau de toilette", "vetiver", "peau seche",
+            "huile nuit", "santal vanille", "luxe", "patch"]
+
+
+def produit_synthetique(rng, i):
+    nom = f"{rng.choice(TYPES)} {rng.choice(QUALIFICATIFS)} {i}"
+    notes = rng.sample(NOTES, 4)
+    return {
+        "nom": nom,
+        "prix": round(rng.uniform(9, 250), 2),
+        "categorie": rng.choice(CATEGORIES),
+        "description_courte": f"{nom} aux notes de {notes[0].lower()}",
+        "description": f"Une composition autour de {', '.join(notes).lower()}.",
+        "stock": rng.randint(0, 100),
+        "notes": "Notes de tête: {}, Notes de cœur: {}, Notes de fond: {}, {}".format(
+            *notes
+        ),
+        "type_peau": rng.choice(PEAUX),
+        "nb_avis": 0,
+        "somme_notes": 0,
+        "note_moyenne": 0,
+        "nb_ventes": 0,
+    }
+
+
+def centile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produits", type=int, default=100_000)
+    parser.add_argument("--repetitions", type=int, default=20)
+    args = parser.parse_args()
+
+    dossier = tempfile.mkdtemp(prefix="maison_du_parfum_")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
+        dossier, "recherche.db"
+    )
+    os.chdir(RACINE)
+    sys.path.insert(0, RACINE)
+    import app as boutique
+
+    db, Produit = boutique.db, boutique.Produit
+    rng = random.Random(42)
+
+    with boutique.app.app_context():
+        boutique.init_db()
+        debut = time.perf_counter()
+        for lot in range(0, args.produits, 5000):
+            db.session.execute(
+                db.insert(Produit),
+                [
+                    produit_synthetique(rng, i)
+                    for i in range(lot, min(lot + 5000, args.produits))
+                ],
+            )
+        db.session.commit()
+        print(f"{args.produits} produits insérés et indexés en "
+              f"{time.perf_counter() - debut:.1f} s")
+
+        def like(texte, limite):
+            query = Produit.query
+            for mot in texte.split():
+                motif = f"%{mot}%"
+                query = query.filter(
+                    db.or_(
+                        Produit.nom.ilike(motif),
+                        Produit.description_courte.ilike(motif),
+                        Produit.description.ilike(motif),
+                        Produit.notes.ilike(motif),
+                        Produit.type_peau.ilike(motif),
+                    )
+                )
+            return query.limit(limite).all()
+
+        for nom, fonction in (("FTS5 + BM25", boutique.rechercher_produits),
+                              ("LIKE", like)):
+            durees = []
+            for _ in range(args.repetitions):
+                for texte in REQUETES:
+                    t0 = time.perf_counter()
+                    fonction(texte, 12)
+                    durees.append((time.perf_counter() - t0) * 1000)
+                    db.session.expunge_all()
+            print(
+                f"{nom:<12} p50 {statistics.median(durees):7.2f} ms  "
+                f"p95 {centile(durees, 95):7.2f} ms  max {max(durees):7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
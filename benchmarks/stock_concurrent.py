@@ -0,0 +1,132 @@
+"""Test de charge : commandes concurrentes sur un même produit.
+
+Plusieurs processus (comme des workers gunicorn) passent des commandes en
+parallèle sur un seul produit au stock limité. À la fin, on vérifie que le
+stock n'est jamais négatif et qu'il correspond exactement aux commandes
+acceptées.
+
+    python benchmarks/stock_concurrent.py --processus 8 --commandes 25 --stock 60
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMULAIRE = {
+    "nom": "Test",
+    "prenom": "Charge",
+    "email": "charge@example.com",
+    "telephone": "0000",
+    "adresse": "1 rue du Test",
+    "ville": "Paris",
+    "code_postal": "75000",
+    "pays": "France",
+}
+
+
+def importer_app():
+    os.chdir(RACINE)
+    sys.path.insert(0, RACINE)
+    import app
+
+    return app
+
+
+def acheteur(parametres):
+    """Processus client : enchaîne des commandes du même produit."""
+    utilisateur_id, produit_id, quantite, nb_commandes = parametres
+    boutique = importer_app()
+    client = boutique.app.test_client()
+    resultats = Counter()
+
+    for _ in range(nb_commandes):
+        with client.session_transaction() as sess:
+            sess["user_id"] = utilisateur_id
+            sess["panier_id"] = boutique.panier_utilisateur(utilisateur_id)
+        with boutique.app.app_context():
+            boutique.stockage_paniers.ecrire(
+                boutique.panier_utilisateur(utilisateur_id), {produit_id: quantite}
+            )
+        reponse = client.post("/traiter-commande", data=FORMULAIRE)
+        if reponse.status_code == 200:
+            resultats["acceptees"] += 1
+        elif reponse.status_code == 302:
+            resultats["refusees"] += 1
+        else:
+            resultats["erreurs"] += 1
+
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processus", type=int, default=8)
+    parser.add_argument("--commandes", type=int, default=25, help="par processus")
+    parser.add_argument("--quantite", type=int, default=1, help="par commande")
+    parser.add_argument("--stock", type=int, default=60)
+    args = parser.parse_args()
+
+    dossier = tempfile.mkdtemp(prefix="maison_du_parfum_")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
+        dossier, "charge.db"
+    )
+
+    boutique = importer_app()
+    with boutique.app.app_context():
+        boutique.init_db()
+        produit = boutique.Produit(
+            nom="Produit disputé", prix=10.0, categorie="parfums", stock=args.stock
+        )
+        utilisateur = boutique.Utilisateur(
+            prenom="Charge", nom="Test", email="charge@example.com", mot_de_passe_hash="-"
+        )
+        boutique.db.session.add_all([produit, utilisateur])
+        boutique.db.session.commit()
+        produit_id, utilisateur_id = produit.id, utilisateur.id
+        boutique.db.engine.dispose()
+
+    debut = time.perf_counter()
+    contexte = multiprocessing.get_context("spawn")
+    with contexte.Pool(args.processus) as pool:
+        parts = pool.map(
+            acheteur,
+            [(utilisateur_id, produit_id, args.quantite, args.commandes)]
+            * args.processus,
+        )
+    duree = time.perf_counter() - debut
+    resultats = sum(parts, Counter())
+
+    with boutique.app.app_context():
+        stock_final = boutique.db.session.get(boutique.Produit, produit_id).stock
+        vendu = (
+            boutique.db.session.query(
+                boutique.db.func.coalesce(
+                    boutique.db.func.sum(boutique.LigneCommande.quantite), 0
+                )
+            )
+            .filter(boutique.LigneCommande.produit_id == produit_id)
+            .scalar()
+        )
+
+    print(f"Commandes acceptées : {resultats['acceptees']}")
+    print(f"Commandes refusées  : {resultats['refusees']}")
+    print(f"Erreurs             : {resultats['erreurs']}")
+    print(f"Stock final         : {stock_final} (initial {args.stock}, vendu {vendu})")
+    print(f"Durée               : {duree:.2f} s")
+
+    coherent = (
+        stock_final >= 0
+        and stock_final == args.stock - vendu
+        and vendu == resultats["acceptees"] * args.quantite
+    )
+    print("OK : stock cohérent" if coherent else "ÉCHEC : stock incohérent")
+    return 0 if coherent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
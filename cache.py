@@ -0,0 +1,99 @@
+"""Backends de cache pour les pages du catalogue.
+
+Un backend expose trois opérations : get(cle), set(cle, valeur, ttl) et
+incr(cle). L'invalidation repose sur un compteur de génération (incr) inclus
+dans les clés : l'incrémenter rend obsolètes toutes les entrées précédentes,
+sans avoir à les parcourir.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # dépendance optionnelle
+    redis = None
+
+
+class BackendCache:
+    """Interface commune des backends de cache."""
+
+    def get(self, cle):
+        raise NotImplementedError
+
+    def set(self, cle, valeur, ttl):
+        raise NotImplementedError
+
+    def incr(self, cle) -> int:
+        raise NotImplementedError
+
+    def compteur(self, cle) -> int:
+        raise NotImplementedError
+
+
+class CacheMemoire(BackendCache):
+    """Cache LRU en mémoire du processus, avec expiration (TTL) par entrée."""
+
+    def __init__(self, max_entrees=512):
+        self.max_entrees = max_entrees
+        self._entrees = OrderedDict()
+        self._compteurs = {}
+        self._verrou = threading.Lock()
+
+    def get(self, cle):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+            expire_le, valeur = entree
+            if expire_le < time.monotonic():
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return valeur
+
+    def set(self, cle, valeur, ttl):
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic() + ttl, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.max_entrees:
+                self._entrees.popitem(last=False)
+
+    def incr(self, cle) -> int:
+        # Les compteurs ne sont jamais évincés par le LRU
+        with self._verrou:
+            self._compteurs[cle] = self._compteurs.get(cle, 0) + 1
+            return self._compteurs[cle]
+
+    def compteur(self, cle) -> int:
+        return self._compteurs.get(cle, 0)
+
+
+class CacheRedis(BackendCache):
+    """Cache partagé entre workers, sur un serveur compatible Redis."""
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("Le backend 'redis' nécessite le paquet redis.")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, cle):
+        valeur = self._client.get(cle)
+        return pickle.loads(valeur) if valeur is not None else None
+
+    def set(self, cle, valeur, ttl):
+        self._client.set(cle, pickle.dumps(valeur), ex=ttl)
+
+    def incr(self, cle) -> int:
+        return self._client.incr(cle)
+
+    def compteur(self, cle) -> int:
+        return int(self._client.get(cle) or 0)
+
+
+def creer_backend(nom, max_entrees=512, url=None) -> BackendCache:
+    """Instancie le backend nommé ("memoire" ou "redis")."""
+    if nom == "redis":
+        return CacheRedis(url)
+    return CacheMemoire(max_entrees)
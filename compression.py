@@ -0,0 +1,172 @@
+"""Compression gzip / brotli des réponses texte, en middleware WSGI.
+
+Le corps est compressé au fil de l'eau, morceau par morceau (pages, JSON,
+exports en flux) : quand la taille n'est pas annoncée, seuls les premiers
+octets sont retenus, le temps de savoir si la réponse atteint le seuil. Les
+réponses déjà compressées (assets précompressés de static/dist/), binaires
+(images) ou plus petites que le seuil passent telles quelles.
+
+L'ETag d'une réponse compressée reçoit le suffixe de l'encodage ("v1" devient
+"v1-gzip") : deux représentations différentes n'ont pas le même ETag fort. Le
+suffixe est retiré de If-None-Match avant d'appeler l'application, dont les
+réponses 304 fonctionnent ainsi sans rien savoir de la compression.
+"""
+import itertools
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : gzip seulement
+    brotli = None
+
+TYPES_COMPRESSIBLES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+STATUTS_NON_COMPRESSES = (204, 206, 304)
+
+
+def ajouter_vary(entetes, nom):
+    valeurs = [v.strip() for v in entetes.get("Vary", "").split(",") if v.strip()]
+    if nom.lower() not in (v.lower() for v in valeurs):
+        entetes["Vary"] = ", ".join(valeurs + [nom])
+
+
+def suffixer_etag(entetes, encodage):
+    """ "v1" -> "v1-gzip" ; un ETag faible (W/) reste valable tel quel."""
+    etag = entetes.get("ETag")
+    if etag and etag.endswith('"') and not etag.startswith("W/"):
+        entetes["ETag"] = f'{etag[:-1]}-{encodage}"'
+
+
+def ecrire_non_supporte(donnees):
+    raise RuntimeError("write() n'est pas pris en charge par la compression.")
+
+
+class Compresseur:
+    """Compression incrémentale ; chaque morceau est vidé (flush) pour être
+    envoyé sans attendre la suite de la réponse."""
+
+    def __init__(self, encodage, niveau_gzip=6, qualite_brotli=5):
+        if encodage == "br":
+            self._brotli = brotli.Compressor(quality=qualite_brotli)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(
+                niveau_gzip, zlib.DEFLATED, 16 + zlib.MAX_WBITS  # format gzip
+            )
+
+    def compresser(self, morceau) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(morceau) + self._brotli.flush()
+        return self._zlib.compress(morceau) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminer(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class Compression:
+    """Middleware WSGI : compresse les réponses texte d'au moins `seuil` octets."""
+
+    def __init__(self, app, seuil=1024, niveau_gzip=6, qualite_brotli=5):
+        self.app = app
+        self.seuil = seuil
+        self.niveau_gzip = niveau_gzip
+        self.qualite_brotli = qualite_brotli
+        self.encodages = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    def __call__(self, environ, start_response):
+        encodage = None
+        if environ.get("REQUEST_METHOD") != "HEAD":
+            encodage = parse_accept_header(
+                environ.get("HTTP_ACCEPT_ENCODING")
+            ).best_match(self.encodages)
+
+        # ETag suffixé renvoyé par le client : l'application attend l'original
+        suffixe = f'-{encodage}"'
+        si_aucun = environ.get("HTTP_IF_NONE_MATCH", "")
+        revalidation = encodage is not None and suffixe in si_aucun
+        if revalidation:
+            environ = dict(environ, HTTP_IF_NONE_MATCH=si_aucun.replace(suffixe, '"'))
+
+        reponse = []
+
+        def intercepter(status, headers, exc_info=None):
+            reponse[:] = [status, Headers(headers), exc_info]
+            return ecrire_non_supporte
+
+        # Comme toute vue Flask, l'application appelle start_response avant de
+        # rendre le corps : les en-têtes sont connus ici
+        corps = self.app(environ, intercepter)
+        status, entetes, exc_info = reponse
+        code = int(status.split(" ", 1)[0])
+        if code == 304 and revalidation:
+            suffixer_etag(entetes, encodage)
+            ajouter_vary(entetes, "Accept-Encoding")
+
+        type_contenu = entetes.get("Content-Type", "").split(";")[0].strip()
+        if (
+            code < 200
+            or code in STATUTS_NON_COMPRESSES
+            or "Content-Encoding" in entetes
+            or not type_contenu.startswith(TYPES_COMPRESSIBLES)
+        ):
+            start_response(status, entetes.to_wsgi_list(), exc_info)
+            return corps  # tel quel : wsgi.file_wrapper (sendfile) conservé
+
+        ajouter_vary(entetes, "Accept-Encoding")
+        longueur = entetes.get("Content-Length", type=int)
+        if (
+            encodage is None
+            or (longueur is not None and longueur < self.seuil)
+            or "no-transform" in entetes.get("Cache-Control", "")
+        ):
+            start_response(status, entetes.to_wsgi_list(), exc_info)
+            return corps
+
+        return self._compresser(
+            corps, status, entetes, exc_info, encodage, start_response
+        )
+
+    def _compresser(self, corps, status, entetes, exc_info, encodage, start_response):
+        try:
+            morceaux = iter(corps)
+            tampon = []
+            if "Content-Length" not in entetes:
+                # Taille inconnue : les premiers morceaux sont retenus jusqu'au seuil
+                taille = 0
+                for morceau in morceaux:
+                    tampon.append(morceau)
+                    taille += len(morceau)
+                    if taille >= self.seuil:
+                        break
+                else:
+                    entetes["Content-Length"] = str(taille)
+                    start_response(status, entetes.to_wsgi_list(), exc_info)
+                    yield b"".join(tampon)
+                    return
+
+            del entetes["Content-Length"]
+            entetes["Content-Encoding"] = encodage
+            suffixer_etag(entetes, encodage)
+            start_response(status, entetes.to_wsgi_list(), exc_info)
+
+            compresseur = Compresseur(encodage, self.niveau_gzip, self.qualite_brotli)
+            for morceau in itertools.chain([b"".join(tampon)], morceaux):
+                if morceau:
+                    donnees = compresseur.compresser(morceau)
+                    if donnees:
+                        yield donnees
+            yield compresseur.terminer()
+        finally:
+            if hasattr(corps, "close"):
+                corps.close()
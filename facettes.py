@@ -0,0 +1,249 @@
+"""Index de facettes en mémoire pour la boutique.
+
+Chaque valeur de facette a un bitmap des produits qui la portent : un entier
+Python dont le bit n correspond au produit d'id n. Filtrer revient à faire des
+ET/OU entre bitmaps. Compter revient à calculer la population d'une
+intersection (int.bit_count). Des listes triées par clé de tri permettent de
+paginer le résultat sans interroger la base.
+
+L'index est construit une fois à partir de la table puis maintenu produit par
+produit (mettre_a_jour / retirer).
+"""
+import bisect
+import threading
+import time
+
+# Tranches de prix : (clé, borne basse incluse, borne haute exclue, libellé)
+TRANCHES_PRIX = (
+    ("0-25", 0, 25, "Moins de 25 €"),
+    ("25-50", 25, 50, "25 à 50 €"),
+    ("50-100", 50, 100, "50 à 100 €"),
+    ("100+", 100, None, "100 € et plus"),
+)
+
+# Notes minimales proposées (un produit noté 4,5 est dans "4", "3", "2" et "1")
+NOTES_MINIMALES = ("4", "3", "2", "1")
+
+# En dessous de ce nombre de produits retenus, la page est triée à partir des
+# seuls ids retenus plutôt qu'en parcourant l'ordre complet du catalogue
+SEUIL_SELECTION_CREUSE = 5000
+
+FACETTES = ("categorie", "pour_qui", "contenance", "type_peau", "prix", "note")
+LIBELLES_FACETTES = {
+    "categorie": "Catégorie",
+    "pour_qui": "Pour qui",
+    "contenance": "Contenance",
+    "type_peau": "Type de peau",
+    "prix": "Prix",
+    "note": "Note",
+}
+
+
+def valeurs_facettes(produit) -> dict:
+    """{facette: [valeurs]} d'un produit (objet exposant les colonnes utiles)."""
+    valeurs = {
+        "categorie": [produit.categorie],
+        "pour_qui": [produit.pour_qui],
+        "contenance": [produit.contenance],
+        "type_peau": [produit.type_peau],
+        "prix": [
+            cle
+            for cle, bas, haut, _ in TRANCHES_PRIX
+            if produit.prix >= bas and (haut is None or produit.prix < haut)
+        ],
+        "note": [
+            n
+            for n in NOTES_MINIMALES
+            if produit.nb_avis and produit.note_moyenne >= int(n)
+        ],
+    }
+    return {facette: [v for v in vals if v] for facette, vals in valeurs.items()}
+
+
+def libelle_valeur(facette, valeur) -> str:
+    if facette == "prix":
+        return next(libelle for cle, _, _, libelle in TRANCHES_PRIX if cle == valeur)
+    if facette == "note":
+        return f"{valeur} ★ et plus"
+    if facette == "categorie":
+        return valeur.replace("-", " ").title()
+    return valeur
+
+
+class IndexFacettes:
+    def __init__(self, cles_tri):
+        # cles_tri : attributs des produits servant à paginer (ex. "cree_le")
+        self.cles_tri = tuple(cles_tri)
+        self.construit_le = None
+        self._verrou = threading.Lock()
+        self._vider()
+
+    def _vider(self):
+        self.bitmaps = {facette: {} for facette in FACETTES}
+        self.tous = 0
+        self.valeurs = {}  # id -> {facette: [valeurs]}
+        self.positions = {}  # id -> {cle_tri: (cle, id)}
+        self.ordres = {cle: [] for cle in self.cles_tri}  # (cle, id) croissants
+
+    # ----- maintenance -----
+    def construire(self, produits):
+        # Construit à part, hors verrou (lecture de la table), puis échangé :
+        # les lectures concurrentes voient l'ancien index ou le nouveau, entier
+        nouveau = IndexFacettes(self.cles_tri)
+        for produit in produits:
+            nouveau._ajouter(produit)
+        for cle in self.cles_tri:
+            nouveau.ordres[cle].sort()
+        with self._verrou:
+            self.bitmaps = nouveau.bitmaps
+            self.tous = nouveau.tous
+            self.valeurs = nouveau.valeurs
+            self.positions = nouveau.positions
+            self.ordres = nouveau.ordres
+            self.construit_le = time.monotonic()
+
+    def invalider(self):
+        """Force une reconstruction à la prochaine lecture (import en masse)."""
+        self.construit_le = None
+
+    def perime(self, ttl) -> bool:
+        return self.construit_le is None or time.monotonic() - self.construit_le > ttl
+
+    def mettre_a_jour(self, produit):
+        with self._verrou:
+            self._retirer(produit.id)
+            self._ajouter(produit, trie=True)
+
+    def retirer(self, produit_id):
+        with self._verrou:
+            self._retirer(produit_id)
+
+    def _ajouter(self, produit, trie=False):
+        bit = 1 << produit.id
+        valeurs = valeurs_facettes(produit)
+        for facette, vals in valeurs.items():
+            bitmaps = self.bitmaps[facette]
+            for valeur in vals:
+                bitmaps[valeur] = bitmaps.get(valeur, 0) | bit
+        self.tous |= bit
+        self.valeurs[produit.id] = valeurs
+
+        positions = {}
+        for cle in self.cles_tri:
+            position = (getattr(produit, cle), produit.id)
+            positions[cle] = position
+            if trie:
+                bisect.insort(self.ordres[cle], position)
+            else:
+                self.ordres[cle].append(position)
+        self.positions[produit.id] = positions
+
+    def _retirer(self, produit_id):
+        valeurs = self.valeurs.pop(produit_id, None)
+        if valeurs is None:
+            return
+        masque = ~(1 << produit_id)
+        for facette, vals in valeurs.items():
+            for valeur in vals:
+                reste = self.bitmaps[facette][valeur] & masque
+                if reste:
+                    self.bitmaps[facette][valeur] = reste
+                else:
+                    del self.bitmaps[facette][valeur]
+        self.tous &= masque
+        for cle, position in self.positions.pop(produit_id).items():
+            ordre = self.ordres[cle]
+            i = bisect.bisect_left(ordre, position)
+            if i < len(ordre) and ordre[i] == position:
+                del ordre[i]
+
+    # ----- lecture -----
+    def selection(self, filtres, sauf=None) -> int:
+        """Bitmap des produits retenus : OU dans une facette, ET entre facettes.
+
+        À appeler sous le verrou (cf. page et compter).
+        """
+        resultat = self.tous
+        for facette, valeurs in filtres.items():
+            if facette == sauf:
+                continue
+            union = 0
+            for valeur in valeurs:
+                union |= self.bitmaps[facette].get(valeur, 0)
+            resultat &= union
+        return resultat
+
+    def compter(self, filtres) -> dict:
+        """{facette: [(valeur, libellé, nombre)]}.
+
+        Le nombre affiché pour une valeur tient compte des filtres des autres
+        facettes, mais pas de celui de la facette elle-même.
+        """
+        with self._verrou:
+            return self._compter(filtres)
+
+    def _compter(self, filtres):
+        comptes = {}
+        for facette in FACETTES:
+            base = self.selection(filtres, sauf=facette)
+            valeurs = sorted(
+                self.bitmaps[facette].items(),
+                key=lambda v: ordre_valeur(facette, v[0]),
+            )
+            comptes[facette] = [
+                (valeur, libelle_valeur(facette, valeur), (bitmap & base).bit_count())
+                for valeur, bitmap in valeurs
+            ]
+        return comptes
+
+    def page(self, filtres, cle_tri, apres, taille):
+        """Ids de la page des produits retenus par `filtres` (ordre décroissant
+        sur (cle_tri, id)) et curseur suivant.
+
+        `apres` est la position (cle, id) du dernier produit de la page
+        précédente, ou None pour la première page. Sélection et pagination
+        sont faites sous le même verrou, sur un état cohérent de l'index.
+        """
+        with self._verrou:
+            return self._page(self.selection(filtres), cle_tri, apres, taille)
+
+    def _page(self, selection, cle_tri, apres, taille):
+        if selection == self.tous:
+            ordre, tester = self.ordres[cle_tri], False
+        elif selection.bit_count() <= SEUIL_SELECTION_CREUSE:
+            ordre = sorted(self.positions[i][cle_tri] for i in ids_du_bitmap(selection))
+            tester = False
+        else:
+            ordre, tester = self.ordres[cle_tri], True
+
+        i = len(ordre) if apres is None else bisect.bisect_left(ordre, apres)
+        ids = []
+        while i > 0 and len(ids) <= taille:
+            i -= 1
+            _, produit_id = ordre[i]
+            if not tester or selection >> produit_id & 1:
+                ids.append(produit_id)
+        if len(ids) > taille:
+            ids = ids[:taille]
+            return ids, self.positions[ids[-1]][cle_tri]
+        return ids, None
+
+
+def ids_du_bitmap(bitmap):
+    """Ids des bits à 1 d'un bitmap."""
+    bits = bin(bitmap)[:1:-1]  # bit de poids faible en premier
+    ids = []
+    i = bits.find("1")
+    while i != -1:
+        ids.append(i)
+        i = bits.find("1", i + 1)
+    return ids
+
+
+def ordre_valeur(facette, valeur):
+    """Ordre d'affichage des valeurs : tranches et notes dans leur ordre naturel."""
+    if facette == "prix":
+        return [cle for cle, _, _, _ in TRANCHES_PRIX].index(valeur)
+    if facette == "note":
+        return NOTES_MINIMALES.index(valeur)
+    return valeur
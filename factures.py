@@ -0,0 +1,106 @@
+"""Factures PDF des commandes.
+
+Le PDF est écrit directement (pages A4, police Helvetica intégrée aux
+lecteurs, encodage WinAnsi pour les accents et le signe €), sans dépendance.
+"""
+
+MARGE = 56
+HAUTEUR_PAGE = 842
+LARGEUR_PAGE = 595
+INTERLIGNE = 16
+LIGNES_PAR_PAGE = 40
+
+
+def _texte_pdf(texte) -> str:
+    """Chaîne littérale PDF (parenthèses et antislashs échappés)."""
+    texte = str(texte).replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"({texte})"
+
+
+def _contenu(lignes) -> bytes:
+    """Flux de contenu : une ligne de texte par entrée (taille, x, texte)."""
+    y = HAUTEUR_PAGE - MARGE
+    instructions = ["BT"]
+    for taille, x, texte in lignes:
+        instructions.append(
+            f"/F1 {taille} Tf 1 0 0 1 {x} {y} Tm {_texte_pdf(texte)} Tj"
+        )
+        y -= INTERLIGNE + (taille - 10)
+    instructions.append("ET")
+    return "\n".join(instructions).encode("cp1252", "replace")
+
+
+def pdf(lignes) -> bytes:
+    """PDF de LIGNES_PAR_PAGE lignes par page, autant de pages que nécessaire.
+
+    Objets : 1 catalogue, 2 arbre des pages, 3 police, puis pour chaque page
+    son objet /Page et son flux de contenu.
+    """
+    pages = [
+        lignes[debut : debut + LIGNES_PAR_PAGE]
+        for debut in range(0, max(len(lignes), 1), LIGNES_PAR_PAGE)
+    ]
+    numeros = [4 + 2 * i for i in range(len(pages))]
+    objets = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{n} 0 R' for n in numeros)}] "
+        f"/Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+        b"/Encoding /WinAnsiEncoding >>",
+    ]
+    for numero, page in zip(numeros, pages):
+        page_pdf = (
+            "<< /Type /Page /Parent 2 0 R "
+            f"/MediaBox [0 0 {LARGEUR_PAGE} {HAUTEUR_PAGE}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {numero + 1} 0 R >>"
+        )
+        contenu = _contenu(page)
+        objets += [
+            page_pdf.encode(),
+            f"<< /Length {len(contenu)} >>\nstream\n".encode()
+            + contenu
+            + b"\nendstream",
+        ]
+
+    sortie = bytearray(b"%PDF-1.4\n")
+    positions = []
+    for numero, objet in enumerate(objets, start=1):
+        positions.append(len(sortie))
+        sortie += f"{numero} 0 obj\n".encode() + objet + b"\nendobj\n"
+    debut_xref = len(sortie)
+    sortie += f"xref\n0 {len(objets) + 1}\n0000000000 65535 f \n".encode()
+    for position in positions:
+        sortie += f"{position:010d} 00000 n \n".encode()
+    sortie += (
+        f"trailer\n<< /Size {len(objets) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{debut_xref}\n%%EOF\n"
+    ).encode()
+    return bytes(sortie)
+
+
+def facture_pdf(commande, lignes) -> bytes:
+    """Facture d'une commande.
+
+    `lignes` : (nom du produit, quantité, prix unitaire, sous-total).
+    """
+    contenu = [
+        (18, MARGE, "La Maison du Parfum"),
+        (14, MARGE, f"Facture n° {commande.id}"),
+        (10, MARGE, f"Date : {commande.date:%d/%m/%Y}"),
+        (10, MARGE, ""),
+        (10, MARGE, f"{commande.prenom or ''} {commande.nom or ''}".strip()),
+        (10, MARGE, commande.adresse or ""),
+        (10, MARGE, f"{commande.code_postal or ''} {commande.ville or ''}".strip()),
+        (10, MARGE, commande.pays or ""),
+        (10, MARGE, ""),
+    ]
+    for nom, quantite, prix_unitaire, sous_total in lignes:
+        contenu.append(
+            (
+                10,
+                MARGE,
+                f"{nom} — {quantite} x {prix_unitaire:.2f} € = {sous_total:.2f} €",
+            )
+        )
+    contenu += [(10, MARGE, ""), (12, MARGE, f"Total TTC : {commande.total:.2f} €")]
+    return pdf(contenu)
@@ -0,0 +1,52 @@
+"""Génération des variantes redimensionnées (WebP) des images envoyées.
+
+Les variantes sont écrites à côté de l'original, dans un sous-dossier
+"variantes", à quelques largeurs fixes. Les templates les utilisent dans un
+attribut srcset.
+"""
+import os
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # dépendance optionnelle : sans Pillow, pas de variantes
+    Image = None
+
+QUALITE_WEBP = 80
+
+
+def generer_variantes(chemin_source: str, largeurs) -> dict:
+    """Crée une variante WebP par largeur (sans jamais agrandir l'original).
+
+    Renvoie {largeur: nom_de_fichier} ; les fichiers sont dans
+    <dossier de l'original>/variantes/.
+    """
+    if Image is None:
+        return {}
+
+    dossier, nom = os.path.split(chemin_source)
+    dossier_variantes = os.path.join(dossier, "variantes")
+    os.makedirs(dossier_variantes, exist_ok=True)
+    base = os.path.splitext(nom)[0]
+
+    variantes = {}
+    with Image.open(chemin_source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA")
+
+        for largeur in sorted(largeurs):
+            cible = min(largeur, original.width)
+            copie = original.copy()
+            copie.thumbnail((cible, cible * 4), Image.Resampling.LANCZOS)
+            fichier = f"{base}-{copie.width}.webp"
+            copie.save(
+                os.path.join(dossier_variantes, fichier),
+                "WEBP",
+                quality=QUALITE_WEBP,
+                method=4,
+            )
+            variantes[copie.width] = fichier
+            if cible == original.width:
+                break
+
+    return variantes
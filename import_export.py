@@ -0,0 +1,180 @@
+"""Lecture et écriture en flux des fichiers d'import/export (CSV ou JSON).
+
+Rien n'est chargé en entier : les lecteurs sont des générateurs
+d'enregistrements, les écrivains des générateurs de morceaux de texte
+utilisables tels quels comme corps de réponse HTTP.
+
+Formats JSON acceptés en lecture : un tableau d'objets (comme
+data/produits.json) ou un objet par ligne (JSON Lines).
+"""
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from itertools import islice
+
+TAILLE_LECTURE = 64 * 1024
+SEPARATEURS_JSON = re.compile(r"[\s,\[\]]*")
+
+COLONNES_PRODUIT = (
+    "id",
+    "nom",
+    "prix",
+    "categorie",
+    "description_courte",
+    "description",
+    "image",
+    "stock",
+    "notes",
+    "contenance",
+    "type_peau",
+    "pour_qui",
+)
+CHAMPS_CLIENT = (
+    "nom",
+    "prenom",
+    "email",
+    "telephone",
+    "adresse",
+    "ville",
+    "code_postal",
+    "pays",
+)
+COLONNES_COMMANDE_CSV = (
+    ("commande_id", "date")
+    + CHAMPS_CLIENT
+    + ("total", "statut", "produit_id", "quantite", "prix_unitaire", "sous_total")
+)
+
+
+def format_fichier(nom) -> str:
+    """"csv" ou "json" selon l'extension (ValueError sinon)."""
+    extension = nom.rsplit(".", 1)[-1].lower() if "." in nom else ""
+    if extension in ("json", "jsonl"):
+        return "json"
+    if extension == "csv":
+        return "csv"
+    raise ValueError(f"Format non pris en charge : {nom!r} (CSV ou JSON).")
+
+
+def lire_json(flux):
+    """Objets d'un tableau JSON ou de JSON Lines, lus morceau par morceau."""
+    decodeur = json.JSONDecoder()
+    tampon = ""
+    position = 0
+    while True:
+        position = SEPARATEURS_JSON.match(tampon, position).end()
+        if position < len(tampon):
+            try:
+                objet, position = decodeur.raw_decode(tampon, position)
+            except json.JSONDecodeError:
+                pass  # objet coupé en fin de morceau : lire la suite
+            else:
+                yield objet
+                continue
+        morceau = flux.read(TAILLE_LECTURE)
+        if not morceau:
+            if position < len(tampon):
+                decodeur.raw_decode(tampon, position)  # lève l'erreur de syntaxe
+            return
+        tampon = tampon[position:] + morceau
+        position = 0
+
+
+def lire_enregistrements(flux, format):
+    """Dicts d'un flux texte CSV (en-tête en première ligne) ou JSON."""
+    if format == "csv":
+        return csv.DictReader(flux)
+    return lire_json(flux)
+
+
+def par_lots(enregistrements, taille):
+    """Découpe un itérable en listes de `taille` éléments au plus."""
+    iterateur = iter(enregistrements)
+    while lot := list(islice(iterateur, taille)):
+        yield lot
+
+
+def _texte(valeur):
+    if valeur is None:
+        return None
+    valeur = str(valeur).strip()
+    return valeur or None
+
+
+def normaliser_produit(enregistrement) -> dict:
+    """Colonnes de Produit d'un enregistrement importé (ValueError si invalide).
+
+    Sans id, le produit est créé ; avec un id, il est créé ou mis à jour.
+    Les champs absents de l'enregistrement ne sont pas modifiés.
+    """
+    produit = {}
+    for colonne in COLONNES_PRODUIT:
+        if colonne in enregistrement:
+            produit[colonne] = _texte(enregistrement[colonne])
+
+    if produit.get("id") is not None:
+        produit["id"] = int(produit["id"])
+    else:
+        produit.pop("id", None)
+    if produit.get("prix") is not None:
+        produit["prix"] = float(str(produit["prix"]).replace(",", "."))
+    if "stock" in produit:
+        produit["stock"] = int(produit["stock"] or 0)
+    for obligatoire in ("nom", "prix", "categorie"):
+        if obligatoire in produit and produit[obligatoire] is None:
+            raise ValueError(f"{obligatoire} est obligatoire")
+    if "id" not in produit and not {"nom", "prix", "categorie"} <= produit.keys():
+        raise ValueError("nom, prix et catégorie sont obligatoires")
+    return produit
+
+
+def normaliser_commande(enregistrement):
+    """(en-tête de Commande, [(produit_id, quantite)]) d'une commande importée.
+
+    Format de data/commandes.json : client et produits imbriqués.
+    """
+    client = enregistrement.get("client") or {}
+    entete = {champ: _texte(client.get(champ)) for champ in CHAMPS_CLIENT}
+    entete.update(
+        id=int(enregistrement["id"]),
+        date=(
+            datetime.fromisoformat(enregistrement["date"])
+            if enregistrement.get("date")
+            else datetime.utcnow()
+        ),
+        total=float(enregistrement["total"]),
+        statut=enregistrement.get("statut") or "en_attente",
+    )
+    if entete["email"]:
+        entete["email"] = entete["email"].lower()
+    lignes = [
+        (int(ligne["id"]), int(ligne["quantite"]))
+        for ligne in enregistrement.get("produits") or []
+    ]
+    return entete, lignes
+
+
+def ecrire_json(objets):
+    """Tableau JSON, un objet par ligne, produit au fil de l'itération."""
+    yield "["
+    separateur = "\n"
+    for objet in objets:
+        yield separateur + json.dumps(objet, ensure_ascii=False, default=str)
+        separateur = ",\n"
+    yield "\n]\n"
+
+
+def ecrire_csv(colonnes, lignes, taille_morceau=500):
+    """CSV avec en-tête ; les lignes sont regroupées par morceaux de texte."""
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon)
+    ecrivain.writerow(colonnes)
+    for i, ligne in enumerate(lignes, start=1):
+        ecrivain.writerow(ligne)
+        if i % taille_morceau == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    yield tampon.getvalue()
@@ -0,0 +1,103 @@
+"""Métriques des requêtes HTTP, exposées au format texte de Prometheus.
+
+Chaque worker tient ses propres compteurs en mémoire : Prometheus interroge
+chaque processus (ou l'agrégation se fait côté collecteur).
+"""
+import threading
+
+BUCKETS_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_NOMBRE = (1, 2, 5, 10, 20, 50, 100, 200)
+BUCKETS_TAILLE = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+# nom -> (type, aide, buckets des histogrammes)
+METRIQUES = {
+    "http_requetes_total": ("counter", "Requêtes HTTP traitées.", None),
+    "http_requetes_lentes_total": (
+        "counter",
+        "Requêtes au-delà du seuil de lenteur.",
+        None,
+    ),
+    "http_requete_duree_secondes": (
+        "histogram",
+        "Durée de traitement des requêtes.",
+        BUCKETS_DUREE,
+    ),
+    "http_requete_sql_nombre": (
+        "histogram",
+        "Instructions SQL exécutées par requête.",
+        BUCKETS_NOMBRE,
+    ),
+    "http_requete_sql_duree_secondes": (
+        "histogram",
+        "Temps passé en base par requête.",
+        BUCKETS_DUREE,
+    ),
+    "http_requete_template_duree_secondes": (
+        "histogram",
+        "Temps de rendu des templates par requête.",
+        BUCKETS_DUREE,
+    ),
+    "http_reponse_taille_octets": (
+        "histogram",
+        "Taille du corps des réponses.",
+        BUCKETS_TAILLE,
+    ),
+}
+
+
+def _echapper(valeur) -> str:
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquettes(etiquettes, borne=None) -> str:
+    paires = [f'{cle}="{_echapper(valeur)}"' for cle, valeur in etiquettes]
+    if borne is not None:
+        paires.append(f'le="{borne}"')
+    return "{" + ",".join(paires) + "}" if paires else ""
+
+
+class Metriques:
+    """Compteurs et histogrammes étiquetés, sûrs entre threads."""
+
+    def __init__(self, definitions=METRIQUES):
+        self.definitions = definitions
+        self._series = {nom: {} for nom in definitions}
+        self._verrou = threading.Lock()
+
+    def incrementer(self, nom, valeur=1, **etiquettes):
+        cle = tuple(sorted(etiquettes.items()))
+        with self._verrou:
+            series = self._series[nom]
+            series[cle] = series.get(cle, 0) + valeur
+
+    def observer(self, nom, valeur, **etiquettes):
+        buckets = self.definitions[nom][2]
+        cle = tuple(sorted(etiquettes.items()))
+        with self._verrou:
+            serie = self._series[nom].get(cle)
+            if serie is None:
+                # [compte par bucket..., somme, nombre d'observations]
+                serie = self._series[nom][cle] = [0] * len(buckets) + [0.0, 0]
+            for i, borne in enumerate(buckets):
+                if valeur <= borne:
+                    serie[i] += 1
+            serie[-2] += valeur
+            serie[-1] += 1
+
+    def exposer(self) -> str:
+        """Texte d'exposition Prometheus (version 0.0.4)."""
+        lignes = []
+        with self._verrou:
+            for nom, (type_metrique, aide, buckets) in self.definitions.items():
+                lignes.append(f"# HELP {nom} {aide}")
+                lignes.append(f"# TYPE {nom} {type_metrique}")
+                for cle, serie in sorted(self._series[nom].items()):
+                    if type_metrique == "counter":
+                        lignes.append(f"{nom}{_etiquettes(cle)} {serie}")
+                        continue
+                    for borne, compte in zip(buckets, serie):
+                        lignes.append(f"{nom}_bucket{_etiquettes(cle, borne)} {compte}")
+                    lignes.append(f"{nom}_bucket{_etiquettes(cle, '+Inf')} {serie[-1]}")
+                    lignes.append(f"{nom}_sum{_etiquettes(cle)} {serie[-2]}")
+                    lignes.append(f"{nom}_count{_etiquettes(cle)} {serie[-1]}")
+        return "\n".join(lignes) + "\n"
@@ -0,0 +1,110 @@
+"""Hachage des mots de passe hors des workers web, et limitation des tentatives.
+
+Le hachage (scrypt ou PBKDF2, volontairement coûteux) est fait dans un petit
+pool de processus : le worker attend le résultat sans garder le GIL, et le
+nombre de hachages simultanés est borné, quelle que soit l'affluence sur
+/connexion. Au-delà de la file d'attente, la requête est refusée
+(HachageIndisponible) au lieu de s'empiler.
+
+Les tentatives sont limitées par fenêtre glissante, en mémoire du processus :
+avec N workers gunicorn, la limite effective est au plus N fois la limite.
+"""
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+ATTENTES_PAR_WORKER = 4  # hachages en file par processus du pool
+CLES_MAX = 10_000  # au-delà, les clés sans tentative récente sont oubliées
+
+
+class HachageIndisponible(Exception):
+    """Trop de hachages en attente, ou pool de processus hors service."""
+
+
+class Hacheur:
+    """Hachage et vérification dans un pool de `workers` processus (0 : sur place).
+
+    `methode` est au format de werkzeug, paramètres compris ("scrypt:32768:8:1",
+    "pbkdf2:sha256:600000") : une empreinte faite avec d'autres paramètres est
+    à refaire (a_rehacher).
+    """
+
+    def __init__(self, methode="scrypt:32768:8:1", workers=2, attente_max=10):
+        self.methode = methode
+        self.workers = workers
+        self.attente_max = attente_max
+        self._places = threading.BoundedSemaphore(max(1, workers) * ATTENTES_PAR_WORKER)
+        self._pool = None
+        self._verrou = threading.Lock()
+
+    def _executer(self, fonction, *args):
+        if not self.workers:
+            return fonction(*args)
+        if not self._places.acquire(timeout=self.attente_max):
+            raise HachageIndisponible()
+        try:
+            with self._verrou:
+                # Créé au premier usage : dans le worker, après le fork de gunicorn
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                pool = self._pool
+            return pool.submit(fonction, *args).result(timeout=self.attente_max)
+        except TimeoutError:
+            raise HachageIndisponible() from None
+        except BrokenProcessPool:
+            with self._verrou:
+                if self._pool is pool:
+                    self._pool = None  # recréé à la prochaine demande
+            raise HachageIndisponible() from None
+        finally:
+            self._places.release()
+
+    def hacher(self, mot_de_passe) -> str:
+        return self._executer(generate_password_hash, mot_de_passe, self.methode)
+
+    def verifier(self, empreinte, mot_de_passe) -> bool:
+        return self._executer(check_password_hash, empreinte, mot_de_passe)
+
+    def a_rehacher(self, empreinte) -> bool:
+        """Vrai si l'empreinte n'a pas été faite avec la méthode et les paramètres actuels."""
+        return empreinte.split("$", 1)[0] != self.methode
+
+
+class LimiteurTentatives:
+    """Au plus `max_tentatives` par clé sur les `fenetre` dernières secondes."""
+
+    def __init__(self, max_tentatives, fenetre):
+        self.max_tentatives = max_tentatives
+        self.fenetre = fenetre
+        self._tentatives = {}
+        self._verrou = threading.Lock()
+
+    def tenter(self, cle) -> int:
+        """0 si la tentative est permise (et comptée), sinon secondes à attendre."""
+        maintenant = time.monotonic()
+        with self._verrou:
+            if len(self._tentatives) > CLES_MAX:
+                self._oublier_anciennes(maintenant)
+            dates = self._tentatives.setdefault(cle, deque())
+            while dates and dates[0] <= maintenant - self.fenetre:
+                dates.popleft()
+            if len(dates) >= self.max_tentatives:
+                return max(1, int(dates[0] + self.fenetre - maintenant) + 1)
+            dates.append(maintenant)
+            return 0
+
+    def oublier(self, cle):
+        with self._verrou:
+            self._tentatives.pop(cle, None)
+
+    def _oublier_anciennes(self, maintenant):
+        limite = maintenant - self.fenetre
+        for cle in [c for c, d in self._tentatives.items() if not d or d[-1] <= limite]:
+            del self._tentatives[cle]
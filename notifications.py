@@ -0,0 +1,115 @@
+"""Envoi des e-mails et serveur SMTP local de substitution.
+
+envoyer_mail() parle SMTP au serveur configuré. En développement et en test,
+ServeurSMTPLocal fait office de serveur : il accepte tout message et l'écrit
+dans un dossier (un fichier .eml par message), sans rien envoyer sur le réseau.
+
+    flask --app app smtp-local   # puis MAIL_SERVEUR=localhost MAIL_PORT=8025
+"""
+import os
+import smtplib
+import socketserver
+import threading
+import time
+from email.message import EmailMessage
+
+
+def composer_mail(expediteur, destinataire, sujet, corps, pieces_jointes=()):
+    """EmailMessage texte ; pieces_jointes : (nom, type MIME, octets)."""
+    message = EmailMessage()
+    message["From"] = expediteur
+    message["To"] = destinataire
+    message["Subject"] = sujet
+    message.set_content(corps)
+    for nom, type_mime, donnees in pieces_jointes:
+        maintype, subtype = type_mime.split("/", 1)
+        message.add_attachment(
+            donnees, maintype=maintype, subtype=subtype, filename=nom
+        )
+    return message
+
+
+def envoyer_mail(
+    message, serveur, port, utilisateur=None, mot_de_passe=None, starttls=False
+):
+    """Envoie `message` ; toute erreur SMTP ou réseau est propagée (nouvel essai)."""
+    with smtplib.SMTP(serveur, port, timeout=10) as smtp:
+        if starttls:
+            smtp.starttls()
+        if utilisateur:
+            smtp.login(utilisateur, mot_de_passe)
+        smtp.send_message(message)
+
+
+class _SessionSMTP(socketserver.StreamRequestHandler):
+    """Sous-ensemble de SMTP suffisant pour smtplib : HELO/EHLO, MAIL, RCPT, DATA."""
+
+    def repondre(self, ligne):
+        self.wfile.write(ligne.encode() + b"\r\n")
+
+    def handle(self):
+        self.repondre("220 smtp-local")
+        destinataires = []
+        while True:
+            ligne = self.rfile.readline()
+            if not ligne:
+                return
+            commande = ligne.decode("utf-8", "replace").strip()
+            verbe = commande[:4].upper()
+            if verbe in ("HELO", "EHLO"):
+                self.repondre("250 smtp-local")
+            elif verbe == "MAIL":
+                destinataires = []
+                self.repondre("250 OK")
+            elif verbe == "RCPT":
+                destinataires.append(commande.split(":", 1)[-1].strip(" <>"))
+                self.repondre("250 OK")
+            elif verbe == "DATA":
+                self.repondre("354 Fin des données par <CRLF>.<CRLF>")
+                self.server.enregistrer(self.lire_donnees(), destinataires)
+                self.repondre("250 OK")
+            elif verbe == "QUIT":
+                self.repondre("221 Au revoir")
+                return
+            elif verbe in ("RSET", "NOOP"):
+                self.repondre("250 OK")
+            else:
+                self.repondre("502 Commande non prise en charge")
+
+    def lire_donnees(self) -> bytes:
+        lignes = []
+        for ligne in self.rfile:
+            if ligne in (b".\r\n", b".\n"):
+                break
+            lignes.append(ligne[1:] if ligne.startswith(b"..") else ligne)
+        return b"".join(lignes)
+
+
+class ServeurSMTPLocal(socketserver.ThreadingTCPServer):
+    """Serveur SMTP de substitution : les messages reçus sont écrits dans `dossier`.
+
+    Les messages sont aussi gardés dans `self.messages` ((destinataires,
+    octets)) pour les tests qui lancent le serveur dans le même processus.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, dossier, hote="localhost", port=8025):
+        super().__init__((hote, port), _SessionSMTP)
+        self.dossier = dossier
+        self.messages = []
+        self._verrou = threading.Lock()
+        os.makedirs(dossier, exist_ok=True)
+
+    def enregistrer(self, donnees, destinataires):
+        with self._verrou:
+            self.messages.append((list(destinataires), donnees))
+            nom = f"{time.time_ns()}-{len(self.messages)}.eml"
+        with open(os.path.join(self.dossier, nom), "wb") as f:
+            f.write(donnees)
+
+    def demarrer(self):
+        """Sert dans un thread d'arrière-plan (tests) ; arrêt par shutdown()."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
@@ -0,0 +1,146 @@
+"""Stockage des paniers côté serveur.
+
+Le cookie de session ne contient plus que l'identifiant court du panier ; les
+lignes sont dans un backend : "sql" (table paniers, partagée entre workers) ou
+"memoire" (dictionnaire du processus, pour le développement mono-worker).
+
+Un panier est un dict {produit_id: quantite} (ordre d'ajout conservé), ce qui
+rend l'ajout, la modification et la suppression d'une ligne en O(1). Chaque
+backend expose lire(id), ecrire(id, lignes), supprimer(id) et purger(avant),
+qui efface les paniers non modifiés depuis `avant` (datetime UTC).
+"""
+import json
+import threading
+from datetime import datetime
+
+import sqlalchemy as sa
+
+
+def fusionner(lignes, autres) -> dict:
+    """Ajoute les quantités de `autres` à celles de `lignes` (nouveau dict).
+
+    Les quantités inférieures à 1 sont ignorées, d'un côté comme de l'autre.
+    """
+    resultat = {produit_id: q for produit_id, q in lignes.items() if q >= 1}
+    for produit_id, quantite in autres.items():
+        if quantite >= 1:
+            resultat[produit_id] = resultat.get(produit_id, 0) + quantite
+    return resultat
+
+
+def borner(lignes, stocks) -> dict:
+    """Ramène chaque quantité entre 1 et le stock (`stocks` : {produit_id: stock}).
+
+    Les lignes de produits inconnus ou épuisés, ou de quantité inférieure à 1,
+    sont retirées.
+    """
+    return {
+        produit_id: min(quantite, stocks[produit_id])
+        for produit_id, quantite in lignes.items()
+        if quantite >= 1 and stocks.get(produit_id, 0) >= 1
+    }
+
+
+def serialiser(lignes) -> str:
+    return json.dumps({str(produit_id): q for produit_id, q in lignes.items()})
+
+
+def deserialiser(donnees) -> dict:
+    return {int(produit_id): q for produit_id, q in json.loads(donnees).items()}
+
+
+class StockagePanier:
+    """Interface commune des backends de panier."""
+
+    def lire(self, panier_id) -> dict:
+        raise NotImplementedError
+
+    def ecrire(self, panier_id, lignes):
+        raise NotImplementedError
+
+    def supprimer(self, panier_id):
+        raise NotImplementedError
+
+    def purger(self, avant) -> int:
+        raise NotImplementedError
+
+
+class PaniersMemoire(StockagePanier):
+    """Paniers en mémoire du processus (perdus au redémarrage)."""
+
+    def __init__(self):
+        self._paniers = {}  # id -> (modifie_le, lignes)
+        self._verrou = threading.Lock()
+
+    def lire(self, panier_id) -> dict:
+        entree = self._paniers.get(panier_id)
+        return dict(entree[1]) if entree else {}
+
+    def ecrire(self, panier_id, lignes):
+        with self._verrou:
+            self._paniers[panier_id] = (datetime.utcnow(), dict(lignes))
+
+    def supprimer(self, panier_id):
+        with self._verrou:
+            self._paniers.pop(panier_id, None)
+
+    def purger(self, avant) -> int:
+        with self._verrou:
+            expires = [
+                i for i, (modifie_le, _) in self._paniers.items() if modifie_le < avant
+            ]
+            for panier_id in expires:
+                del self._paniers[panier_id]
+        return len(expires)
+
+
+class PaniersSQL(StockagePanier):
+    """Paniers dans une table (id, lignes JSON, modifie_le).
+
+    Utilise ses propres connexions du moteur, hors de la session ORM de la
+    requête : enregistrer un panier ne valide jamais une transaction en cours.
+    """
+
+    def __init__(self, moteur, table):
+        self._moteur = moteur  # callable -> Engine (disponible après l'init de l'app)
+        self.table = table
+
+    def lire(self, panier_id) -> dict:
+        with self._moteur().connect() as connexion:
+            donnees = connexion.execute(
+                sa.select(self.table.c.lignes).where(self.table.c.id == panier_id)
+            ).scalar()
+        return deserialiser(donnees) if donnees else {}
+
+    def ecrire(self, panier_id, lignes):
+        valeurs = {"lignes": serialiser(lignes), "modifie_le": datetime.utcnow()}
+        mise_a_jour = (
+            sa.update(self.table).where(self.table.c.id == panier_id).values(**valeurs)
+        )
+        try:
+            with self._moteur().begin() as connexion:
+                if not connexion.execute(mise_a_jour).rowcount:
+                    connexion.execute(
+                        sa.insert(self.table).values(id=panier_id, **valeurs)
+                    )
+        except sa.exc.IntegrityError:
+            # Panier créé entre-temps par une requête concurrente
+            with self._moteur().begin() as connexion:
+                connexion.execute(mise_a_jour)
+
+    def supprimer(self, panier_id):
+        with self._moteur().begin() as connexion:
+            connexion.execute(sa.delete(self.table).where(self.table.c.id == panier_id))
+
+    def purger(self, avant) -> int:
+        with self._moteur().begin() as connexion:
+            return connexion.execute(
+                sa.delete(self.table).where(self.table.c.modifie_le < avant)
+            ).rowcount
+
+
+def creer_stockage(nom, moteur=None, table=None) -> StockagePanier:
+    """Instancie le backend nommé ("sql" ou "memoire")."""
+    if nom == "sql":
+        return PaniersSQL(moteur, table)
+    return PaniersMemoire()
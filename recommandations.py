@@ -0,0 +1,119 @@
+"""Produits similaires : co-achats et notes olfactives, calculés hors ligne.
+
+Deux similarités cosinus entre produits, pondérées puis combinées :
+
+- co-achats : nombre de commandes contenant les deux produits, rapporté à
+  sqrt(commandes du premier × commandes du second) ;
+- notes : TF-IDF des ingrédients du champ `notes` ("Notes de tête: Bergamote,
+  Notes de cœur: Rose, Jasmin...") et de la catégorie, pour que les produits
+  sans notes ni ventes restent rapprochés de leur catégorie.
+
+La matrice des similarités est calculée par blocs de lignes : la mémoire reste
+en O(taille_bloc × nombre de produits), et seuls les K meilleurs voisins de
+chaque produit sont gardés.
+"""
+import re
+import unicodedata
+
+try:
+    import numpy as np
+except ImportError:  # dépendance optionnelle : sans numpy, pas de calcul
+    np = None
+
+TAILLE_BLOC = 512
+ETIQUETTE_NOTES = re.compile(r"^notes? de [^:]*:\s*", re.IGNORECASE)
+
+
+def normaliser(texte) -> str:
+    """Minuscules sans accents ni espaces superflus ("Cœur " -> "coeur")."""
+    texte = unicodedata.normalize("NFKD", texte.replace("œ", "oe").replace("Œ", "Oe"))
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return " ".join(texte.lower().split())
+
+
+def ingredients(notes) -> list:
+    """Ingrédients d'un champ notes, sans les étiquettes "Notes de tête:"..."""
+    resultat = []
+    for morceau in re.split(r"[,;\n]", notes or ""):
+        ingredient = normaliser(ETIQUETTE_NOTES.sub("", morceau.strip()))
+        if ingredient and ingredient not in resultat:
+            resultat.append(ingredient)
+    return resultat
+
+
+def _tfidf(documents):
+    """Matrice TF-IDF (binaire, IDF lissé) normalisée ligne par ligne."""
+    vocabulaire = {}
+    for termes in documents:
+        for terme in termes:
+            vocabulaire.setdefault(terme, len(vocabulaire))
+    matrice = np.zeros((len(documents), max(1, len(vocabulaire))), dtype=np.float32)
+    for i, termes in enumerate(documents):
+        matrice[i, [vocabulaire[t] for t in termes]] = 1
+    frequences = matrice.sum(axis=0)
+    matrice *= np.log((1 + len(documents)) / (1 + frequences)) + 1
+    normes = np.linalg.norm(matrice, axis=1, keepdims=True)
+    return matrice / np.where(normes == 0, 1, normes)
+
+
+def similaires(
+    documents, co_achats, commandes_par_produit, k, poids_achats, poids_notes
+):
+    """K voisins les plus proches de chaque produit.
+
+    `documents` : {produit_id: [termes]} ; `co_achats` : (produit_a, produit_b,
+    commandes communes), dans les deux sens ; `commandes_par_produit` :
+    {produit_id: commandes le contenant}. Génère (produit_id, [(voisin_id,
+    score), ...]) par score décroissant, sans voisin de score nul.
+    """
+    if np is None:
+        raise RuntimeError("Le calcul des recommandations nécessite numpy.")
+    ids = list(documents)
+    if len(ids) < 2:
+        return
+    index = {produit_id: i for i, produit_id in enumerate(ids)}
+    contenu = _tfidf([documents[produit_id] for produit_id in ids])
+
+    # Co-achats creux, triés par ligne pour être découpés par bloc
+    achats = np.array(
+        [
+            (index[a], index[b], n)
+            for a, b, n in co_achats
+            if a in index and b in index
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    ordre = np.argsort(achats[:, 0], kind="stable")
+    lignes = achats[ordre, 0].astype(np.int64)
+    colonnes = achats[ordre, 1].astype(np.int64)
+    frequences = np.array(
+        [commandes_par_produit.get(produit_id, 0) for produit_id in ids],
+        dtype=np.float64,
+    )
+    valeurs = (
+        poids_achats
+        * achats[ordre, 2]
+        / np.sqrt(frequences[lignes] * frequences[colonnes])
+    ).astype(np.float32)
+
+    k = min(k, len(ids) - 1)
+    identifiants = np.array(ids)
+    for debut in range(0, len(ids), TAILLE_BLOC):
+        fin = min(debut + TAILLE_BLOC, len(ids))
+        scores = (contenu[debut:fin] @ contenu.T) * poids_notes
+        de, jusqua = np.searchsorted(lignes, [debut, fin])
+        np.add.at(
+            scores,
+            (lignes[de:jusqua] - debut, colonnes[de:jusqua]),
+            valeurs[de:jusqua],
+        )
+        scores[np.arange(fin - debut), np.arange(debut, fin)] = -1  # soi-même
+
+        meilleurs = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for ligne, candidats in enumerate(meilleurs):
+            candidats = candidats[np.argsort(-scores[ligne, candidats])]
+            yield identifiants[debut + ligne].item(), [
+                (identifiants[c].item(), float(scores[ligne, c]))
+                for c in candidats
+                if scores[ligne, c] > 0
+            ]
@@ -1,16 +1,12 @@
 // Gestion du panier
 document.addEventListener('DOMContentLoaded', function() {
-    // Mise à jour du compteur du panier
-    function updateCartCount() {
-        fetch('/panier-count')
-            .then(response => response.json())
-            .then(data => {
-                const cartCount = document.getElementById('cart-count');
-                if (cartCount) {
-                    cartCount.textContent = data.count;
-                }
-            })
-            .catch(error => console.error('Erreur:', error));
+    // Compteur du panier : rendu par le serveur, puis mis à jour à partir du
+    // panier_count renvoyé par chaque route qui modifie le panier
+    function updateCartCount(count) {
+        const cartCount = document.getElementById('cart-count');
+        if (cartCount && count !== undefined) {
+            cartCount.textContent = count;
+        }
     }
 
     // Ajouter au panier
@@ -28,14 +24,12 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
-                    // Mettre à jour le compteur
-                    const cartCount = document.getElementById('cart-count');
-                    if (cartCount) {
-                        cartCount.textContent = data.panier_count;
-                    }
+                    updateCartCount(data.panier_count);
                     
                     // Afficher un message de confirmation
                     showNotification('Produit ajouté au panier !', 'success');
+                } else {
+                    showNotification(data.error || 'Erreur lors de l\'ajout au panier', 'error');
                 }
             })
             .catch(error => {
@@ -114,6 +108,45 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 3000);
     }
 
+    // Historique des commandes (mon-compte) : pages suivantes chargées au
+    // défilement, le lien reste utilisable sans JavaScript
+    const ordersMore = document.querySelector('.orders-more');
+    const ordersList = document.querySelector('.orders-list');
+    if (ordersMore && ordersList) {
+        let loading = false;
+
+        function loadMoreOrders() {
+            if (loading || !ordersMore.dataset.url) return;
+            loading = true;
+            fetch(ordersMore.dataset.url, { headers: { 'Accept': 'application/json' } })
+                .then(response => response.json())
+                .then(data => {
+                    ordersList.insertAdjacentHTML('beforeend', data.html);
+                    if (data.suivant) {
+                        ordersMore.dataset.url = data.suivant;
+                        ordersMore.href = ordersMore.href.replace(/apres=[^&]*/, 'apres=' + encodeURIComponent(data.curseur_suivant));
+                    } else {
+                        ordersMore.remove();
+                        if (observer) observer.disconnect();
+                    }
+                })
+                .catch(error => console.error('Erreur:', error))
+                .finally(() => { loading = false; });
+        }
+
+        ordersMore.addEventListener('click', function(e) {
+            e.preventDefault();
+            loadMoreOrders();
+        });
+
+        const observer = 'IntersectionObserver' in window
+            ? new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) loadMoreOrders();
+            })
+            : null;
+        if (observer) observer.observe(ordersMore);
+    }
+
     // Gestion des formulaires d'administration
     const adminForms = document.querySelectorAll('.admin-form');
     adminForms.forEach(form => {
@@ -147,8 +180,6 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    // Initialiser le compteur du panier
-    updateCartCount();
 });
 
 // Fonction pour formater les prix
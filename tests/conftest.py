@@ -0,0 +1,71 @@
+"""Application sur une base SQLite en mémoire, recréée pour chaque test."""
+import os
+
+# Avant l'import de l'application, qui lit sa configuration à l'import
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+os.environ["INIT_DB_AUTO"] = "0"
+os.environ["HACHAGE_WORKERS"] = "0"
+os.environ["PANIER_PURGE_INTERVALLE"] = "0"
+
+import pytest  # noqa: E402
+
+import app as boutique  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    boutique.app.config["TESTING"] = True
+    with boutique.app.app_context():
+        boutique.migrer_schema()
+        yield boutique.app
+        boutique.db.session.remove()
+        boutique.db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def produits(app):
+    """Vingt produits en stock."""
+    produits = [
+        boutique.Produit(nom=f"Parfum {i}", prix=10 + i, categorie="parfums", stock=100)
+        for i in range(20)
+    ]
+    boutique.db.session.add_all(produits)
+    boutique.db.session.commit()
+    return [p.id for p in produits]
+
+
+@pytest.fixture
+def client_connecte(client):
+    """Client connecté à un compte client."""
+    utilisateur = boutique.Utilisateur(
+        prenom="Alice", nom="Martin", email="alice@example.com", mot_de_passe_hash="x"
+    )
+    boutique.db.session.add(utilisateur)
+    boutique.db.session.commit()
+    with client.session_transaction() as sess:
+        sess["user_id"] = utilisateur.id
+    return client
+
+
+def remplir_panier(client, lignes):
+    """Écrit {produit_id: quantite} dans le panier de la session du client."""
+    with client.session_transaction() as sess:
+        sess["panier_id"] = boutique.panier_utilisateur(sess["user_id"])
+        boutique.stockage_paniers.ecrire(sess["panier_id"], lignes)
+
+
+FORMULAIRE_COMMANDE = {
+    "nom": "Martin",
+    "prenom": "Alice",
+    "email": "alice@example.com",
+    "telephone": "0600000000",
+    "adresse": "1 rue de la Paix",
+    "ville": "Paris",
+    "code_postal": "75002",
+    "pays": "France",
+}
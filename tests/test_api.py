@@ -0,0 +1,51 @@
+import time
+
+import app as boutique
+from conftest import FORMULAIRE_COMMANDE, remplir_panier
+
+
+def test_etag_stable_tant_que_le_catalogue_ne_change_pas(client, produits):
+    reponse = client.get("/api/produits")
+    etag = reponse.headers["ETag"]
+    assert reponse.status_code == 200
+
+    # Cache des pages vidé (autre worker, redémarrage) : même version
+    boutique.cache_pages.incr(boutique.CLE_GENERATION_CATALOGUE)
+    reponse = client.get("/api/produits", headers={"If-None-Match": etag})
+    assert reponse.status_code == 304
+    assert reponse.headers["ETag"] == etag
+
+
+def test_etag_change_apres_modification(client, produits):
+    etag = client.get("/api/produits").headers["ETag"]
+
+    boutique.invalider_catalogue()
+
+    reponse = client.get("/api/produits", headers={"If-None-Match": etag})
+    assert reponse.status_code == 200
+    assert reponse.headers["ETag"] != etag
+
+
+def test_ventes_prises_en_compte_a_la_tranche_suivante(
+    client_connecte, produits, monkeypatch
+):
+    # Horloge figée avant la commande : elle tombe dans la tranche en cours
+    maintenant = time.time()
+    monkeypatch.setattr(boutique.time, "time", lambda: maintenant)
+    url = f"/api/produits/{produits[0]}"
+    etag = client_connecte.get(url).headers["ETag"]
+    remplir_panier(client_connecte, {produits[0]: 3})
+    client_connecte.post("/traiter-commande", data=FORMULAIRE_COMMANDE)
+
+    # La commande n'écrit pas la version : ETag inchangé dans la tranche
+    assert client_connecte.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    maintenant += boutique.API_VENTES_INTERVALLE
+    reponse = client_connecte.get(url, headers={"If-None-Match": etag})
+    assert reponse.status_code == 200
+    assert reponse.get_json()["stock"] == 97
+
+    # Sans nouvelle vente, l'ETag ne change plus d'une tranche à l'autre
+    etag = reponse.headers["ETag"]
+    maintenant += 5 * boutique.API_VENTES_INTERVALLE
+    assert client_connecte.get(url, headers={"If-None-Match": etag}).status_code == 304
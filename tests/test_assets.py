@@ -0,0 +1,18 @@
+import json
+
+import assets
+
+
+def test_envois_hors_du_manifeste(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "style.css").write_text("body {\n  color: red;\n}\n")
+    produits = tmp_path / "images" / "products"
+    (produits / "variantes").mkdir(parents=True)
+    (produits / "prod_1_rose.jpg").write_bytes(b"jpeg")
+    (produits / "variantes" / "prod_1_rose-320.webp").write_bytes(b"webp")
+
+    manifeste = assets.construire(str(tmp_path))
+
+    assert list(manifeste) == ["css/style.css"]
+    assert json.loads((tmp_path / "dist" / "manifest.json").read_text()) == manifeste
+    assert not (tmp_path / "dist" / "images").exists()
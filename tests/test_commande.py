@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import event
+
+import app as boutique
+from conftest import FORMULAIRE_COMMANDE, remplir_panier
+
+
+def requetes_commande(client, lignes) -> int:
+    """Nombre d'instructions SQL exécutées par une validation de commande."""
+    remplir_panier(client, lignes)
+    instructions = []
+
+    def compter(conn, cursor, statement, parameters, context, executemany):
+        instructions.append(statement)
+
+    event.listen(boutique.db.engine, "before_cursor_execute", compter)
+    try:
+        reponse = client.post("/traiter-commande", data=FORMULAIRE_COMMANDE)
+    finally:
+        event.remove(boutique.db.engine, "before_cursor_execute", compter)
+    assert reponse.status_code == 200
+    return len(instructions)
+
+
+@pytest.mark.parametrize("nb_lignes", [5, 20])
+def test_requetes_constantes_quelle_que_soit_la_taille_du_panier(
+    client_connecte, produits, nb_lignes
+):
+    reference = requetes_commande(client_connecte, {produits[0]: 1})
+    assert requetes_commande(
+        client_connecte, {produit_id: 2 for produit_id in produits[:nb_lignes]}
+    ) == reference
+    assert boutique.Commande.query.count() == 2
+
+
+def test_quantite_negative_refusee(client_connecte, produits):
+    remplir_panier(client_connecte, {produits[0]: 1, produits[1]: -100})
+
+    reponse = client_connecte.post("/traiter-commande", data=FORMULAIRE_COMMANDE)
+
+    assert reponse.status_code == 302
+    assert boutique.Commande.query.count() == 0
+    produit = boutique.db.session.get(boutique.Produit, produits[1])
+    assert (produit.stock, produit.nb_ventes) == (100, 0)
+
@@ -0,0 +1,127 @@
+import gzip
+
+import pytest
+from flask import Flask, Response, request
+
+import compression
+from compression import Compression
+
+TEXTE = "Eau de parfum, notes de tête : bergamote. " * 100  # > 4 000 octets
+
+
+@pytest.fixture
+def etat():
+    return []
+
+
+@pytest.fixture
+def client(etat):
+    app = Flask(__name__)
+
+    @app.route("/page")
+    def page():
+        response = Response(TEXTE, mimetype="text/html")
+        response.set_etag("v1")
+        return response.make_conditional(request)
+
+    @app.route("/petit")
+    def petit():
+        return Response("court", mimetype="text/plain")
+
+    @app.route("/image")
+    def image():
+        return Response(b"\x89PNG" * 1000, mimetype="image/png")
+
+    @app.route("/flux")
+    def flux():
+        def morceaux():
+            yield "a" * 2000
+            etat.append("second morceau")
+            yield "b" * 2000
+
+        return Response(morceaux(), mimetype="text/csv")
+
+    @app.route("/flux-court")
+    def flux_court():
+        return Response(iter(["un ", "deux"]), mimetype="text/plain")
+
+    app.wsgi_app = Compression(app.wsgi_app, seuil=1024)
+    return app.test_client()
+
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def test_reponse_compressee(client):
+    reponse = client.get("/page", headers=GZIP)
+
+    assert reponse.headers["Content-Encoding"] == "gzip"
+    assert reponse.headers["Vary"] == "Accept-Encoding"
+    assert reponse.headers["ETag"] == '"v1-gzip"'
+    assert "Content-Length" not in reponse.headers
+    assert gzip.decompress(reponse.data).decode() == TEXTE
+
+
+def test_revalidation_avec_etag_suffixe(client):
+    reponse = client.get("/page", headers={**GZIP, "If-None-Match": '"v1-gzip"'})
+    assert reponse.status_code == 304
+    assert reponse.headers["ETag"] == '"v1-gzip"'
+    assert reponse.headers["Vary"] == "Accept-Encoding"
+
+    # Sans compression, c'est l'ETag d'origine qui est valide
+    assert client.get("/page", headers={"If-None-Match": '"v1"'}).status_code == 304
+    reponse = client.get("/page", headers={"If-None-Match": '"v1-gzip"'})
+    assert reponse.status_code == 200
+    assert reponse.headers["ETag"] == '"v1"'
+    assert reponse.data.decode() == TEXTE
+
+
+@pytest.mark.parametrize(
+    "url, entetes",
+    [
+        ("/petit", GZIP),  # sous le seuil
+        ("/image", GZIP),  # type binaire
+        ("/page", {}),  # pas d'Accept-Encoding
+        ("/page", {"Accept-Encoding": "identity"}),
+    ],
+)
+def test_reponse_non_compressee(client, url, entetes):
+    reponse = client.get(url, headers=entetes)
+    assert "Content-Encoding" not in reponse.headers
+    assert reponse.headers["Content-Length"] == str(len(reponse.data))
+
+
+def test_head_non_compresse(client):
+    reponse = client.head("/page", headers=GZIP)
+    assert "Content-Encoding" not in reponse.headers
+    assert reponse.headers["ETag"] == '"v1"'
+
+
+def test_flux_compresse_au_fil_de_l_eau(client, etat):
+    reponse = client.get("/flux", headers=GZIP, buffered=False)
+    assert reponse.headers["Content-Encoding"] == "gzip"
+
+    morceaux = iter(reponse.response)
+    premier = next(morceaux)
+    # Premier morceau compressé envoyé avant que la vue ne produise le second
+    assert premier and etat == []
+    corps = premier + b"".join(morceaux)
+    reponse.close()
+
+    assert etat == ["second morceau"]
+    assert gzip.decompress(corps) == b"a" * 2000 + b"b" * 2000
+
+
+def test_flux_sous_le_seuil_envoye_tel_quel(client):
+    reponse = client.get("/flux-court", headers=GZIP)
+    assert "Content-Encoding" not in reponse.headers
+    assert reponse.headers["Content-Length"] == "7"
+    assert reponse.data == b"un deux"
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="paquet brotli absent")
+def test_brotli_prefere(client):
+    reponse = client.get("/page", headers={"Accept-Encoding": "gzip, br"})
+    assert reponse.headers["Content-Encoding"] == "br"
+    assert reponse.headers["ETag"] == '"v1-br"'
+    assert compression.brotli.decompress(reponse.data).decode() == TEXTE
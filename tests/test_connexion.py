@@ -0,0 +1,28 @@
+import pytest
+
+import app as boutique
+
+
+@pytest.fixture(autouse=True)
+def limiteurs_vides():
+    boutique.limiteur_ip._tentatives.clear()
+    boutique.limiteur_compte._tentatives.clear()
+
+
+def connexion_admin(client, mot_de_passe, ip):
+    return client.post(
+        "/admin/login",
+        data={"username": boutique.ADMIN_USERNAME, "password": mot_de_passe},
+        environ_base={"REMOTE_ADDR": ip},
+    )
+
+
+def test_echecs_admin_ne_bloquent_que_leur_ip(client):
+    maximum = boutique.limiteur_compte.max_tentatives
+    for _ in range(maximum):
+        assert connexion_admin(client, "faux", "203.0.113.7").status_code == 200
+    assert connexion_admin(client, "faux", "203.0.113.7").status_code == 429
+
+    reponse = connexion_admin(client, "admin123", "198.51.100.2")
+    assert reponse.status_code == 302
+    assert reponse.location.endswith("/admin/dashboard")
@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pytest
+
+import facettes
+from facettes import IndexFacettes
+
+
+def produit(id, categorie, pour_qui, prix, note=None):
+    return SimpleNamespace(
+        id=id,
+        categorie=categorie,
+        pour_qui=pour_qui,
+        contenance=None,
+        type_peau=None,
+        prix=prix,
+        nb_avis=1 if note else 0,
+        note_moyenne=note or 0,
+        cree_le=100 - id,  # plus récent en premier : ids croissants
+    )
+
+
+PRODUITS = [
+    produit(1, "parfums", "femme", 20, note=4.5),
+    produit(2, "parfums", "homme", 40),
+    produit(3, "parfums", "mixte", 80, note=3.2),
+    produit(4, "soins", "femme", 30),
+    produit(5, "soins", "homme", 120, note=4.0),
+    produit(6, "soins", "mixte", 10),
+    produit(7, "maquillage", "femme", 60),
+]
+
+
+@pytest.fixture(params=["dense", "creuse"])
+def index(request, monkeypatch):
+    """Index des PRODUITS, paginé par les deux branches de sélection."""
+    seuil = 0 if request.param == "dense" else facettes.SEUIL_SELECTION_CREUSE
+    monkeypatch.setattr(facettes, "SEUIL_SELECTION_CREUSE", seuil)
+    index = IndexFacettes(["cree_le"])
+    index.construire(PRODUITS)
+    return index
+
+
+def tous_les_ids(index, filtres, taille):
+    """Parcourt toutes les pages ; renvoie les ids et le nombre de pages."""
+    ids, apres, pages = [], None, 0
+    while True:
+        page, apres = index.page(filtres, "cree_le", apres, taille)
+        ids += page
+        pages += 1
+        if apres is None:
+            return ids, pages
+
+
+def test_ou_dans_une_facette_et_entre_facettes(index):
+    filtres = {"categorie": ["parfums", "soins"], "pour_qui": ["femme"]}
+    assert tous_les_ids(index, filtres, 10) == ([1, 4], 1)
+    assert tous_les_ids(index, {"prix": ["0-25", "100+"]}, 10)[0] == [1, 5, 6]
+    assert tous_les_ids(index, {"categorie": ["inconnue"]}, 10) == ([], 1)
+
+
+def test_comptes_hors_filtre_de_la_facette(index):
+    comptes = index.compter({"categorie": ["parfums"], "pour_qui": ["femme"]})
+
+    # Catégories : comptées avec le seul filtre pour_qui=femme
+    assert [(v, n) for v, _, n in comptes["categorie"]] == [
+        ("maquillage", 1),
+        ("parfums", 1),
+        ("soins", 1),
+    ]
+    # Pour qui : comptés avec le seul filtre categorie=parfums
+    assert [(v, n) for v, _, n in comptes["pour_qui"]] == [
+        ("femme", 1),
+        ("homme", 1),
+        ("mixte", 1),
+    ]
+    # Autres facettes : les deux filtres (seul le produit 1 reste)
+    assert [(v, n) for v, _, n in comptes["note"]] == [
+        ("4", 1),
+        ("3", 1),
+        ("2", 1),
+        ("1", 1),
+    ]
+    assert [v for v, _, _ in comptes["prix"]] == ["0-25", "25-50", "50-100", "100+"]
+
+
+@pytest.mark.parametrize(
+    "filtres, attendus",
+    [
+        ({}, [1, 2, 3, 4, 5, 6, 7]),
+        ({"pour_qui": ["femme", "homme"]}, [1, 2, 4, 5, 7]),
+    ],
+)
+def test_pagination_par_curseur(index, filtres, attendus):
+    assert tous_les_ids(index, filtres, 2) == (attendus, (len(attendus) + 1) // 2)
+    # Page pleine sans suite : pas de curseur
+    assert tous_les_ids(index, filtres, len(attendus)) == (attendus, 1)
+
+
+def test_pagination_apres_mise_a_jour_et_retrait(index):
+    premiere, apres = index.page({"categorie": ["soins"]}, "cree_le", None, 1)
+    assert premiere == [4]
+
+    # Produit 2 passé en soins, produit 5 retiré, produit 8 ajouté en dernier
+    index.mettre_a_jour(produit(2, "soins", "homme", 40))
+    index.retirer(5)
+    index.mettre_a_jour(
+        SimpleNamespace(**{**vars(produit(8, "soins", "femme", 15)), "cree_le": 0})
+    )
+
+    suite, _ = index.page({"categorie": ["soins"]}, "cree_le", apres, 10)
+    assert suite == [6, 8]
+    assert tous_les_ids(index, {"categorie": ["soins"]}, 2)[0] == [2, 4, 6, 8]
+    assert tous_les_ids(index, {"pour_qui": ["homme"]}, 10)[0] == [2]
+    comptes = dict((v, n) for v, _, n in index.compter({})["categorie"])
+    assert comptes == {"maquillage": 1, "parfums": 2, "soins": 4}
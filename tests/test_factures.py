@@ -0,0 +1,33 @@
+import re
+from datetime import datetime
+from types import SimpleNamespace
+
+from factures import facture_pdf
+
+
+def test_facture_longue_sur_plusieurs_pages():
+    commande = SimpleNamespace(
+        id=7,
+        date=datetime(2024, 5, 1),
+        prenom="Alice",
+        nom="Martin",
+        adresse="1 rue de la Paix",
+        code_postal="75002",
+        ville="Paris",
+        pays="France",
+        total=35 * 12.5,
+    )
+    lignes = [(f"Parfum {i}", 1, 12.5, 12.5) for i in range(1, 36)]
+
+    contenu = facture_pdf(commande, lignes)
+
+    assert b"/Count 2" in contenu
+    for i in (1, 28, 29, 35):
+        assert f"(Parfum {i} ".encode() in contenu
+    assert "(Total TTC : 437.50 €)".encode("cp1252") in contenu
+
+    # Table xref : chaque position pointe sur l'objet annoncé
+    debut_xref = int(re.search(rb"startxref\n(\d+)", contenu).group(1))
+    positions = re.findall(rb"(\d{10}) 00000 n", contenu[debut_xref:])
+    for numero, position in enumerate(positions, start=1):
+        assert contenu[int(position) :].startswith(f"{numero} 0 obj".encode())
@@ -0,0 +1,49 @@
+import pytest
+
+import app as boutique
+
+
+@pytest.fixture
+def variantes(app, monkeypatch):
+    """Génération remplacée : une variante de 320 px par image."""
+    monkeypatch.setattr(
+        boutique, "generer_variantes", lambda chemin, largeurs: {320: "img-320.webp"}
+    )
+
+
+def generation():
+    return boutique.cache_pages.compteur(boutique.CLE_GENERATION_CATALOGUE)
+
+
+def enregistrer(objet, colonne, valeur):
+    boutique.enregistrer_variantes(
+        type(objet), objet.id, colonne, valeur, f"static/images/{valeur}", (320,)
+    )
+
+
+def test_variantes_produit_invalident_le_catalogue(variantes, produits):
+    produit = boutique.db.session.get(boutique.Produit, produits[0])
+    produit.image = "prod_1_rose.jpg"
+    boutique.db.session.commit()
+    avant = generation()
+
+    enregistrer(produit, "image", "prod_1_ancienne.jpg")  # image remplacée depuis
+    assert generation() == avant
+
+    enregistrer(produit, "image", "prod_1_rose.jpg")
+    assert generation() == avant + 1
+    boutique.db.session.refresh(produit)
+    assert produit.image_variantes is not None
+
+
+def test_variantes_avatar_sans_invalidation(variantes, client_connecte):
+    utilisateur = boutique.Utilisateur.query.one()
+    utilisateur.avatar = "avatars/alice.png"
+    boutique.db.session.commit()
+    avant = generation()
+
+    enregistrer(utilisateur, "avatar", "avatars/alice.png")
+
+    assert generation() == avant
+    boutique.db.session.refresh(utilisateur)
+    assert utilisateur.avatar_variantes is not None
@@ -0,0 +1,34 @@
+import io
+import json
+
+import app as boutique
+
+
+def commande_importee(commande_id, produit_id, quantite):
+    return {
+        "id": commande_id,
+        "date": "2025-11-29 17:15:52",
+        "client": {"nom": "Durand", "prenom": "Léa", "email": "lea@example.com"},
+        "produits": [{"id": produit_id, "quantite": quantite}],
+        "total": 10.0 * quantite,
+    }
+
+
+def test_import_ne_remplace_pas_une_commande_existante(app, produits):
+    boutique.db.session.add(
+        boutique.Commande(id=1, nom="Martin", email="alice@example.com", total=99)
+    )
+    boutique.db.session.commit()
+    flux = io.StringIO(
+        json.dumps(
+            [commande_importee(1, produits[0], 5), commande_importee(2, produits[1], 1)]
+        )
+    )
+
+    rapport = boutique.importer_commandes(flux, "json")
+
+    assert (rapport.importes, rapport.rejetes) == (1, 1)
+    assert "existe déjà" in rapport.erreurs[0]
+    existante = boutique.db.session.get(boutique.Commande, 1)
+    assert (existante.nom, existante.total) == ("Martin", 99)
+    assert boutique.db.session.get(boutique.Commande, 2).email == "lea@example.com"
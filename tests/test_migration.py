@@ -0,0 +1,47 @@
+import app as boutique
+
+COLONNES_AJOUTEES = ("nb_avis", "somme_notes", "note_moyenne", "nb_ventes")
+
+
+def executer(sql):
+    boutique.db.session.execute(boutique.db.text(sql))
+
+
+def test_migration_d_une_base_anterieure_aux_agregats(app):
+    # Table produits telle qu'avant les colonnes dénormalisées et leurs index
+    executer("DROP INDEX ix_produits_nb_ventes_id")
+    for colonne in COLONNES_AJOUTEES:
+        executer(f"ALTER TABLE produits DROP COLUMN {colonne}")
+    executer(
+        "CREATE INDEX ix_produits_categorie_cree_le_id "
+        "ON produits (categorie, cree_le, id)"
+    )
+    executer(
+        "INSERT INTO produits (id, nom, prix, categorie, stock) "
+        "VALUES (1, 'Parfum', 50, 'parfums', 10)"
+    )
+    executer(
+        "INSERT INTO utilisateurs (id, prenom, nom, email, mot_de_passe_hash) "
+        "VALUES (1, 'Alice', 'Martin', 'alice@example.com', 'x')"
+    )
+    executer(
+        "INSERT INTO avis_produits (utilisateur_id, produit_id, note) VALUES (1, 1, 4)"
+    )
+    executer("INSERT INTO commandes (id, total) VALUES (1, 150)")
+    executer(
+        "INSERT INTO lignes_commande "
+        "(commande_id, produit_id, quantite, prix_unitaire, sous_total) "
+        "VALUES (1, 1, 3, 50, 150)"
+    )
+    boutique.db.session.commit()
+
+    ajoutees = boutique.migrer_schema()
+
+    assert ajoutees == [f"produits.{colonne}" for colonne in COLONNES_AJOUTEES]
+    produit = boutique.db.session.get(boutique.Produit, 1)
+    assert (produit.nb_avis, produit.note_moyenne, produit.nb_ventes) == (1, 4.0, 3)
+    inspecteur = boutique.db.inspect(boutique.db.engine)
+    index = {i["name"] for i in inspecteur.get_indexes("produits")}
+    assert "ix_produits_nb_ventes_id" in index
+    assert "ix_produits_categorie_cree_le_id" not in index  # obsolète
+    assert boutique.migrer_schema() == []  # idempotente
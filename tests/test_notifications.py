@@ -0,0 +1,53 @@
+import email
+from email import policy
+
+import pytest
+
+import app as boutique
+from conftest import FORMULAIRE_COMMANDE, remplir_panier
+from notifications import ServeurSMTPLocal
+
+
+@pytest.fixture
+def serveur_smtp(app, tmp_path, monkeypatch):
+    """Serveur SMTP local sur un port libre, configuré comme serveur d'envoi."""
+    serveur = ServeurSMTPLocal(str(tmp_path / "mails"), port=0).demarrer()
+    monkeypatch.setitem(app.config, "MAIL_SERVEUR", "localhost")
+    monkeypatch.setitem(app.config, "MAIL_PORT", serveur.server_address[1])
+    monkeypatch.setitem(app.config, "MAIL_UTILISATEUR", None)
+    monkeypatch.setitem(app.config, "MAIL_STARTTLS", False)
+    monkeypatch.setitem(app.config, "ADMIN_EMAIL", "admin@example.com")
+    monkeypatch.setitem(app.config, "FACTURES_DOSSIER", str(tmp_path / "factures"))
+    yield serveur
+    serveur.shutdown()
+    serveur.server_close()
+
+
+def test_commande_facture_et_mails_livres(client_connecte, produits, serveur_smtp):
+    remplir_panier(client_connecte, {produits[0]: 2})
+    assert client_connecte.post(
+        "/traiter-commande", data=FORMULAIRE_COMMANDE
+    ).status_code == 200
+    commande = boutique.Commande.query.one()
+    assert serveur_smtp.messages == []  # rien n'est envoyé pendant la requête
+
+    boutique.traiter_taches(une_fois=True)
+
+    statuts = {t.type: t.statut for t in boutique.Tache.query}
+    assert statuts == dict.fromkeys(
+        ("facture", "mail_confirmation", "alerte_admin"), "terminee"
+    )
+    messages = {
+        tuple(destinataires): email.message_from_bytes(donnees, policy=policy.default)
+        for destinataires, donnees in serveur_smtp.messages
+    }
+    assert set(messages) == {("alice@example.com",), ("admin@example.com",)}
+
+    confirmation = messages[("alice@example.com",)]
+    assert confirmation["Subject"] == f"Votre commande n° {commande.id}"
+    pieces = [p for p in confirmation.walk() if p.get_filename()]
+    assert [p.get_filename() for p in pieces] == [f"facture-{commande.id}.pdf"]
+    assert pieces[0].get_content_type() == "application/pdf"
+    assert pieces[0].get_content().startswith(b"%PDF")
+    alerte = messages[("admin@example.com",)]
+    assert alerte["Subject"].startswith(f"Nouvelle commande n° {commande.id}")
@@ -0,0 +1,50 @@
+import pytest
+
+import app as boutique
+from paniers import borner, fusionner
+
+
+def ajouter(client, produit_id, quantite):
+    return client.post(
+        "/ajouter-au-panier", data={"produit_id": produit_id, "quantite": quantite}
+    )
+
+
+def panier(client):
+    with client.session_transaction() as sess:
+        return boutique.stockage_paniers.lire(sess.get("panier_id"))
+
+
+@pytest.mark.parametrize("quantite", [0, -100, "abc"])
+def test_ajout_quantite_invalide_refuse(client, produits, quantite):
+    assert ajouter(client, produits[0], quantite).status_code == 400
+    assert panier(client) == {}
+
+
+def test_ajout_produit_inconnu(client, produits):
+    assert ajouter(client, 999_999, 1).status_code == 404
+
+
+def test_ajout_borne_au_stock(client, produits):
+    ajouter(client, produits[0], 60)
+    reponse = ajouter(client, produits[0], 60)
+    assert reponse.get_json()["quantite"] == 100
+    assert panier(client) == {produits[0]: 100}
+
+
+def test_modification_bornee_au_stock(client, produits):
+    ajouter(client, produits[0], 1)
+    client.post(
+        "/modifier-quantite-panier", data={"produit_id": produits[0], "quantite": 500}
+    )
+    assert panier(client) == {produits[0]: 100}
+    client.post(
+        "/modifier-quantite-panier", data={"produit_id": produits[0], "quantite": -3}
+    )
+    assert panier(client) == {}
+
+
+def test_fusion_et_bornage():
+    lignes = fusionner({1: 2, 2: -5}, {1: 3, 3: 0, 4: 1})
+    assert lignes == {1: 5, 4: 1}
+    assert borner(lignes, {1: 4, 4: 0}) == {1: 4}